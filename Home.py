@@ -5,7 +5,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import plotly.figure_factory as ff
-from utils import process_data, get_download_data, calculate_review_stats, create_pie_chart, analyze_by_group, create_rating_trend_chart, create_rating_heatmap, save_fig_to_html
+from utils import process_data, read_review_files_parallel, merge_review_frames, render_download_button, REPORT_DOWNLOAD_FORMATS, calculate_review_stats, create_pie_chart, analyze_by_group, create_rating_trend_chart, create_rating_heatmap, save_fig_to_html, get_content_hash, set_active_dataset, stream_process_files, load_dataset, show_brand_match_stats, cached_process_data, get_processed_cache_stats, compact_dataframe, load_brand_index, update_brand_index, list_datasets, append_new_reviews
 import base64
 
 # 应用配置 - 可以在这里修改logo和作者信息
@@ -238,22 +238,82 @@ def display_workflow():
     </div>
     """, unsafe_allow_html=True)
 
-def process_uploaded_file(uploaded_file):
-    """处理上传的文件"""
+def process_uploaded_files(uploaded_files):
+    """处理上传的文件（多个文件时并行解析后合并去重）"""
+    unsupported = [f.name for f in uploaded_files if not f.name.endswith(('.xlsx', '.csv'))]
+    if unsupported:
+        st.error(f"不支持的文件格式，请上传Excel(.xlsx)或CSV文件: {unsupported}")
+        return None
+    
     try:
-        if uploaded_file.name.endswith('.xlsx'):
-            df = pd.read_excel(uploaded_file)
-        elif uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        else:
-            st.error("不支持的文件格式，请上传Excel(.xlsx)或CSV文件")
-            return None
-        
-        st.success(f"✅ 文件上传成功！共读取 {len(df)} 条记录")
-        return df
+        with st.spinner(f'正在解析 {len(uploaded_files)} 个文件...'):
+            frames, parse_report = read_review_files_parallel(
+                [(f.name, f.getvalue()) for f in uploaded_files]
+            )
+            df, duplicate_count = merge_review_frames(frames)
     except Exception as e:
         st.error(f"❌ 文件读取失败: {str(e)}")
         return None
+    
+    if len(uploaded_files) > 1:
+        with st.expander("📄 文件解析明细", expanded=False):
+            st.dataframe(parse_report, use_container_width=True)
+    
+    failed = parse_report[parse_report['状态'] != '✅ 成功']
+    for _, row in failed.iterrows():
+        st.error(f"{row['文件名']}: {row['状态']}")
+    
+    if df is None:
+        return None
+    
+    if len(uploaded_files) > 1:
+        st.success(f"✅ 文件上传成功！共 {len(frames)} 个文件，合并后 {len(df)} 条记录（已去除重复评论 {duplicate_count} 条）")
+    else:
+        st.success(f"✅ 文件上传成功！共读取 {len(df)} 条记录")
+    return df
+
+def process_uploaded_files_streaming(uploaded_files, brand_index, dataset_key, dataset_name):
+    """流式处理上传的文件：分块标准化并写入Parquet数据集，再读取处理结果"""
+    status_text = st.empty()
+    
+    def on_progress(rows):
+        status_text.text(f"正在流式处理... 已处理 {rows:,} 条记录")
+    
+    try:
+        total_rows, duplicate_count, brand_stats = stream_process_files(
+            [(f, f.name) for f in uploaded_files], dataset_key, name=dataset_name,
+            brand_index=brand_index, progress_callback=on_progress
+        )
+    except Exception as e:
+        status_text.empty()
+        st.error(f"❌ 文件流式处理失败: {str(e)}")
+        return None
+    
+    status_text.empty()
+    st.success(f"✅ 文件流式处理完成！共处理 {total_rows} 条记录（已去除重复评论 {duplicate_count} 条）")
+    if brand_stats is not None:
+        show_brand_match_stats(brand_stats)
+    return load_dataset(dataset_key)
+
+def process_append(uploaded_files, master_dataset, brand_index):
+    """增量追加：只处理新导出中主数据集不存在的评论，并合并到主数据集"""
+    master_df = load_dataset(master_dataset['key'])
+    if master_df is None:
+        st.error("❌ 主数据集不存在或已被清理，请重新选择")
+        return None
+    
+    raw_df = process_uploaded_files(uploaded_files)
+    if raw_df is None:
+        return None
+    
+    merged_df, delta_df, skipped = append_new_reviews(master_df, raw_df, brand_index)
+    if merged_df is None:
+        return None
+    
+    st.success(f"✅ 增量追加完成！新增 {len(delta_df)} 条评论，跳过已有评论 {skipped} 条，主数据集共 {len(merged_df)} 条")
+    if len(delta_df) > 0:
+        st.info("💡 翻译和AI标注页面会保留已有结果，只需处理新增评论")
+    return merged_df
 
 def process_brand_file(uploaded_file):
     """处理品牌文件"""
@@ -314,83 +374,180 @@ def main():
     """, unsafe_allow_html=True)
     
     # 文件上传
-    uploaded_file = st.file_uploader(
-        "选择评论数据文件",
+    uploaded_files = st.file_uploader(
+        "选择评论数据文件（可多选）",
         type=['xlsx', 'csv'],
-        help="支持Excel(.xlsx)和CSV格式文件"
+        accept_multiple_files=True,
+        help="支持Excel(.xlsx)和CSV格式文件。可一次选择多个Shulex导出文件，系统会并行解析并合并去重"
     )
     
     # 品牌文件上传
     brand_file = st.file_uploader(
         "选择品牌数据文件（可选）",
         type=['xlsx', 'csv'],
-        help="包含ASIN、Brand和Parent ASIN列的文件，用于关联品牌信息。系统会先尝试ASIN匹配，未匹配的再用Parent ASIN匹配。"
+        help="包含ASIN、Brand和Parent ASIN列的文件，用于关联品牌信息。系统会先尝试ASIN匹配，未匹配的再用Parent ASIN匹配。上传后会合并到已保存的品牌索引中。"
+    )
+    
+    # 大文件流式处理选项
+    streaming_mode = st.checkbox(
+        "🚀 大文件流式处理（低内存模式）",
+        value=False,
+        help="分块读取并逐块写入Parquet数据集，适合几十万甚至上百万行的导出文件"
+    )
+    
+    # 紧凑内存模式选项
+    compact_mode = st.checkbox(
+        "🗜️ 紧凑内存模式",
+        value=False,
+        help="将Asin、Brand、Model、Review Type转为分类类型，压缩Rating/ID，Title/Content使用pyarrow字符串，显著降低内存占用"
     )
     
-    if uploaded_file is not None:
+    # 增量追加模式：新导出只处理主数据集中不存在的评论
+    append_mode = False
+    master_dataset = None
+    saved_datasets = list_datasets()
+    if saved_datasets:
+        append_mode = st.checkbox(
+            "➕ 增量追加模式",
+            value=False,
+            help="定期重新导出相同ASIN时使用：只处理主数据集中不存在的新评论，主数据集已有的翻译和标签结果会保留"
+        )
+        if append_mode:
+            master_options = {f"{d['name']}（{d['rows']} 条，{d['created_at']}）": d for d in saved_datasets}
+            master_label = st.selectbox("选择主数据集", list(master_options.keys()))
+            master_dataset = master_options[master_label]
+    
+    # 已保存的品牌索引可直接复用，无需每次上传品牌文件
+    saved_brand_index = load_brand_index()
+    use_saved_brand_index = False
+    if brand_file is None and saved_brand_index['asin']:
+        use_saved_brand_index = st.checkbox(
+            f"🏷️ 使用已保存的品牌索引（{len(saved_brand_index['asin'])} 个ASIN）",
+            value=True,
+            help="品牌索引由历史上传的品牌文件累积而成，上传新的品牌文件会增量更新"
+        )
+    
+    if not uploaded_files:
+        return
+    
+    if append_mode:
+        dataset_name = master_dataset['name']
+    elif len(uploaded_files) > 1:
+        dataset_name = f"{uploaded_files[0].name} 等{len(uploaded_files)}个文件"
+    else:
+        dataset_name = uploaded_files[0].name
+    
+    # 品牌文件只在首次上传时解析并合并到品牌索引
+    brand_index = None
+    if brand_file is not None:
+        brand_source_key = get_content_hash(brand_file.getvalue())
+        brand_index = saved_brand_index
+        if brand_source_key not in brand_index['sources']:
+            brand_df = process_brand_file(brand_file)
+            if brand_df is not None:
+                brand_index = update_brand_index(brand_df, source_key=brand_source_key)
+    elif use_saved_brand_index:
+        brand_index = saved_brand_index
+    
+    # 以评论文件内容哈希和品牌索引版本作为缓存键，内容不变时页面重跑不再重新处理
+    dataset_key = get_content_hash(
+        master_dataset['key'].encode('utf-8') if append_mode else None,
+        *[f.getvalue() for f in uploaded_files],
+        brand_index['version'].encode('utf-8') if brand_index is not None else None
+    )
+    
+    def load_and_process():
+        """缓存未命中时读取文件并进行数据预处理"""
+        if append_mode:
+            return process_append(uploaded_files, master_dataset, brand_index)
+        
+        if streaming_mode:
+            return process_uploaded_files_streaming(uploaded_files, brand_index, dataset_key, dataset_name)
+        
         # 处理上传的文件
-        df = process_uploaded_file(uploaded_file)
+        df = process_uploaded_files(uploaded_files)
+        if df is None:
+            return None
+        st.session_state['original_data'] = df
+        
+        # 数据预处理
+        return process_data(df, brand_index=brand_index)
+    
+    processed_df, cache_source, elapsed = cached_process_data(dataset_key, load_and_process, dataset_name)
+    
+    if processed_df is not None:
+        # 显示缓存命中情况和耗时
+        source_labels = {
+            'memory': '⚡ 内存缓存命中',
+            'disk': '💾 磁盘缓存命中',
+            'computed': '🔄 缓存未命中，已重新处理'
+        }
+        cache_stats = get_processed_cache_stats()
+        st.caption(
+            f"{source_labels[cache_source]}，耗时 {elapsed * 1000:.0f} ms"
+            f"（本进程累计：内存命中 {cache_stats['memory_hits']} 次，磁盘命中 {cache_stats['disk_hits']} 次，未命中 {cache_stats['misses']} 次）"
+        )
         
-        if df is not None:
-            # 处理品牌文件
-            brand_df = None
-            if brand_file is not None:
-                brand_df = process_brand_file(brand_file)
+        if compact_mode:
+            # 同一数据集只转换一次，页面重跑时直接复用
+            compact_cache = st.session_state.get('compact_cache')
+            if compact_cache is None or compact_cache[0] is not processed_df:
+                compact_df, memory_report = compact_dataframe(processed_df)
+                compact_cache = (processed_df, compact_df, memory_report)
+                st.session_state['compact_cache'] = compact_cache
+            _, processed_df, memory_report = compact_cache
             
-            # 数据预处理
-            processed_df = process_data(df, brand_df)
+            with st.expander("🗜️ 紧凑内存模式：各列内存对比"):
+                st.dataframe(memory_report, use_container_width=True)
+        
+        # 显示数据统计
+        st.markdown("""
+        <div class="stats-container">
+            <h3>📊 数据概览</h3>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # 计算统计信息
+        stats = calculate_review_stats(processed_df)
+        
+        # 显示统计信息
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("总评论数", len(processed_df))
+        
+        with col2:
+            st.metric("平均评分", f"{processed_df['Rating'].mean():.2f}")
+        
+        with col3:
+            positive_count = len(processed_df[processed_df['Review Type'] == 'positive'])
+            st.metric("正面评论", positive_count)
+        
+        with col4:
+            negative_count = len(processed_df[processed_df['Review Type'] == 'negative'])
+            st.metric("负面评论", negative_count)
+        
+        # 显示评论类型分布
+        review_counts = processed_df['Review Type'].value_counts()
+        fig = create_pie_chart(review_counts)
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # 保存处理后的数据到session state，并按内容哈希存储为Parquet供其他页面直接使用
+        set_active_dataset(processed_df, dataset_key, dataset_name)
+        
+        st.success("✅ 数据处理完成！其他页面将直接使用该数据集，无需重新上传，请使用左侧菜单进行进一步分析。")
+        
+        # 显示数据预览
+        with st.expander("📋 数据预览"):
+            st.dataframe(processed_df.head(10), use_container_width=True)
             
-            if processed_df is not None:
-                # 显示数据统计
-                st.markdown("""
-                <div class="stats-container">
-                    <h3>📊 数据概览</h3>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # 计算统计信息
-                stats = calculate_review_stats(processed_df)
-                
-                # 显示统计信息
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.metric("总评论数", len(processed_df))
-                
-                with col2:
-                    st.metric("平均评分", f"{processed_df['Rating'].mean():.2f}")
-                
-                with col3:
-                    positive_count = len(processed_df[processed_df['Review Type'] == 'positive'])
-                    st.metric("正面评论", positive_count)
-                
-                with col4:
-                    negative_count = len(processed_df[processed_df['Review Type'] == 'negative'])
-                    st.metric("负面评论", negative_count)
-                
-                # 显示评论类型分布
-                review_counts = processed_df['Review Type'].value_counts()
-                fig = create_pie_chart(review_counts)
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # 保存处理后的数据到session state
-                st.session_state['processed_data'] = processed_df
-                st.session_state['original_data'] = df
-                
-                st.success("✅ 数据处理完成！请使用左侧菜单进行进一步分析。")
-                
-                # 显示数据预览
-                with st.expander("📋 数据预览"):
-                    st.dataframe(processed_df.head(10), use_container_width=True)
-                    
-                    # 下载处理后的数据
-                    download_data = get_download_data(processed_df)
-                    st.download_button(
-                        label="📥 下载处理后的数据",
-                        data=download_data,
-                        file_name=f"processed_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+            # 下载处理后的数据（点击后才生成，同一数据只生成一次）
+            render_download_button(processed_df, "processed_data", label="📥 下载处理后的数据", key="home")
+        
+        # 一键分析报告：包含数据、分组统计、评分分布以及已保存的翻译/关键词/AI标签汇总
+        with st.expander("📑 一键生成分析报告"):
+            st.caption("报告基于当前数据集生成，翻译、关键词匹配和AI标注页面保存的结果也会一并汇总。同一版本的数据只生成一次。")
+            render_download_button(processed_df, "analysis_report", label="📥 下载分析报告", formats=REPORT_DOWNLOAD_FORMATS, key="report")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存缓存并发基准测试
+测量单锁的MemoryCache和分段加锁的ShardedMemoryCache的吞吐量随线程数的扩展情况。
+--io-ms 模拟翻译线程每次读写缓存之间等待接口响应的时间（等待期间释放GIL），为0时测量纯缓存操作的锁竞争。
+"""
+
+import argparse
+import hashlib
+import random
+import threading
+import time
+
+from utils import MemoryCache, ShardedMemoryCache, MEMORY_CACHE_SHARDS, MEMORY_CACHE_MAX_MB
+
+def make_keys(count):
+    """生成与翻译缓存相同形式的键（md5十六进制字符串）"""
+    return [hashlib.md5(f"review {i}".encode('utf-8')).hexdigest() for i in range(count)]
+
+def run_threads(cache, keys, threads, ops_per_thread, write_ratio, io_seconds=0.0):
+    """多个线程同时随机读写缓存，返回每秒操作数"""
+    value = "译文" * 50
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        picks = [rng.choice(keys) for _ in range(ops_per_thread)]
+        writes = [rng.random() < write_ratio for _ in range(ops_per_thread)]
+        barrier.wait()
+        for key, is_write in zip(picks, writes):
+            if is_write:
+                cache.set(key, value)
+            elif cache.get(key) is None:
+                cache.set(key, value)
+            if io_seconds:
+                time.sleep(io_seconds)
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops_per_thread / elapsed
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="内存缓存并发基准测试")
+    parser.add_argument('--threads', default='1,2,4,8,16', help="逗号分隔的线程数列表")
+    parser.add_argument('--ops', type=int, default=2000, help="每个线程的操作次数")
+    parser.add_argument('--io-ms', type=float, default=1.0, help="每次缓存操作后模拟的接口等待时间（毫秒），0表示纯缓存操作")
+    parser.add_argument('--keys', type=int, default=50000, help="键的数量")
+    parser.add_argument('--max-size', type=int, default=20000, help="缓存条目上限")
+    parser.add_argument('--max-mb', type=float, default=MEMORY_CACHE_MAX_MB, help="缓存字节上限（MB），0表示不限制")
+    parser.add_argument('--write-ratio', type=float, default=0.2, help="写操作比例")
+    parser.add_argument('--shards', type=int, default=MEMORY_CACHE_SHARDS or 16, help="分段缓存的段数")
+    parser.add_argument('--repeat', type=int, default=3, help="每组重复次数（取最好成绩）")
+    args = parser.parse_args()
+
+    keys = make_keys(args.keys)
+    max_bytes = int(args.max_mb * 1024 * 1024) or None
+    thread_counts = [int(n) for n in args.threads.split(',')]
+    caches = {
+        'MemoryCache': lambda: MemoryCache(max_size=args.max_size, max_bytes=max_bytes),
+        f'Sharded({args.shards})': lambda: ShardedMemoryCache(max_size=args.max_size, max_bytes=max_bytes, shards=args.shards),
+    }
+
+    print("🧪 内存缓存并发基准测试")
+    print(f"每线程 {args.ops:,} 次操作，{args.keys:,} 个键，缓存上限 {args.max_size:,} 条，"
+          f"写比例 {args.write_ratio:.0%}，模拟接口等待 {args.io_ms} ms")
+    print("=" * 78)
+    header = f"{'线程数':>6}" + ''.join(f"{name:>18}{'扩展':>8}" for name in caches) + f"{'分段/单锁':>10}"
+    print(header)
+
+    baselines = {}
+    for threads in thread_counts:
+        row = f"{threads:>8}"
+        results = []
+        for name, factory in caches.items():
+            ops = max(
+                run_threads(factory(), keys, threads, args.ops, args.write_ratio, args.io_ms / 1000)
+                for _ in range(args.repeat)
+            )
+            baselines.setdefault(name, ops)
+            results.append(ops)
+            # 扩展：相对于同一种缓存单线程吞吐量的倍数
+            row += f"{ops:>16,.0f}/s{ops / baselines[name]:>9.2f}x"
+        print(row + f"{results[-1] / results[0]:>11.2f}x")
+
+    print("=" * 78)
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,20 @@
 # -*- coding: utf-8 -*-
 """
 缓存清理脚本
-用于清理过期的翻译缓存和AI标签缓存文件
+用于清理过期的翻译缓存和AI标签缓存文件，以及维护持久化翻译记忆库（容量裁剪、导入导出）
 """
 
+import argparse
 import os
 import pickle
 import time
 from datetime import datetime, timedelta
 import shutil
 
-def clean_expired_cache(cache_dir, max_age_days=30):
+# 翻译记忆库按最近访问时间淘汰条目，不按文件修改时间整体删除
+TRANSLATION_MEMORY_FILES = ('translation_memory.db', 'translation_memory.db-wal', 'translation_memory.db-shm')
+
+def clean_expired_cache(cache_dir, max_age_days=30, keep_files=TRANSLATION_MEMORY_FILES):
     """清理过期的缓存文件"""
     if not os.path.exists(cache_dir):
         print(f"缓存目录不存在: {cache_dir}")
@@ -27,6 +31,9 @@ def clean_expired_cache(cache_dir, max_age_days=30):
     for filename in os.listdir(cache_dir):
         file_path = os.path.join(cache_dir, filename)
         
+        if filename in keep_files:
+            continue
+        
         if os.path.isfile(file_path):
             file_age = current_time - os.path.getmtime(file_path)
             file_size = os.path.getsize(file_path)
@@ -45,6 +52,29 @@ def clean_expired_cache(cache_dir, max_age_days=30):
     else:
         print("没有找到过期的缓存文件")
 
+def clean_translation_jobs(jobs_dir='translation_jobs', max_age_days=30):
+    """删除长时间未更新的翻译任务（清单和检查点）"""
+    if not os.path.exists(jobs_dir):
+        return
+    
+    max_age_seconds = max_age_days * 24 * 3600
+    deleted_count = 0
+    for job_id in os.listdir(jobs_dir):
+        job_dir = os.path.join(jobs_dir, job_id)
+        manifest_path = os.path.join(job_dir, 'manifest.json')
+        if not os.path.isdir(job_dir):
+            continue
+        last_update = os.path.getmtime(manifest_path) if os.path.exists(manifest_path) else os.path.getmtime(job_dir)
+        if time.time() - last_update > max_age_seconds:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            deleted_count += 1
+            print(f"已删除过期翻译任务: {job_id}")
+    
+    if deleted_count > 0:
+        print(f"清理完成！删除了 {deleted_count} 个翻译任务")
+    else:
+        print("没有找到过期的翻译任务")
+
 def clean_empty_cache_dirs():
     """清理空的缓存目录"""
     cache_dirs = ['ai_label_cache', 'translation_cache']
@@ -86,8 +116,47 @@ def get_cache_stats():
     print("=" * 50)
     print(f"总计: {total_files} 个文件, {total_size / 1024:.2f} KB")
 
+def trim_translation_memory(max_entries=None):
+    """按最近访问时间裁剪翻译记忆库并回收磁盘空间"""
+    from utils import translation_memory
+    
+    deleted = translation_memory.evict(max_entries)
+    if deleted and translation_memory.enabled:
+        conn = translation_memory.connect()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+    stats = translation_memory.get_stats()
+    print(f"翻译记忆库: 淘汰 {deleted} 条, 剩余 {stats['total_items']} 条, {stats['size_mb']:.2f} MB")
+
+def export_translation_memory(path):
+    """导出翻译记忆库"""
+    from utils import translation_memory
+    
+    count = translation_memory.export_to(path)
+    print(f"已导出 {count} 条翻译记录到: {path}")
+
+def import_translation_memory(path):
+    """导入其他部署导出的翻译记忆库"""
+    from utils import translation_memory
+    
+    count = translation_memory.import_from(path)
+    print(f"已从 {path} 导入 {count} 条翻译记录")
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="缓存清理工具")
+    parser.add_argument('--export-memory', metavar='PATH', help="导出翻译记忆库为JSON Lines文件（.gz结尾时压缩）")
+    parser.add_argument('--import-memory', metavar='PATH', help="导入翻译记忆库文件")
+    parser.add_argument('--memory-max-entries', type=int, default=None, help="翻译记忆库保留的最大条目数")
+    args = parser.parse_args()
+    
+    if args.export_memory:
+        export_translation_memory(args.export_memory)
+        return
+    if args.import_memory:
+        import_translation_memory(args.import_memory)
+        return
+    
     print("🧹 缓存清理工具")
     print("=" * 50)
     
@@ -98,6 +167,11 @@ def main():
     print("\n开始清理过期缓存...")
     clean_expired_cache('ai_label_cache', max_age_days=30)
     clean_expired_cache('translation_cache', max_age_days=30)
+    clean_translation_jobs(max_age_days=30)
+    
+    # 裁剪翻译记忆库
+    print("\n裁剪翻译记忆库...")
+    trim_translation_memory(args.memory_max_entries)
     
     # 清理空目录
     print("\n清理空目录...")
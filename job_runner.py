@@ -0,0 +1,190 @@
+"""
+后台任务运行器
+翻译、AI标注等耗时任务在进程级的线程池中运行，不受Streamlit页面重新运行的影响；
+页面按任务ID查询状态、进度和结果，并可以取消任务。
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+JOB_RUNNER_WORKERS = 4  # 同时运行的任务数
+JOB_PER_USER_LIMIT = 1  # 每个用户同时运行的任务数，超出的任务排队等待
+JOB_PER_USER_QUEUE = 5  # 每个用户最多排队（含运行中）的任务数
+JOB_RESULT_TTL_HOURS = 6  # 已结束任务的结果保留时间
+JOB_OWNER_PARAM = 'owner'  # 保存用户标识的页面地址查询参数
+
+class Job:
+    """一个后台任务的状态、进度和结果"""
+
+    def __init__(self, fn, args, kwargs, owner, kind, description, context=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.owner = owner
+        self.kind = kind
+        self.description = description
+        self.context = context or {}  # 页面处理结果时需要的信息（如结果写回哪个数据集），重新接入任务时使用
+        self.status = 'queued'  # queued / running / succeeded / failed / cancelled
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def update_progress(self, **progress):
+        """任务函数在工作线程中调用，更新进度供页面读取"""
+        self.progress = {**self.progress, **progress}
+
+    def to_dict(self):
+        """任务状态摘要（不含结果）"""
+        fmt = lambda ts: datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else ''
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'description': self.description,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'error': self.error,
+            'created_at': fmt(self.created_at),
+            'started_at': fmt(self.started_at),
+            'finished_at': fmt(self.finished_at),
+        }
+
+class JobRunner:
+    """进程级任务队列：按提交顺序调度，限制总并发数和每个用户的并发数"""
+
+    def __init__(self, max_workers=JOB_RUNNER_WORKERS, per_user_limit=JOB_PER_USER_LIMIT,
+                 per_user_queue=JOB_PER_USER_QUEUE, result_ttl_hours=JOB_RESULT_TTL_HOURS):
+        self.max_workers = max_workers
+        self.per_user_limit = per_user_limit
+        self.per_user_queue = per_user_queue
+        self.result_ttl_seconds = result_ttl_hours * 3600
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs = {}
+        self.queue = deque()
+        self.running = {}  # 用户 -> 运行中的任务数
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, owner='default', kind='task', description='', context=None, **kwargs):
+        """提交任务，返回任务ID；fn以job=任务对象作为关键字参数调用，用于更新进度和检查取消"""
+        with self.lock:
+            self._purge_finished()
+            active = sum(1 for job in self.jobs.values() if job.owner == owner and not job.is_finished)
+            if active >= self.per_user_queue:
+                raise Exception(f"排队中的任务已达上限（{self.per_user_queue}个），请等待已有任务完成")
+            job = Job(fn, args, kwargs, owner, kind, description, context)
+            self.jobs[job.job_id] = job
+            self.queue.append(job)
+            self._dispatch()
+        return job.job_id
+
+    def get(self, job_id):
+        """按任务ID获取任务，不存在（或已过期清理）时返回None"""
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self, owner=None, kind=None):
+        """列出任务（按提交时间倒序）"""
+        with self.lock:
+            jobs = [job for job in self.jobs.values()
+                    if (owner is None or job.owner == owner) and (kind is None or job.kind == kind)]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id):
+        """取消任务：排队中的任务直接移出队列，运行中的任务由任务函数在下一次检查时停止"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.is_finished:
+                return False
+            job.cancel_event.set()
+            if job.status == 'queued':
+                self.queue.remove(job)
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+            return True
+
+    def get_stats(self):
+        """获取运行器统计"""
+        with self.lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'finished': sum(1 for status in statuses if status in ('succeeded', 'failed', 'cancelled')),
+            'max_workers': self.max_workers,
+            'per_user_limit': self.per_user_limit
+        }
+
+    def _dispatch(self):
+        """按提交顺序启动可以运行的任务（调用方持有锁）"""
+        running_total = sum(self.running.values())
+        for job in list(self.queue):
+            if running_total >= self.max_workers:
+                break
+            if self.running.get(job.owner, 0) >= self.per_user_limit:
+                continue
+            self.queue.remove(job)
+            job.status = 'running'
+            job.started_at = time.time()
+            self.running[job.owner] = self.running.get(job.owner, 0) + 1
+            running_total += 1
+            self.executor.submit(self._run, job)
+
+    def _run(self, job):
+        result, status, error = None, 'failed', "任务被中断"
+        try:
+            result = job.fn(*job.args, job=job, **job.kwargs)
+            status, error = 'succeeded', None
+        except Exception as e:
+            error = str(e)
+        finally:
+            # 无论任务如何结束（包括KeyboardInterrupt、SystemExit等），都要释放用户的运行名额并调度排队的任务
+            if job.cancel_event.is_set():
+                status, error = 'cancelled', None
+            with self.lock:
+                job.result = result
+                job.status = status
+                job.error = error
+                job.finished_at = time.time()
+                # 任务参数可能包含整份数据，结束后释放
+                job.args = job.kwargs = None
+                self.running[job.owner] -= 1
+                self._dispatch()
+
+    def _purge_finished(self):
+        """清理超过保留时间的已结束任务（调用方持有锁）"""
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.is_finished and now - job.finished_at > self.result_ttl_seconds]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+# 全局任务运行器（模块只导入一次，页面重新运行时任务继续执行）
+job_runner = JobRunner()
+
+def get_job_owner():
+    """当前用户的标识，用于限制每个用户的并发任务数和找回任务
+
+    标识保存在页面地址的查询参数中，刷新页面或重新打开同一地址后不变，不会像会话ID一样随刷新失效；
+    同时保存在会话中，切换页面丢失查询参数时写回地址。
+    """
+    try:
+        import streamlit as st
+        owner = st.query_params.get(JOB_OWNER_PARAM) or st.session_state.get('job_owner') or uuid.uuid4().hex[:12]
+        st.session_state['job_owner'] = owner
+        if st.query_params.get(JOB_OWNER_PARAM) != owner:
+            st.query_params[JOB_OWNER_PARAM] = owner
+        return owner
+    except Exception:
+        return 'default'
@@ -5,15 +5,27 @@ import time
 import plotly.express as px
 import plotly.graph_objects as go
 from utils import (
-    get_download_data, 
-    create_translator, 
     filter_dataframe, 
     get_memory_cache_stats, 
     clear_memory_cache,
-    get_memory_cache_key,
-    save_to_memory_cache,
-    load_from_memory_cache
+    get_translation_memory_stats,
+    translation_memory,
+    run_translation_job,
+    TranslationJob,
+    list_translation_jobs,
+    TRANSLATION_JOB_CHECKPOINT_ROWS,
+    TRANSLATION_RATE_LIMITS,
+    TRANSLATION_WORKERS,
+    load_page_dataset,
+    is_text_column,
+    save_results_to_active_dataset,
+    REVIEW_KEY_COLUMN,
+    TABLE_DOWNLOAD_FORMATS,
+    render_download_button,
+    render_job_list,
+    is_zstd_available
 )
+from job_runner import job_runner, get_job_owner
 from datetime import datetime
 import base64
 import requests
@@ -123,168 +135,43 @@ def display_header():
     
     st.markdown(header_content, unsafe_allow_html=True)
 
-def translate_text(text, translator, max_retries=3):
-    """翻译单个文本，带重试机制和质量优化"""
-    if not text or pd.isna(text) or str(text).strip() == '':
-        return ''
+def run_translation_task(df, columns, job=None, **options):
+    """后台任务：以可断点续传的方式翻译，进度写入任务对象（在工作线程中运行，不能调用st）"""
+    def on_progress(done, total, resumed, rate, eta):
+        job.update_progress(done=done, total=total, resumed=resumed, rate=rate, eta=eta)
     
-    text = str(text).strip()
-    
-    # 预处理文本，提高翻译质量
-    text = preprocess_text_for_translation(text)
-    
-    # 优先使用内存缓存
-    cache_key = get_memory_cache_key(text, 'google' if hasattr(translator, 'translator') else 'tencent')
-    cached_result = load_from_memory_cache(cache_key)
-    if cached_result:
-        return cached_result
-    
-    for attempt in range(max_retries):
-        try:
-            # 如果文本太长，分段翻译
-            if len(text) > 4000:
-                # 按句子分割
-                sentences = text.split('. ')
-                translated_parts = []
-                current_part = ""
-                
-                for sentence in sentences:
-                    if len(current_part + sentence) < 4000:
-                        current_part += sentence + ". "
-                    else:
-                        if current_part:
-                            translated_parts.append(translator.translate(current_part.strip()))
-                        current_part = sentence + ". "
-                
-                if current_part:
-                    translated_parts.append(translator.translate(current_part.strip()))
-                
-                result = ' '.join(translated_parts)
-            else:
-                result = translator.translate(text)
-            
-            # 后处理翻译结果，提高质量
-            result = postprocess_translation(result)
-            
-            # 保存到内存缓存
-            save_to_memory_cache(cache_key, result)
-            
-            return result
-                
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)  # 等待1秒后重试
-                continue
-            else:
-                st.error(f"翻译失败: {str(e)}")
-                return f"[翻译错误: {text[:50]}...]"
-
-def preprocess_text_for_translation(text):
-    """预处理文本，提高翻译质量"""
-    # 移除多余的空白字符
-    text = ' '.join(text.split())
-    
-    # 处理常见的电商术语和缩写
-    text = text.replace('ASIN', 'ASIN')  # 保持ASIN不变
-    text = text.replace('USB-C', 'USB-C')  # 保持技术术语不变
-    text = text.replace('HDMI', 'HDMI')
-    text = text.replace('WiFi', 'WiFi')
-    text = text.replace('Bluetooth', 'Bluetooth')
-    
-    # 处理评分相关文本
-    text = text.replace('5 stars', '5星')
-    text = text.replace('4 stars', '4星')
-    text = text.replace('3 stars', '3星')
-    text = text.replace('2 stars', '2星')
-    text = text.replace('1 star', '1星')
-    
-    return text
-
-def postprocess_translation(translated_text):
-    """后处理翻译结果，提高质量"""
-    if not translated_text:
-        return translated_text
-    
-    # 修复常见的翻译错误
-    corrections = {
-        'ASIN': 'ASIN',  # 保持ASIN不变
-        'USB-C': 'USB-C',
-        'HDMI': 'HDMI',
-        'WiFi': 'WiFi',
-        'Bluetooth': 'Bluetooth',
-        '5星': '5星',
-        '4星': '4星',
-        '3星': '3星',
-        '2星': '2星',
-        '1星': '1星'
+    stats = {}
+    df_translated, translated_count, error_count, cached_count = run_translation_job(
+        df, columns, progress_callback=on_progress, stats=stats, cancel_event=job.cancel_event, **options
+    )
+    return {
+        'df': df_translated,
+        'translated_count': translated_count,
+        'error_count': error_count,
+        'cached_count': cached_count,
+        'stats': stats
     }
+
+@st.fragment(run_every=1)
+def render_translation_progress():
+    """后台翻译任务的进度面板：每秒只刷新这一部分，任务结束后重新运行整个页面以显示结果"""
+    job_id = st.session_state.get('translation_job_id')
+    job = job_runner.get(job_id) if job_id else None
+    if job is None or job.is_finished:
+        st.rerun()
     
-    for original, corrected in corrections.items():
-        translated_text = translated_text.replace(original, corrected)
-    
-    # 修复标点符号
-    translated_text = translated_text.replace('。。', '。')
-    translated_text = translated_text.replace('，，', '，')
-    translated_text = translated_text.replace('！！', '！')
-    translated_text = translated_text.replace('？？', '？')
-    
-    return translated_text
-
-def translate_dataframe(df, columns_to_translate, progress_bar, status_text, engine='google', secret_id=None, secret_key=None, filters=None):
-    """批量翻译DataFrame中的指定列"""
-    try:
-        translator = create_translator(engine, secret_id, secret_key)
-    except Exception as e:
-        st.error(f"创建翻译器失败: {str(e)}")
-        return df, 0, 0, 0
-    
-    # 应用筛选条件
-    if filters:
-        df = filter_dataframe(df, filters)
-    
-    # 创建翻译后的DataFrame副本
-    df_translated = df.copy()
-    
-    # 为每个要翻译的列创建对应的中文列
-    translation_mapping = {}
-    for col in columns_to_translate:
-        if col in df.columns:
-            chinese_col = f"{col}_中文"
-            df_translated[chinese_col] = ''
-            translation_mapping[col] = chinese_col
-    
-    total_rows = len(df)
-    translated_count = 0
-    error_count = 0
-    cached_count = 0
-    
-    # 获取内存缓存统计
-    memory_stats = get_memory_cache_stats()
-    
-    # 翻译进度
-    for idx, row in df.iterrows():
-        try:
-            for original_col, chinese_col in translation_mapping.items():
-                if pd.notna(row[original_col]) and str(row[original_col]).strip():
-                    # 检查是否已有翻译
-                    if chinese_col in df_translated.columns and pd.notna(df_translated.at[idx, chinese_col]) and str(df_translated.at[idx, chinese_col]).strip():
-                        cached_count += 1
-                        continue
-                    translated_text = translate_text(row[original_col], translator)
-                    df_translated.at[idx, chinese_col] = translated_text
-            translated_count += 1
-            # 更新进度
-            progress = (idx + 1) / total_rows
-            progress_bar.progress(progress)
-            status_text.text(f"正在翻译... {idx + 1}/{total_rows} ({progress:.1%}) - 缓存命中: {cached_count}")
-            # 添加小延迟避免API限制
-            time.sleep(0.1)
-        except Exception as e:
-            error_count += 1
-            # 不再st.error打印错误，直接跳过
-            continue
-    
-    return df_translated, translated_count, error_count, cached_count
+    progress_info = job.progress
+    done, total = progress_info.get('done', 0), progress_info.get('total', 0)
+    st.progress(done / total if total else 0.0)
+    if job.status == 'queued':
+        st.info("⏳ 翻译任务排队中，当前有其他任务正在运行...")
+    else:
+        eta = progress_info.get('eta')
+        eta_text = f"{int(eta // 60)}分{int(eta % 60)}秒" if eta is not None else "计算中"
+        st.text(f"正在翻译... {done}/{total} 行 | 速度: {progress_info.get('rate', 0.0):.1f} 行/秒 | "
+                f"预计剩余: {eta_text} | 续传: {progress_info.get('resumed', 0)} 行")
+    if st.button("⏹️ 取消翻译", key="cancel_translation_job"):
+        job_runner.cancel(job.job_id)
 
 def main():
     # 显示头部
@@ -317,7 +204,14 @@ def main():
         with col1:
             st.metric("💾 内存缓存", f"{memory_stats['valid_items']}/{memory_stats['total_items']}")
         with col2:
-            st.metric("📊 缓存命中率", f"{(memory_stats['valid_items']/memory_stats['max_size']*100):.1f}%")
+            st.metric("📊 缓存命中率", f"{memory_stats['hit_rate']*100:.1f}%")
+        
+        memory_db_stats = get_translation_memory_stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("🗄️ 翻译记忆库", f"{memory_db_stats['total_items']:,}")
+        with col2:
+            st.metric("📦 记忆库大小", f"{memory_db_stats['size_mb']:.1f} MB")
         
         # 缓存管理按钮
         if st.button("🗑️ 清理内存缓存", use_container_width=True):
@@ -325,18 +219,47 @@ def main():
             st.success("✅ 内存缓存已清理")
             st.rerun()
         
+        # 翻译记忆库导入导出（在不同部署之间迁移已有译文）
+        with st.expander("🗄️ 翻译记忆库导入/导出"):
+            if st.button("📤 导出翻译记忆库", use_container_width=True, key="export_translation_memory"):
+                import tempfile
+                import os
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    export_path = os.path.join(tmp_dir, "translation_memory.jsonl.gz")
+                    translation_memory.export_to(export_path)
+                    with open(export_path, 'rb') as f:
+                        st.session_state.translation_memory_export = f.read()
+            if st.session_state.get('translation_memory_export'):
+                st.download_button(
+                    label="📥 下载 translation_memory.jsonl.gz",
+                    data=st.session_state.translation_memory_export,
+                    file_name="translation_memory.jsonl.gz",
+                    mime="application/gzip",
+                    use_container_width=True
+                )
+            memory_file = st.file_uploader("导入翻译记忆库", type=['gz', 'jsonl'], key="import_translation_memory")
+            if memory_file is not None and st.button("📥 导入", use_container_width=True):
+                try:
+                    imported = translation_memory.import_from(memory_file)
+                    st.success(f"✅ 已导入 {imported:,} 条翻译记录")
+                except Exception as e:
+                    st.error(f"导入翻译记忆库失败: {str(e)}")
+        
         # 内存缓存说明
         st.markdown("""
         <div style="background: rgba(33, 150, 243, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid #2196F3;">
             <h4 style="color: #2196F3; margin-bottom: 0.5rem;">💾 内存缓存说明</h4>
             <ul style="font-size: 0.9rem; color: #666;">
                 <li>使用内存缓存，速度快且适合网页部署</li>
-                <li>缓存容量：2000条翻译记录</li>
+                <li>缓存容量：{max_size}条翻译记录，最多占用{max_mb:.0f}MB内存，超出后淘汰最久未使用的记录</li>
                 <li>缓存时间：24小时自动过期</li>
-                <li>重启后缓存会清空，但性能不受影响</li>
+                <li>内存未命中时查询本地翻译记忆库（SQLite），重启后译文仍可复用</li>
             </ul>
         </div>
-        """, unsafe_allow_html=True)
+        """.format(
+            max_size=memory_stats['max_size'],
+            max_mb=(memory_stats['max_bytes'] or 0) / (1024 * 1024)
+        ), unsafe_allow_html=True)
         
         st.markdown("""
         <div style="background: rgba(76, 175, 80, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid #4CAF50;">
@@ -366,23 +289,16 @@ def main():
     uploaded_file = st.file_uploader(
         "上传原始评论数据文件 (支持xlsx, csv)",
         type=["xlsx", "csv"],
-        help="请上传包含评论内容的Excel或CSV文件"
+        help="请上传包含评论内容的Excel或CSV文件。已在首页处理过数据时可不上传"
     )
 
-    if uploaded_file is not None:
-        try:
-            if uploaded_file.name.endswith(".xlsx"):
-                df = pd.read_excel(uploaded_file)
-            else:
-                df = pd.read_csv(uploaded_file)
-        except Exception as e:
-            st.error(f"文件读取失败: {str(e)}")
-            return
+    df = load_page_dataset(uploaded_file)
+    if df is not None:
         if df.empty:
             st.warning("上传的文件没有数据，请检查文件内容！")
             return
     else:
-        st.info("请上传包含评论内容的Excel或CSV文件。支持xlsx, csv格式。上传后可选择需要翻译的列。")
+        st.info("请上传包含评论内容的Excel或CSV文件，或先在首页处理数据。支持xlsx, csv格式。上传后可选择需要翻译的列。")
         return
 
     # 后续所有流程都基于df
@@ -399,7 +315,7 @@ def main():
     with col2:
         st.metric("📊 总列数", len(df.columns))
     with col3:
-        text_columns = [col for col in df.columns if df[col].dtype == 'object']
+        text_columns = [col for col in df.columns if is_text_column(df[col])]
         st.metric("📝 文本列数", len(text_columns))
     with col4:
         if 'Title' in df.columns and 'Content' in df.columns:
@@ -415,7 +331,7 @@ def main():
     """, unsafe_allow_html=True)
 
     # 获取文本列
-    text_columns = [col for col in df.columns if df[col].dtype == 'object' and col not in ['ID', 'Asin', 'Brand', 'Model', 'Rating', 'Date', 'Review Type']]
+    text_columns = [col for col in df.columns if is_text_column(df[col]) and col not in ['ID', REVIEW_KEY_COLUMN, 'Asin', 'Brand', 'Model', 'Rating', 'Date', 'Review Type']]
 
     if not text_columns:
         st.warning("没有找到可翻译的文本列")
@@ -709,15 +625,32 @@ def main():
             ["标准模式", "高质量模式", "快速模式"],
             help="高质量模式会进行更多预处理和后处理，但速度较慢"
         )
+        checkpoint_rows = st.number_input(
+            "检查点间隔 (行)",
+            min_value=50,
+            max_value=10000,
+            value=TRANSLATION_JOB_CHECKPOINT_ROWS,
+            step=50,
+            help="每翻译多少行保存一次进度，页面关闭或服务重启后可从上次保存的位置继续"
+        )
 
     with col2:
-        delay_time = st.slider(
-            "延迟时间 (秒)",
-            min_value=0.0,
-            max_value=2.0,
-            value=0.1,
-            step=0.1,
-            help="每次翻译之间的延迟时间，避免API限制"
+        # 请求速率上限替代固定延迟：并发翻译时由令牌桶控制每秒请求数，避免API限制
+        default_engine = 'google' if translation_engine == "Google翻译" else 'tencent'
+        rate_limit = st.slider(
+            "速率限制 (次/秒)",
+            min_value=1.0,
+            max_value=20.0,
+            value=TRANSLATION_RATE_LIMITS[default_engine],
+            step=1.0,
+            help="每秒最多发送的翻译请求数，腾讯翻译默认上限为5次/秒"
+        )
+        translation_workers = st.slider(
+            "并发线程数",
+            min_value=1,
+            max_value=16,
+            value=TRANSLATION_WORKERS,
+            help="同时进行的翻译请求数，接口延迟较高时可适当调大"
         )
 
         # 添加专业术语处理选项
@@ -726,100 +659,187 @@ def main():
             value=True,
             help="保持ASIN、USB-C等技术术语的原始形式"
         )
+        sentence_mode = st.checkbox(
+            "按句子翻译（复用相同句子）",
+            value=False,
+            help="把评论切分为句子逐句查询翻译缓存，只翻译未缓存过的句子，适合大量评论含有相同句子的数据"
+        )
+
+    # 翻译任务按输入数据和参数断点续传：相同数据和参数的任务会从上次中断处继续（任务ID只在点击翻译后于后台计算）
+    engine_name = 'google' if translation_engine == "Google翻译" else 'tencent'
+    with st.expander("📂 翻译任务记录", expanded=False):
+        jobs = list_translation_jobs()
+        if jobs:
+            st.dataframe(pd.DataFrame([{
+                '任务': job['name'],
+                '列': ', '.join(job['columns']),
+                '引擎': job['engine'],
+                '状态': job['status'],
+                '进度': f"{job['completed_rows']:,}/{job['total_rows']:,}",
+                '更新时间': job.get('updated_at', '')
+            } for job in jobs]), use_container_width=True)
+            if any(job['status'] == 'interrupted' for job in jobs):
+                st.caption("状态为 interrupted 的任务已中断，用相同的数据和参数再次翻译即可从上次保存的检查点继续")
+            job_options = {
+                f"{job['name']} | {', '.join(job['columns'])} | {job['status']} | {job.get('updated_at', '')}": job['job_id']
+                for job in jobs
+            }
+            selected_job = st.selectbox("选择任务", list(job_options.keys()), key="translation_job_select")
+            if st.button("🗑️ 删除该任务的进度", key="discard_translation_job",
+                         disabled='translation_job_id' in st.session_state):
+                TranslationJob(job_options[selected_job]).delete()
+                st.rerun()
+        else:
+            st.write("暂无翻译任务")
+    restart_job = st.checkbox(
+        "从头翻译（不使用已保存的任务进度）",
+        value=False,
+        help="默认情况下，相同数据和参数的翻译任务会从上次中断处继续，已完成的任务直接载入结果"
+    )
+
+    # 刷新页面后接回仍在运行的翻译任务
+    render_job_list('translation', 'translation_job_id')
 
-    # 翻译按钮
-    if st.button("🌐 开始翻译", type="primary", use_container_width=True):
+    # 翻译按钮：翻译在后台任务中运行，页面重新运行或切换控件不会中断翻译
+    if st.button("🌐 开始翻译", type="primary", use_container_width=True,
+                 disabled='translation_job_id' in st.session_state):
         if not selected_columns:
             st.error("请选择要翻译的列")
             return
 
-        # 创建进度条和状态文本
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
         try:
-            # 开始翻译
-            with st.spinner('正在初始化翻译引擎...'):
-                time.sleep(1)
-
-            # 翻译数据
-            engine_name = 'google' if translation_engine == "Google翻译" else 'tencent'
-            df_translated, translated_count, error_count, cached_count = translate_dataframe(
-                filtered_df, selected_columns, progress_bar, status_text, engine=engine_name, secret_id=secret_id, secret_key=secret_key, filters=None
+            st.session_state.translation_job_id = job_runner.submit(
+                run_translation_task, filtered_df, selected_columns,
+                owner=get_job_owner(), kind='translation', description=f"翻译 {', '.join(selected_columns)}",
+                context={
+                    'selected_columns': selected_columns,
+                    'save_to_dataset': uploaded_file is None,
+                    'dataset_key': st.session_state.get('dataset_key')
+                },
+                engine=engine_name, secret_id=secret_id, secret_key=secret_key,
+                rate_limit=rate_limit, max_workers=translation_workers, sentence_mode=sentence_mode,
+                checkpoint_rows=int(checkpoint_rows), restart=restart_job,
+                name=st.session_state.get('dataset_name') if uploaded_file is None else uploaded_file.name
             )
+            st.session_state.pop('translation_summary', None)
+            st.rerun()
+        except Exception as e:
+            st.error(f"提交翻译任务失败: {str(e)}")
+
+    # 查询后台翻译任务的状态：运行中只刷新进度面板，结束后处理结果
+    if 'translation_job_id' in st.session_state:
+        job = job_runner.get(st.session_state.translation_job_id)
+        if job is None:
+            del st.session_state.translation_job_id
+        elif not job.is_finished:
+            render_translation_progress()
+        else:
+            del st.session_state.translation_job_id
+            context = job.context
+            if job.status == 'succeeded':
+                result = job.result
+                # 保存到session state，便于后续下载
+                st.session_state.translated_df = result['df']
+                summary = {key: value for key, value in result.items() if key != 'df'}
+                summary['selected_columns'] = context.get('selected_columns', [])
+                
+                # 使用共享数据集时，将翻译结果写回提交任务时的数据集，下次只需翻译新增评论
+                if context.get('save_to_dataset') and context.get('dataset_key') == st.session_state.get('dataset_key'):
+                    chinese_columns = [f"{col}_中文" for col in summary['selected_columns']]
+                    summary['saved_to_dataset'] = save_results_to_active_dataset(result['df'], chinese_columns)
+                st.session_state.translation_summary = summary
+            elif job.status == 'cancelled':
+                st.warning("⏹️ 翻译任务已取消，已完成的部分已保存，再次点击即可从中断处继续")
+            else:
+                st.error(f"翻译过程中出错: {job.error}")
 
-            # 保存到session state，便于后续下载
-            st.session_state.translated_df = df_translated
-
-            # 显示翻译结果
-            progress_bar.empty()
-            status_text.empty()
+    # 显示翻译结果
+    if 'translation_summary' in st.session_state and st.session_state.get('translated_df') is not None:
+        summary = st.session_state.translation_summary
+        df_translated = st.session_state.translated_df
+        translated_count = summary['translated_count']
+        error_count = summary['error_count']
+        cached_count = summary['cached_count']
+        dedup_stats = summary['stats']
+        
+        if summary.get('saved_to_dataset'):
+            st.info("💾 翻译结果已保存到当前数据集")
 
-            st.markdown("""
-            <div class="success-box">
-                <h4 style="margin: 0; color: white;">✅ 翻译完成！</h4>
-                <p style="margin: 0.5rem 0 0 0; opacity: 0.9;">所有选中的列已成功翻译为中文</p>
-            </div>
-            """, unsafe_allow_html=True)
+        st.markdown("""
+        <div class="success-box">
+            <h4 style="margin: 0; color: white;">✅ 翻译完成！</h4>
+            <p style="margin: 0.5rem 0 0 0; opacity: 0.9;">所有选中的列已成功翻译为中文</p>
+        </div>
+        """, unsafe_allow_html=True)
 
-            # 显示翻译统计
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("✅ 成功翻译", f"{translated_count:,}")
-            with col2:
-                st.metric("❌ 翻译失败", f"{error_count:,}")
-            with col3:
-                st.metric("💾 缓存命中", f"{cached_count:,}")
-            with col4:
-                total_processed = translated_count + error_count + cached_count
-                success_rate = (translated_count / total_processed * 100) if total_processed > 0 else 0
-                st.metric("📊 成功率", f"{success_rate:.1f}%")
-            
-            # 显示缓存统计
-            memory_stats = get_memory_cache_stats()
-            st.markdown("""
-            <div style="background: rgba(33, 150, 243, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid #2196F3;">
-                <h4 style="color: #2196F3; margin-bottom: 0.5rem;">💾 内存缓存统计</h4>
-                <div style="display: flex; justify-content: space-between; font-size: 0.9rem;">
-                    <span>有效缓存: {valid_items}</span>
-                    <span>过期缓存: {expired_items}</span>
-                    <span>最大容量: {max_size}</span>
-                    <span>TTL: {ttl_hours}小时</span>
-                </div>
+        # 显示翻译统计
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("✅ 成功翻译", f"{translated_count:,}")
+        with col2:
+            st.metric("❌ 翻译失败", f"{error_count:,}")
+        with col3:
+            st.metric("⏯️ 检查点续传", f"{cached_count:,}")
+        with col4:
+            total_processed = translated_count + error_count
+            success_rate = (translated_count / total_processed * 100) if total_processed > 0 else 0
+            st.metric("📊 成功率", f"{success_rate:.1f}%")
+        
+        if dedup_stats.get('pending_cells'):
+            st.caption(
+                f"🔁 原文去重：{dedup_stats['pending_cells']:,} 个待翻译单元格中共 {dedup_stats['unique_texts']:,} 条不同原文，"
+                f"去重率 {dedup_stats['dedup_ratio']:.1%}"
+            )
+        if dedup_stats.get('unique_sentences'):
+            st.caption(
+                f"✂️ 句子级缓存：{dedup_stats['sentences']:,} 个句子中共 {dedup_stats['unique_sentences']:,} 条不同句子，"
+                f"缓存命中 {dedup_stats['sentence_cache_hits']:,} 条（命中率 {dedup_stats['sentence_hit_rate']:.1%}）"
+            )
+        
+        # 显示缓存统计
+        memory_stats = get_memory_cache_stats()
+        st.markdown("""
+        <div style="background: rgba(33, 150, 243, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid #2196F3;">
+            <h4 style="color: #2196F3; margin-bottom: 0.5rem;">💾 内存缓存统计</h4>
+            <div style="display: flex; justify-content: space-between; font-size: 0.9rem;">
+                <span>有效缓存: {valid_items}</span>
+                <span>占用内存: {used_mb:.1f}MB</span>
+                <span>命中率: {hit_rate:.1%}</span>
+                <span>累计淘汰: {evictions}</span>
+                <span>累计过期清理: {expirations}</span>
+                <span>TTL: {ttl_hours}小时</span>
             </div>
-            """.format(
-                valid_items=memory_stats['valid_items'],
-                expired_items=memory_stats['expired_items'],
-                max_size=memory_stats['max_size'],
-                ttl_hours=memory_stats['ttl_hours']
-            ), unsafe_allow_html=True)
-
-            # 显示翻译后的数据预览
-            with st.expander("📋 查看翻译结果预览", expanded=True):
-                # 选择要显示的列
-                display_columns = []
-                for col in selected_columns:
-                    display_columns.extend([col, f"{col}_中文"])
-
-                # 添加其他重要列
-                important_cols = ['ID', 'Asin', 'Brand', 'Rating', 'Review Type']
-                for col in important_cols:
-                    if col in df_translated.columns and col not in display_columns:
-                        display_columns.append(col)
-
-                # 重新排序列
-                final_columns = []
-                for col in df_translated.columns:
-                    if col in display_columns:
-                        final_columns.append(col)
-
-                preview_df = df_translated[final_columns].head(10)
-                st.dataframe(preview_df, use_container_width=True)
-
-        except Exception as e:
-            st.error(f"翻译过程中出错: {str(e)}")
-            progress_bar.empty()
-            status_text.empty()
+        </div>
+        """.format(
+            valid_items=memory_stats['valid_items'],
+            used_mb=memory_stats['total_bytes'] / (1024 * 1024),
+            hit_rate=memory_stats['hit_rate'],
+            evictions=memory_stats['evictions'],
+            expirations=memory_stats['expirations'],
+            ttl_hours=memory_stats['ttl_hours']
+        ), unsafe_allow_html=True)
+
+        # 显示翻译后的数据预览
+        with st.expander("📋 查看翻译结果预览", expanded=True):
+            # 选择要显示的列
+            display_columns = []
+            for col in summary['selected_columns']:
+                display_columns.extend([col, f"{col}_中文"])
+
+            # 添加其他重要列
+            important_cols = ['ID', REVIEW_KEY_COLUMN, 'Asin', 'Brand', 'Rating', 'Review Type']
+            for col in important_cols:
+                if col in df_translated.columns and col not in display_columns:
+                    display_columns.append(col)
+
+            # 重新排序列
+            final_columns = []
+            for col in df_translated.columns:
+                if col in display_columns:
+                    final_columns.append(col)
+
+            preview_df = df_translated[final_columns].head(10)
+            st.dataframe(preview_df, use_container_width=True)
 
     # 如果已有翻译结果，显示下载选项
     if 'translated_df' in st.session_state and st.session_state.translated_df is not None:
@@ -831,59 +851,32 @@ def main():
 
         df_translated = st.session_state.translated_df
 
-        col1, col2 = st.columns(2)
-
-        with col1:
-            file_format = st.radio(
-                "选择下载格式",
-                ["Excel", "TXT"],
-                help="选择适合的文件格式"
-            )
-
-        with col2:
-            include_original = st.checkbox(
-                "包含原始英文列",
-                value=True,
-                help="是否在下载文件中包含原始英文列"
-            )
+        include_original = st.checkbox(
+            "包含原始英文列",
+            value=True,
+            help="是否在下载文件中包含原始英文列"
+        )
 
-        # 准备下载数据
+        # 准备下载的列
         if include_original:
-            download_df = df_translated
+            download_columns = None
         else:
             # 只保留中文列和其他非翻译列
             chinese_columns = [col for col in df_translated.columns if col.endswith('_中文')]
             other_columns = [col for col in df_translated.columns if not col.endswith('_中文') and col not in selected_columns]
-            download_df = df_translated[other_columns + chinese_columns]
+            download_columns = other_columns + chinese_columns
 
-        # 下载按钮
+        # 下载按钮：表格格式之外，数据量较大时可以选择压缩的TXT
+        formats = TABLE_DOWNLOAD_FORMATS + ['txt', 'txt.gz'] + (['txt.zst'] if is_zstd_available() else [])
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            if file_format == "Excel":
-                file_data = get_download_data(download_df, 'excel')
-                st.download_button(
-                    label="📥 下载翻译结果 (Excel)",
-                    data=file_data,
-                    file_name=f"translated_reviews_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    type="primary",
-                    use_container_width=True
-                )
-            else:
-                file_data = get_download_data(download_df, 'txt')
-                st.download_button(
-                    label="📥 下载翻译结果 (TXT)",
-                    data=file_data,
-                    file_name=f"translated_reviews_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                    mime="text/plain",
-                    type="primary",
-                    use_container_width=True
-                )
+            render_download_button(df_translated, "translated_reviews", label="📥 下载翻译结果", formats=formats, key="translation", columns=download_columns, primary=True)
 
         # 清除翻译结果按钮
         if st.button("🗑️ 清除翻译结果", use_container_width=True):
             if 'translated_df' in st.session_state:
                 del st.session_state.translated_df
+            st.session_state.pop('translation_summary', None)
             st.rerun()
 
 if __name__ == "__main__":
@@ -7,7 +7,9 @@ from utils import (
     create_rating_heatmap,
     create_rating_trend_chart,
     save_fig_to_html,
-    create_rating_pie_chart
+    create_rating_pie_chart,
+    load_page_dataset,
+    PROCESSED_COLUMN_ORDER
 )
 import plotly.express as px
 import plotly.graph_objects as go
@@ -208,17 +210,17 @@ def main():
         uploaded_file = st.file_uploader(
             "选择预处理后的Excel文件", 
             type=['xlsx'],
-            help="请确保文件包含必要的列：ID, Asin, Title, Content, Model, Rating, Date, Review Type"
+            help="请确保文件包含必要的列：ID, Asin, Title, Content, Model, Rating, Date, Review Type。已在首页处理过数据时可不上传"
         )
         st.markdown('</div>', unsafe_allow_html=True)
     
-    if uploaded_file is not None:
+    with st.spinner('正在加载和验证数据...'):
+        df = load_page_dataset(uploaded_file, columns=PROCESSED_COLUMN_ORDER)
+    
+    if df is not None:
         try:
             # 显示文件信息
-            st.success("✅ 文件上传成功！正在处理数据...")
-            
-            with st.spinner('正在加载和验证数据...'):
-                df = pd.read_excel(uploaded_file)
+            st.success("✅ 数据加载成功！正在处理数据...")
             
             # 验证是否是预处理后的文件
             required_columns = ['ID', 'Asin', 'Title', 'Content', 'Model', 'Rating', 'Date', 'Review Type']
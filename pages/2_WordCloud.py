@@ -17,6 +17,7 @@ import plotly.graph_objects as go
 import json
 import os
 import io
+from utils import load_page_dataset
 
 # 添加自定义CSS样式 - 更新下载按钮为蓝色系
 st.markdown("""
@@ -279,22 +280,22 @@ def main():
         uploaded_file = st.file_uploader(
             "选择预处理后的Excel文件", 
             type=['xlsx'],
-            help="请确保文件包含必要的列：ID, Asin, Title, Content, Model, Rating, Date, Review Type"
+            help="请确保文件包含必要的列：ID, Asin, Title, Content, Model, Rating, Date, Review Type。已在首页处理过数据时可不上传"
         )
         st.markdown('</div>', unsafe_allow_html=True)
+    
+    with st.spinner('正在加载数据...'):
+        df = load_page_dataset(uploaded_file, columns=['Content', 'Review Type'])
             
-    if uploaded_file is not None:
+    if df is not None:
         try:
-            with st.spinner('正在加载数据...'):
-                df = pd.read_excel(uploaded_file)
-            
             # 验证文件格式
             required_columns = ['Content', 'Review Type']
             if not all(col in df.columns for col in required_columns):
                 st.error("❌ 请上传包含Content和Review Type列的预处理文件！")
                 return
             
-            st.success(f"✅ 文件上传成功！共 {len(df)} 条评论")
+            st.success(f"✅ 数据加载成功！共 {len(df)} 条评论")
             
             # 选择评论类型
             st.markdown("### 🔍 选择分析范围")
@@ -449,7 +450,7 @@ def main():
         except Exception as e:
             st.error(f"❌ 处理文件时出错: {str(e)}")
     else:
-        st.info("ℹ️ 请上传预处理后的Excel文件开始分析")
+        st.info("ℹ️ 请上传预处理后的Excel文件，或先在首页处理数据后开始分析")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
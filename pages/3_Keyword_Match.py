@@ -2,7 +2,7 @@ import streamlit as st
 import re
 
 # ========== 如需使用 Deepseek，必须 pip install --upgrade openai 至 1.x 版本 ==========
-from utils import get_download_data
+from utils import render_download_button, load_page_dataset, save_results_to_active_dataset, analyze_reviews, get_frame_fingerprint, REVIEW_KEY_COLUMN
 
 # 设置页面配置必须是第一个st命令
 st.set_page_config(
@@ -148,70 +148,6 @@ def create_match_visualization(df, keywords):
     
     return fig, word_freq
 
-def analyze_reviews(df, categories):
-    """分析评论并进行分类"""
-    # 创建结果DataFrame，保留ID列
-    results = pd.DataFrame()
-    results['ID'] = df['ID']  # 保留原始ID
-    results['Content'] = df['Content']
-    results['Original Review Type'] = df['Review Type']
-
-    # 检查并保留翻译内容列
-    translation_col_candidates = ['Content_zh', '翻译内容', 'Translation', 'content_zh', 'translated_content']
-    for col in translation_col_candidates:
-        if col in df.columns:
-            results[col] = df[col]
-            break  # 只保留第一个检测到的翻译列
-
-    # 预处理文本数据，提高性能
-    text_series = df['Content'].astype(str).str.lower()
-    
-    # 为每个类别创建一列（列名为"是否{main_category}-{sub_category}"）
-    for main_category, sub_categories in categories.items():
-        if isinstance(sub_categories, dict):  # 新格式
-            for sub_category, keywords in sub_categories.items():
-                # 将关键词字符串转换为列表
-                keyword_list = [k.strip() for k in keywords.split(',') if k.strip()]
-                
-                # 使用向量化操作替代apply
-                matches = []
-                for text in text_series:
-                    has_match = any(k.lower() in text for k in keyword_list)
-                    matches.append(has_match)
-                
-                results[f'是否{main_category}-{sub_category}'] = matches
-        else:  # 旧格式
-            # 将关键词字符串转换为列表
-            keyword_list = [k.strip() for k in sub_categories.split(',') if k.strip()]
-            
-            # 使用向量化操作替代apply
-            matches = []
-            for text in text_series:
-                has_match = any(k.lower() in text for k in keyword_list)
-                matches.append(has_match)
-            
-            results[f'是否{main_category}'] = matches
-
-    # 统计每个类别的匹配数量
-    stats = {}
-    for main_category, sub_categories in categories.items():
-        stats[main_category] = {}
-        if isinstance(sub_categories, dict):  # 新格式
-            for sub_category in sub_categories:
-                matched = results[f'是否{main_category}-{sub_category}'].sum()
-                stats[main_category][sub_category] = {
-                    'matched': int(matched),
-                    'percentage': round(matched / len(df) * 100, 2)
-                }
-        else:  # 旧格式
-            matched = results[f'是否{main_category}'].sum()
-            stats[main_category] = {
-                'matched': int(matched),
-                'percentage': round(matched / len(df) * 100, 2)
-            }
-
-    return results, stats
-
 def analyze_keyword_frequency(df, categories):
     """分析每个类别的关键词匹配频率"""
     keyword_stats = {}
@@ -439,13 +375,14 @@ def main():
     uploaded_file = st.file_uploader(
         "选择预处理后的Excel文件", 
         type=['xlsx'],
-        help="请上传包含ID、Content和Review Type列的Excel文件"
+        help="请上传包含ID、Content和Review Type列的Excel文件。已在首页处理过数据时可不上传"
     )
-    if uploaded_file is not None:
+    with st.spinner('正在处理文件...'):
+        # 只读取关键词匹配用到的列（包括已有的翻译列）
+        df = load_page_dataset(uploaded_file, columns=['ID', REVIEW_KEY_COLUMN, 'Content', 'Review Type'], include_translations=True)
+    if df is not None:
         try:
-            with st.spinner('正在处理文件...'):
-                df = pd.read_excel(uploaded_file)
-            st.success(f"✅ 文件上传成功！共 {len(df)} 条评论")
+            st.success(f"✅ 数据加载成功！共 {len(df)} 条评论")
             st.markdown("""
             <div style='background: #e3f2fd; border-radius: 10px; padding: 1.2rem; margin-bottom: 1.2rem; box-shadow: 0 2px 8px rgba(33,150,243,0.08);'>
                 <h4 style='color: #1976d2; margin: 0;'>📝 原始评论表格</h4>
@@ -672,19 +609,26 @@ def main():
                     display_df[col] = results[col]
                 st.markdown("### 📝 匹配后结果表格（含标签）")
                 st.dataframe(display_df, use_container_width=True)
+                
+                # 使用首页共享数据集时，按评论主键把标签列写回数据集；标签没有变化时（如只调整了显示选项）不重复写入
+                if uploaded_file is None and REVIEW_KEY_COLUMN in results.columns:
+                    label_fingerprint = (
+                        st.session_state.get('dataset_key'),
+                        get_frame_fingerprint(results[[REVIEW_KEY_COLUMN] + label_cols])
+                    )
+                    if st.session_state.get('keyword_labels_saved') == label_fingerprint:
+                        st.caption("💾 关键词标签已按评论主键保存到当前数据集")
+                    elif save_results_to_active_dataset(results, label_cols):
+                        st.session_state['keyword_labels_saved'] = label_fingerprint
+                        st.caption("💾 关键词标签已按评论主键保存到当前数据集")
 
                 # 保留原有的关键词匹配结果下载功能
                 st.markdown("### 📥 下载匹配结果")
-                st.download_button(
-                    label="📥 下载匹配结果",
-                    data=get_download_data(df, 'excel'),
-                    file_name="keyword_match_results.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                render_download_button(display_df, "keyword_match_results", label="📥 下载匹配结果", key="keyword")
         except Exception as e:
             st.error(f"❌ 处理文件时出错: {str(e)}")
     else:
-        st.info("👆 请上传包含ID、Content和Review Type列的Excel文件。上传后可直接进行关键词匹配和统计。")
+        st.info("👆 请上传包含ID、Content和Review Type列的Excel文件，或先在首页处理数据。之后可直接进行关键词匹配和统计。")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
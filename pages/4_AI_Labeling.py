@@ -1,6 +1,36 @@
 import streamlit as st
 import pandas as pd
-from utils import get_ai_cache_key, load_ai_label_from_cache, save_ai_label_to_cache, call_ai_model, get_download_data
+from utils import call_ai_model, render_download_button, load_page_dataset, save_results_to_active_dataset, reattach_results, ai_label_dataframe, render_job_list
+from job_runner import job_runner, get_job_owner
+import copy
+
+def run_ai_label_task(df, ai_settings, ai_model, api_key, max_workers, job=None):
+    """后台任务：批量AI标注，进度写入任务对象（在工作线程中运行，不能调用st）"""
+    def on_progress(task_name, processed, pending, skipped, task_count, total_tasks):
+        job.update_progress(task_name=task_name, processed=processed, pending=pending, skipped=skipped,
+                            task_count=task_count, total_tasks=total_tasks)
+    
+    return ai_label_dataframe(df, ai_settings, ai_model, api_key, max_workers=max_workers,
+                              progress_callback=on_progress, cancel_event=job.cancel_event)
+
+@st.fragment(run_every=1)
+def render_ai_label_progress():
+    """后台标注任务的进度面板：每秒只刷新这一部分，任务结束后重新运行整个页面以显示结果"""
+    job_id = st.session_state.get('ai_label_job_id')
+    job = job_runner.get(job_id) if job_id else None
+    if job is None or job.is_finished:
+        st.rerun()
+    
+    progress_info = job.progress
+    total_tasks = progress_info.get('total_tasks', 0)
+    st.progress(progress_info.get('task_count', 0) / total_tasks if total_tasks else 0.0)
+    if job.status == 'queued':
+        st.info("⏳ AI标注任务排队中，当前有其他任务正在运行...")
+    elif progress_info:
+        st.info(f"任务 '{progress_info['task_name']}' 已处理 {progress_info['processed']}/{progress_info['pending']}"
+                f"（跳过已有标签 {progress_info['skipped']} 条） | 总进度 {progress_info['task_count']}/{total_tasks}")
+    if st.button("⏹️ 取消标注", key="cancel_ai_label_job"):
+        job_runner.cancel(job.job_id)
 
 st.set_page_config(
     page_title="Amazon评论分析 - AI批量标注",
@@ -106,14 +136,16 @@ with st.sidebar:
 uploaded_file = st.file_uploader(
     "选择预处理后的Excel文件", 
     type=['xlsx'],
-    help="请上传包含ID、Content和Review Type列的Excel文件"
+    help="请上传包含ID、Content和Review Type列的Excel文件。已在首页处理过数据时可不上传"
 )
 
-if uploaded_file is not None:
+with st.spinner('正在处理文件...'):
+    # AI任务的数据源列可以是任意列，因此读取全部列
+    df = load_page_dataset(uploaded_file)
+
+if df is not None:
     try:
-        with st.spinner('正在处理文件...'):
-            df = pd.read_excel(uploaded_file)
-        st.success(f"✅ 文件上传成功！共 {len(df)} 条评论")
+        st.success(f"✅ 数据加载成功！共 {len(df)} 条评论")
         st.dataframe(df, use_container_width=True)
 
         # ========== AI批量标注功能 ========== #
@@ -168,89 +200,69 @@ if uploaded_file is not None:
             st.session_state['ai_settings'] = ai_settings
             st.rerun()
         
-        # 批量执行AI标注
-        if st.button("🚀 批量AI标注", type="primary", use_container_width=True):
+        # 刷新页面后接回仍在运行的标注任务
+        render_job_list('ai_label', 'ai_label_job_id')
+        
+        # 批量执行AI标注（在后台任务中运行，页面重新运行或切换控件不会中断标注）
+        if st.button("🚀 批量AI标注", type="primary", use_container_width=True,
+                     disabled='ai_label_job_id' in st.session_state):
             if not api_key:
                 st.error("请填写API Key")
             elif not ai_settings:
                 st.error("请至少添加一个AI任务")
             else:
-                from concurrent.futures import ThreadPoolExecutor, as_completed
-                import time
-                
-                progress = st.progress(0)
-                status = st.empty()
-                df_result = df.copy()
+                # 上传的文件与首页数据集有相同评论时，按评论主键直接复用已有标签
+                shared_df = st.session_state.get('processed_data')
+                if uploaded_file is not None and shared_df is not None:
+                    for setting in ai_settings:
+                        if setting["col_name"] in shared_df.columns:
+                            reattached = reattach_results(df, shared_df, [setting["col_name"]])
+                            if reattached:
+                                st.caption(f"♻️ 任务 '{setting['name']}' 按评论主键复用了 {reattached} 条已有标签")
                 
-                total_tasks = len(df) * len(ai_settings)
-                task_count = 0
-                
-                def ai_label_worker(row, prompt_template, source_col, ai_model, api_key):
-                    try:
-                        # 构建包含所有列数据的字典
-                        row_data = {col: str(row[col]) for col in df.columns}
-                        # 格式化提示词
-                        try:
-                            if "{Content}" in prompt_template:
-                                formatted_prompt = prompt_template.format(Content=str(row[source_col]))
-                            elif "{text}" in prompt_template:
-                                formatted_prompt = prompt_template.format(text=str(row[source_col]))
-                            else:
-                                formatted_prompt = prompt_template
-                        except Exception:
-                            formatted_prompt = prompt_template
-                        
-                        # 使用源列内容作为主要文本
-                        text_content = str(row[source_col])
-                        
-                        cache_key = get_ai_cache_key(text_content, formatted_prompt, ai_model)
-                        label = load_ai_label_from_cache(cache_key)
-                        if label is None:
-                            label = call_ai_model(text_content, formatted_prompt, ai_model, api_key)
-                            save_ai_label_to_cache(cache_key, label)
-                        return label
-                    except Exception as e:
-                        return f"[AI异常: {str(e)[:30]}]"
-                
-                # 为每个AI任务处理数据
-                for setting_idx, setting in enumerate(ai_settings):
-                    col_name = setting["col_name"]
-                    prompt_template = setting["prompt"]
-                    source_col = setting["source_col"]
-                    
-                    status.info(f"正在处理任务 '{setting['name']}' ({setting_idx+1}/{len(ai_settings)})")
-                    
-                    ai_labels = [None] * len(df)
-                    
-                    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                        futures = {
-                            executor.submit(ai_label_worker, row, prompt_template, source_col, ai_model, api_key): idx
-                            for idx, (_, row) in enumerate(df.iterrows())
+                try:
+                    st.session_state['ai_label_job_id'] = job_runner.submit(
+                        run_ai_label_task, df, copy.deepcopy(ai_settings), ai_model, api_key, max_workers,
+                        owner=get_job_owner(), kind='ai_label',
+                        description=f"AI标注 {', '.join(setting['name'] for setting in ai_settings)}",
+                        context={
+                            'label_columns': [setting["col_name"] for setting in ai_settings],
+                            'save_to_dataset': uploaded_file is None,
+                            'dataset_key': st.session_state.get('dataset_key')
                         }
-                        
-                        for i, future in enumerate(as_completed(futures)):
-                            idx = futures[future]
-                            try:
-                                ai_labels[idx] = future.result()
-                            except Exception as e:
-                                ai_labels[idx] = f"[AI异常: {str(e)[:30]}]"
-                            
-                            task_count += 1
-                            progress.progress(task_count / total_tasks)
-                            status.info(f"任务 '{setting['name']}' 已处理 {i+1}/{len(df)} | 总进度 {task_count}/{total_tasks}")
-                    
-                    df_result[col_name] = ai_labels
-                
-                st.success("✅ AI批量标注完成！")
-                st.dataframe(df_result, use_container_width=True)
-                st.download_button(
-                    label="📥 下载带AI标签的表格",
-                    data=get_download_data(df_result, 'excel'),
-                    file_name="ai_labeled_results.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
+                    )
+                    st.session_state.pop('ai_label_result', None)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"提交AI标注任务失败: {str(e)}")
+        
+        # 查询后台标注任务的状态：运行中只刷新进度面板，结束后处理结果
+        if 'ai_label_job_id' in st.session_state:
+            job = job_runner.get(st.session_state['ai_label_job_id'])
+            if job is None:
+                del st.session_state['ai_label_job_id']
+            elif not job.is_finished:
+                render_ai_label_progress()
+            else:
+                del st.session_state['ai_label_job_id']
+                context = job.context
+                if job.status == 'succeeded':
+                    st.session_state['ai_label_result'] = job.result
+                    # 使用共享数据集时，将标签写回提交任务时的数据集，下次只需标注新增评论
+                    if context.get('save_to_dataset') and context.get('dataset_key') == st.session_state.get('dataset_key'):
+                        if save_results_to_active_dataset(job.result, context['label_columns']):
+                            st.info("💾 AI标签已保存到当前数据集")
+                elif job.status == 'cancelled':
+                    st.warning("⏹️ AI标注任务已取消")
+                else:
+                    st.error(f"❌ AI标注出错: {job.error}")
+        
+        if st.session_state.get('ai_label_result') is not None:
+            df_result = st.session_state['ai_label_result']
+            st.success("✅ AI批量标注完成！")
+            st.dataframe(df_result, use_container_width=True)
+            render_download_button(df_result, "ai_labeled_results", label="📥 下载带AI标签的表格", key="ai_label")
     except Exception as e:
         st.error(f"❌ 处理文件时出错: {str(e)}")
 else:
-    st.info("👆 请上传包含ID、Content和Review Type列的Excel文件。上传后可进行AI批量标签/结论生成。") 
\ No newline at end of file
+    st.info("👆 请上传包含ID、Content和Review Type列的Excel文件，或先在首页处理数据。之后可进行AI批量标签/结论生成。") 
\ No newline at end of file
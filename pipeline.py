@@ -0,0 +1,418 @@
+"""
+命令行批处理流水线：数据预处理 → 翻译 → 关键词匹配 → AI标注
+
+适合夜间无人值守运行大批量数据，不依赖浏览器会话。每个步骤完成后都会保存检查点，
+中断后使用相同参数重新运行即可从上次进度继续。
+
+示例:
+    python pipeline.py reviews/ --brand-file brand.xlsx --translate-columns Title,Content \
+        --categories config/categories.json --ai-tasks ai_tasks.json --ai-model Deepseek
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from utils import (
+    read_review_files_parallel,
+    merge_review_frames,
+    process_data,
+    load_brand_index,
+    update_brand_index,
+    get_content_hash,
+    get_frame_fingerprint,
+    write_excel_file,
+    translate_dataframe,
+    TRANSLATION_WORKERS,
+    TRANSLATION_ERROR_PREFIX,
+    analyze_reviews,
+    ai_label_dataframe,
+)
+
+PIPELINE_DIR = "pipeline_runs"
+PIPELINE_STAGES = ['ingest', 'translate', 'keyword', 'ai']
+CHECKPOINT_ROWS = 500  # 翻译/AI标注每处理多少行保存一次检查点
+REVIEW_FILE_PATTERNS = ['*.xlsx', '*.csv']
+
+def log(message):
+    """输出带时间的日志"""
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", flush=True)
+
+def collect_input_files(input_path):
+    """收集要处理的评论文件：可以是单个文件或文件夹"""
+    if os.path.isdir(input_path):
+        paths = []
+        for pattern in REVIEW_FILE_PATTERNS:
+            paths.extend(glob.glob(os.path.join(input_path, pattern)))
+        # 忽略Excel打开时产生的临时文件
+        return sorted(path for path in paths if not os.path.basename(path).startswith('~$'))
+    return [input_path]
+
+def read_file_bytes(path):
+    """读取文件内容"""
+    with open(path, "rb") as f:
+        return f.read()
+
+class PipelineRun:
+    """一次流水线运行的检查点目录和运行清单"""
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.manifest_path = os.path.join(run_dir, "manifest.json")
+        os.makedirs(run_dir, exist_ok=True)
+        self.manifest = {'stages': {}, 'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def save_manifest(self):
+        """原子写入运行清单"""
+        self.manifest['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def checkpoint_path(self, stage):
+        return os.path.join(self.run_dir, f"{stage}.parquet")
+
+    def save_checkpoint(self, stage, df):
+        """保存步骤检查点（先写临时文件，避免中断时留下损坏的文件）"""
+        path = self.checkpoint_path(stage)
+        df.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+    def load_checkpoint(self, stage):
+        path = self.checkpoint_path(stage)
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+        return None
+
+    def is_done(self, stage, options):
+        """步骤已完成且参数未变化时可以直接跳过"""
+        info = self.manifest['stages'].get(stage)
+        return bool(info) and info.get('status') == 'done' and info.get('options') == options \
+            and os.path.exists(self.checkpoint_path(stage))
+
+    def parts_dir(self, stage):
+        return os.path.join(self.run_dir, f"{stage}.parts")
+
+    def load_parts(self, stage, input_key):
+        """读取步骤未完成时保存的分段结果；输入数据或参数变化时丢弃旧的分段，返回[(分段信息, 分段数据)]"""
+        partial = self.manifest.setdefault('partial', {})
+        info = partial.get(stage)
+        if info is None or info.get('input') != input_key:
+            self.clear_parts(stage)
+            partial[stage] = {'input': input_key, 'parts': []}
+            self.save_manifest()
+            return []
+        parts = []
+        for part in info['parts']:
+            path = os.path.join(self.parts_dir(stage), part['file'])
+            if os.path.exists(path):
+                parts.append((part, pd.read_parquet(path)))
+        return parts
+
+    def save_part(self, stage, batch_no, result, ok):
+        """追加保存一批的结果（含行号），并记录到运行清单"""
+        info = self.manifest['partial'][stage]
+        file_name = f"part-{len(info['parts']) + 1:05d}.parquet"
+        path = os.path.join(self.parts_dir(stage), file_name)
+        os.makedirs(self.parts_dir(stage), exist_ok=True)
+        result.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        info['parts'].append({'file': file_name, 'batch': batch_no, 'rows': len(result), 'ok': bool(ok)})
+        self.save_manifest()
+
+    def clear_parts(self, stage):
+        """删除步骤的分段结果"""
+        import shutil
+
+        shutil.rmtree(self.parts_dir(stage), ignore_errors=True)
+        if self.manifest.get('partial', {}).pop(stage, None) is not None:
+            self.save_manifest()
+
+    def mark(self, stage, status, options, rows, seconds):
+        self.manifest['stages'][stage] = {
+            'status': status,
+            'options': options,
+            'rows': rows,
+            'seconds': round(seconds, 2),
+            'checkpoint': os.path.basename(self.checkpoint_path(stage)),
+        }
+        self.save_manifest()
+
+def apply_batch_result(df, result):
+    """把一批的结果列按行号写回数据"""
+    rows = result['row'].to_numpy()
+    for col in result.columns:
+        if col == 'row':
+            continue
+        if col not in df.columns:
+            df[col] = None
+        df.loc[rows, col] = result[col].values
+
+def run_in_batches(run, stage, df, process_batch, checkpoint_rows, options=None, batch_ok=None):
+    """分批处理，每批的结果追加保存为一个分段文件并记录在运行清单中，中断后重新运行时只处理未完成的批次
+
+    batch_ok(结果)返回False的批次（如有翻译失败的行）视为未完成，重新运行时再处理一次，
+    处理函数会跳过其中已有结果的行。
+    """
+    df = df.reset_index(drop=True)
+    input_key = {'input': get_frame_fingerprint(df), 'checkpoint_rows': checkpoint_rows, 'options': options}
+    finished_batches = {}
+    for part, result in run.load_parts(stage, input_key):
+        apply_batch_result(df, result)
+        finished_batches[part['batch']] = part['ok']
+    if finished_batches:
+        log(f"{stage}: 从未完成的检查点继续，已完成 {sum(finished_batches.values())} 批")
+
+    total = len(df)
+    for batch_no, start in enumerate(range(0, total, checkpoint_rows)):
+        if finished_batches.get(batch_no):
+            continue
+        batch = df.iloc[start:start + checkpoint_rows]
+        result = process_batch(batch).reset_index(drop=True)
+        result.insert(0, 'row', batch.index.to_numpy())
+        apply_batch_result(df, result)
+        run.save_part(stage, batch_no, result, batch_ok(result) if batch_ok else True)
+        log(f"{stage}: {min(start + checkpoint_rows, total)}/{total} 行已完成并保存检查点")
+
+    run.clear_parts(stage)
+    return df
+
+def stage_ingest(args, paths):
+    """读取并合并评论文件，完成数据预处理和品牌关联"""
+    files = [(os.path.basename(path), read_file_bytes(path)) for path in paths]
+    frames, report = read_review_files_parallel(files, max_workers=args.ingest_workers)
+    print(report.to_string(index=False))
+    raw_df, duplicate_rows = merge_review_frames(frames)
+    if raw_df is None:
+        raise Exception("没有成功读取任何评论文件")
+    if duplicate_rows:
+        log(f"ingest: 合并去重 {duplicate_rows} 条重复评论")
+
+    # 品牌索引只在导入入口处更新，process_data本身不修改持久化索引
+    brand_index = None
+    if args.brand_file:
+        read = pd.read_csv if args.brand_file.lower().endswith('.csv') else pd.read_excel
+        brand_df = read(args.brand_file)
+        if 'ASIN' not in brand_df.columns or 'Brand' not in brand_df.columns:
+            raise Exception("品牌文件缺少必要的列: ASIN, Brand")
+        brand_index = update_brand_index(brand_df)
+    elif args.use_brand_index:
+        brand_index = load_brand_index()
+        if not brand_index['asin'] and not brand_index['parent_asin']:
+            brand_index = None
+
+    df = process_data(raw_df, brand_index=brand_index)
+    if df is None:
+        raise Exception("评论文件缺少必要的列")
+    return df
+
+def stage_translate(args, run, df):
+    """翻译指定的文本列"""
+    columns = [col for col in args.translate_columns if col in df.columns]
+
+    def process_batch(batch):
+        dedup_stats = {}
+        translated, _, error_count, _ = translate_dataframe(
+            batch, columns, engine=args.engine, secret_id=args.secret_id, secret_key=args.secret_key,
+            rate_limit=args.rate_limit, max_workers=args.translate_workers, stats=dedup_stats,
+            sentence_mode=args.sentence_mode
+        )
+        if dedup_stats.get('pending_cells'):
+            log(f"translate: {dedup_stats['pending_cells']} 个单元格去重后 {dedup_stats['unique_texts']} 条原文 "
+                f"(去重率 {dedup_stats['dedup_ratio']:.1%})")
+        if dedup_stats.get('unique_sentences'):
+            log(f"translate: {dedup_stats['unique_sentences']} 条不同句子，句子级缓存命中 "
+                f"{dedup_stats['sentence_cache_hits']} 条 ({dedup_stats['sentence_hit_rate']:.1%})")
+        if error_count:
+            log(f"translate: 本批 {error_count} 行翻译失败，重新运行时会重试")
+        return translated[[f"{col}_中文" for col in columns]]
+
+    def batch_ok(result):
+        values = result.drop(columns=['row']).astype(str)
+        return not values.apply(lambda col: col.str.startswith(TRANSLATION_ERROR_PREFIX)).any().any()
+
+    return run_in_batches(run, 'translate', df, process_batch, args.checkpoint_rows,
+                          options=stage_options(args, 'translate'), batch_ok=batch_ok)
+
+def stage_keyword(args, df):
+    """按关键词类别为评论打标签"""
+    with open(args.categories, "r", encoding="utf-8") as f:
+        categories = json.load(f)
+    results, stats = analyze_reviews(df, categories)
+    label_cols = [col for col in results.columns if col.startswith('是否')]
+    for col in label_cols:
+        df[col] = results[col].values
+    for main_category, sub_stats in stats.items():
+        if 'matched' in sub_stats:
+            log(f"keyword: {main_category} 匹配 {sub_stats['matched']} 条 ({sub_stats['percentage']}%)")
+            continue
+        for sub_category, item in sub_stats.items():
+            log(f"keyword: {main_category}-{sub_category} 匹配 {item['matched']} 条 ({item['percentage']}%)")
+    return df
+
+def stage_ai(args, run, df):
+    """按AI任务配置批量生成标签"""
+    with open(args.ai_tasks, "r", encoding="utf-8") as f:
+        ai_settings = json.load(f)
+    label_columns = [setting['col_name'] for setting in ai_settings]
+
+    def process_batch(batch):
+        labeled = ai_label_dataframe(batch, ai_settings, args.ai_model, args.ai_api_key, max_workers=args.ai_workers)
+        return labeled[label_columns]
+
+    return run_in_batches(run, 'ai', df, process_batch, args.checkpoint_rows, options=stage_options(args, 'ai'))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Amazon评论批处理流水线：预处理 → 翻译 → 关键词匹配 → AI标注")
+    parser.add_argument("input", help="Shulex评论文件（xlsx/csv）或包含多个评论文件的文件夹")
+    parser.add_argument("--output", help="结果文件路径（.xlsx或.parquet），默认保存在运行目录中")
+    parser.add_argument("--run-dir", help=f"检查点目录，默认 {PIPELINE_DIR}/<输入文件内容哈希>")
+    parser.add_argument("--stages", default=",".join(PIPELINE_STAGES), help="要运行的步骤，逗号分隔（默认全部）")
+    parser.add_argument("--restart", action="store_true", help="忽略已有检查点，从头运行")
+    parser.add_argument("--checkpoint-rows", type=int, default=CHECKPOINT_ROWS, help="翻译/AI标注每处理多少行保存一次检查点")
+    # 预处理
+    parser.add_argument("--brand-file", help="品牌数据文件（Excel或CSV，包含ASIN和Brand列）")
+    parser.add_argument("--use-brand-index", action="store_true", help="未提供品牌文件时使用已保存的品牌索引")
+    parser.add_argument("--ingest-workers", type=int, default=None, help="并行解析文件的进程数")
+    # 翻译
+    parser.add_argument("--translate-columns", default="Title,Content", help="要翻译的列，逗号分隔")
+    parser.add_argument("--engine", choices=["google", "tencent"], default="google", help="翻译引擎")
+    parser.add_argument("--secret-id", default=os.environ.get("TENCENT_SECRET_ID"), help="腾讯翻译SecretId（默认读取环境变量TENCENT_SECRET_ID）")
+    parser.add_argument("--secret-key", default=os.environ.get("TENCENT_SECRET_KEY"), help="腾讯翻译SecretKey（默认读取环境变量TENCENT_SECRET_KEY）")
+    parser.add_argument("--rate-limit", type=float, default=None, help="翻译请求速率上限（次/秒），默认按引擎设置")
+    parser.add_argument("--translate-workers", type=int, default=TRANSLATION_WORKERS, help="翻译并发线程数")
+    parser.add_argument("--sentence-mode", action="store_true", help="按句子翻译，逐句复用翻译缓存")
+    # 关键词匹配
+    parser.add_argument("--categories", default="config/categories.json", help="关键词类别配置文件（与关键词匹配页面共用）")
+    # AI标注
+    parser.add_argument("--ai-tasks", help="AI任务配置JSON文件：[{name, col_name, prompt, source_col}]")
+    parser.add_argument("--ai-model", choices=["OpenAI", "Deepseek", "阿里千问"], default="Deepseek", help="AI模型")
+    parser.add_argument("--ai-api-key", default=os.environ.get("AI_API_KEY"), help="AI模型API Key（默认读取环境变量AI_API_KEY）")
+    parser.add_argument("--ai-workers", type=int, default=3, help="AI标注并发线程数")
+    args = parser.parse_args(argv)
+    args.stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    args.translate_columns = [col.strip() for col in args.translate_columns.split(",") if col.strip()]
+    unknown = [stage for stage in args.stages if stage not in PIPELINE_STAGES]
+    if unknown:
+        parser.error(f"未知的步骤: {unknown}，可选: {PIPELINE_STAGES}")
+    return args
+
+def stage_options(args, stage):
+    """影响步骤结果的参数，参数变化时该步骤需要重新运行"""
+    if stage == 'ingest':
+        return {'brand_file': args.brand_file, 'use_brand_index': args.use_brand_index}
+    if stage == 'translate':
+        return {'columns': args.translate_columns, 'engine': args.engine}
+    if stage == 'keyword':
+        return {'categories': args.categories}
+    return {'ai_tasks': args.ai_tasks, 'ai_model': args.ai_model}
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 命令行运行时没有Streamlit会话，屏蔽相关的提示日志
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    paths = collect_input_files(args.input)
+    if not paths or not all(os.path.exists(path) for path in paths):
+        log(f"❌ 未找到评论文件: {args.input}")
+        return 1
+
+    # 检查点目录按输入文件内容区分，相同输入再次运行会复用检查点
+    run_key = get_content_hash(*[read_file_bytes(path) for path in paths])
+    run = PipelineRun(args.run_dir or os.path.join(PIPELINE_DIR, run_key))
+    if args.restart:
+        run.manifest['stages'] = {}
+        for stage in list(run.manifest.get('partial', {})):
+            run.clear_parts(stage)
+    run.manifest['inputs'] = [os.path.abspath(path) for path in paths]
+    log(f"共 {len(paths)} 个评论文件，检查点目录: {run.run_dir}")
+
+    timings = []
+    df = None
+    previous_changed = False
+    for stage in PIPELINE_STAGES:
+        if stage not in args.stages:
+            continue
+        options = stage_options(args, stage)
+        if not previous_changed and run.is_done(stage, options):
+            df = run.load_checkpoint(stage)
+            log(f"{stage}: 已完成，使用检查点（{len(df)} 行）")
+            timings.append({'步骤': stage, '状态': '检查点', '行数': len(df), '耗时(秒)': 0.0})
+            continue
+
+        if stage == 'translate' and args.engine == 'tencent' and not (args.secret_id and args.secret_key):
+            log("translate: 未配置腾讯翻译密钥，跳过")
+            timings.append({'步骤': stage, '状态': '跳过', '行数': 0, '耗时(秒)': 0.0})
+            continue
+        if stage == 'keyword' and not os.path.exists(args.categories):
+            log(f"keyword: 未找到关键词配置 {args.categories}，跳过")
+            timings.append({'步骤': stage, '状态': '跳过', '行数': 0, '耗时(秒)': 0.0})
+            continue
+        if stage == 'ai' and not (args.ai_tasks and args.ai_api_key):
+            log("ai: 未提供AI任务配置或API Key，跳过")
+            timings.append({'步骤': stage, '状态': '跳过', '行数': 0, '耗时(秒)': 0.0})
+            continue
+
+        if df is None and stage != 'ingest':
+            # 从之前完成的最后一个步骤继续
+            for done_stage in reversed(PIPELINE_STAGES[:PIPELINE_STAGES.index(stage)]):
+                df = run.load_checkpoint(done_stage) if run.manifest['stages'].get(done_stage, {}).get('status') == 'done' else None
+                if df is not None:
+                    break
+            if df is None:
+                log(f"❌ {stage}: 没有可用的输入数据，请先运行 ingest 步骤")
+                return 1
+
+        log(f"{stage}: 开始")
+        start_time = time.time()
+        try:
+            if stage == 'ingest':
+                df = stage_ingest(args, paths)
+            elif stage == 'translate':
+                df = stage_translate(args, run, df)
+            elif stage == 'keyword':
+                df = stage_keyword(args, df)
+            else:
+                df = stage_ai(args, run, df)
+        except Exception as e:
+            elapsed = time.time() - start_time
+            run.mark(stage, 'failed', options, 0, elapsed)
+            log(f"❌ {stage}: 失败 - {str(e)}")
+            timings.append({'步骤': stage, '状态': '失败', '行数': 0, '耗时(秒)': round(elapsed, 2)})
+            break
+        elapsed = time.time() - start_time
+        run.save_checkpoint(stage, df)
+        run.mark(stage, 'done', options, len(df), elapsed)
+        # 上游步骤重新运行后，下游步骤的检查点也需要重新计算
+        previous_changed = True
+        log(f"{stage}: 完成，{len(df)} 行，耗时 {elapsed:.1f} 秒")
+        timings.append({'步骤': stage, '状态': '完成', '行数': len(df), '耗时(秒)': round(elapsed, 2)})
+
+    failed = [item['步骤'] for item in timings if item['状态'] == '失败']
+    if failed:
+        # 未完成的步骤不输出结果文件，避免把不完整的数据当作最终结果；重新运行时从检查点继续
+        log(f"❌ 步骤 {', '.join(failed)} 未完成，未保存结果文件，重新运行将从检查点继续")
+    elif df is not None:
+        output = args.output or os.path.join(run.run_dir, "result.xlsx")
+        if output.endswith('.parquet'):
+            df.to_parquet(output, index=False)
+        else:
+            write_excel_file(df, output)
+        log(f"结果已保存: {output}")
+
+    print("\n===== 各步骤耗时 =====")
+    print(pd.DataFrame(timings).to_string(index=False))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
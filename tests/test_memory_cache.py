@@ -0,0 +1,89 @@
+import sys
+
+import pytest
+
+import utils
+from utils import MemoryCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(utils.time, 'time', fake)
+    return fake
+
+def entry_size(key, value):
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+def test_lru_eviction_by_count():
+    cache = MemoryCache(max_size=3)
+    for key in 'abc':
+        cache.set(key, key)
+    cache.get('a')  # a变为最近访问
+    cache.set('d', 'd')
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['a', 'c', 'd']
+    assert cache.get_stats()['evictions'] == 1
+
+def test_overwrite_does_not_evict_other_entries():
+    cache = MemoryCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('b', 3)
+    assert cache.get('a') == 1 and cache.get('b') == 3
+    assert cache.get_stats()['evictions'] == 0
+
+def test_byte_budget_evicts_oldest_and_tracks_bytes():
+    value = 'x' * 100
+    budget = entry_size('k0', value) * 3
+    cache = MemoryCache(max_size=100, max_bytes=budget)
+    for i in range(5):
+        cache.set(f'k{i}', value)
+    stats = cache.get_stats()
+    assert stats['total_items'] == 3
+    assert stats['total_bytes'] == entry_size('k0', value) * 3 <= budget
+    assert cache.get('k0') is None and cache.get('k4') == value
+
+    cache.set('k4', 'y')
+    assert cache.get_stats()['total_bytes'] == entry_size('k0', value) * 2 + entry_size('k4', 'y')
+    cache.clear()
+    assert cache.get_stats()['total_bytes'] == 0
+
+def test_oversized_entry_is_rejected_without_clearing_cache():
+    cache = MemoryCache(max_size=100, max_bytes=1000)
+    cache.set('small', 'v')
+    cache.set('huge', 'x' * 5000)
+    stats = cache.get_stats()
+    assert cache.get('huge') is None
+    assert cache.get('small') == 'v'
+    assert stats['rejected'] == 1 and stats['evictions'] == 0
+    assert stats['total_bytes'] <= 1000
+
+def test_ttl_expiry_and_stats(clock):
+    cache = MemoryCache(max_size=1000, ttl_hours=1)
+    for i in range(200):
+        cache.set(i, i)
+    clock.now += 1800
+    cache.set('fresh', 1)
+    clock.now += 1801  # 前200条已过期，'fresh'仍有效
+
+    stats = cache.get_stats()
+    assert stats['valid_items'] == stats['total_items'] == 1
+    assert stats['expirations'] == 200
+    assert cache.get('fresh') == 1
+
+def test_expired_entry_is_a_miss(clock):
+    cache = MemoryCache(max_size=10, ttl_hours=1)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    clock.now += 3601
+    assert cache.get('a') is None
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
@@ -8,11 +8,15 @@ import time
 import json
 import pickle
 import os
+import sys
+import threading
 from datetime import datetime, timedelta
 
 # 内存缓存配置
-MEMORY_CACHE_SIZE = 2000  # 内存缓存最大条目数
+MEMORY_CACHE_SIZE = 20000  # 内存缓存最大条目数
+MEMORY_CACHE_MAX_MB = 64  # 内存缓存占用上限（MB），长评论译文较多时按字节数先行淘汰
 MEMORY_CACHE_TTL_HOURS = 24  # 内存缓存过期时间（小时）
+MEMORY_CACHE_SHARDS = 0  # 大于0时翻译缓存改用分段加锁的ShardedMemoryCache（先用bench_cache.py确认更快）
 
 def filter_dataframe(df, filters):
     """根据筛选条件过滤DataFrame"""
@@ -34,17 +38,17 @@ def filter_dataframe(df, filters):
     
     return filtered_df
 
-def process_data(df, brand_df=None):
-    """数据预处理函数"""
-    # 确保所需列存在
-    required_columns = ['Asin', 'Title', 'Content', 'Model', 'Rating', 'Date']
-    if not all(col in df.columns for col in required_columns):
-        st.error(f"缺少必要的列: {[col for col in required_columns if col not in df.columns]}")
-        return None
-    
-    # 只保留必要的列
-    df = df[required_columns].copy()
-    
+# 评论数据必需列与处理后的列顺序
+REQUIRED_REVIEW_COLUMNS = ['Asin', 'Title', 'Content', 'Model', 'Rating', 'Date']
+PROCESSED_COLUMN_ORDER = ['ID', 'Review Key', 'Asin', 'Brand', 'Title', 'Content', 'Model', 'Rating', 'Date', 'Review Type']
+
+# 用于识别重复评论的列（多个导出文件合并时去重）
+REVIEW_DEDUP_COLUMNS = ['Asin', 'Date', 'Title', 'Content']
+# 评论主键列：由评论内容计算的稳定指纹，同一评论在不同导出中保持一致
+REVIEW_KEY_COLUMN = 'Review Key'
+
+def normalize_reviews(df):
+    """评论数据标准化：数值/日期转换、文本去空格、评论类型分箱"""
     # 向量化操作
     df['Rating'] = pd.to_numeric(df['Rating'], errors='coerce')
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
@@ -54,89 +58,190 @@ def process_data(df, brand_df=None):
     for col in text_columns:
         df[col] = df[col].astype(str).str.strip()
     
-    # 添加ID列（确保唯一性）
-    df.insert(0, 'ID', range(1, len(df) + 1))
-    
     # 使用向量化操作替代apply
     df['Review Type'] = pd.cut(
         df['Rating'],
         bins=[-float('inf'), 2, 3, float('inf')],
         labels=['negative', 'neutral', 'positive']
     )
+    return df
+
+def compute_review_fingerprints(df):
+    """根据Asin+Date+Title+Content计算每条评论的指纹（向量化64位哈希），原始数据和处理后数据结果一致"""
+    dates = pd.to_datetime(df['Date'], errors='coerce')
+    key_df = pd.DataFrame({
+        'Asin': as_text_series(df['Asin']).astype(str).str.strip(),
+        'Date': dates.dt.strftime('%Y-%m-%d %H:%M:%S').fillna(''),
+        'Title': as_text_series(df['Title']).astype(str).str.strip(),
+        'Content': as_text_series(df['Content']).astype(str).str.strip()
+    })
+    return pd.util.hash_pandas_object(key_df, index=False)
+
+def format_hex64(values):
+    """把uint64数组向量化地格式化为16位小写十六进制字符串数组"""
+    import numpy as np
     
-    # 如果提供了品牌数据，进行关联
-    if brand_df is not None and 'ASIN' in brand_df.columns and 'Brand' in brand_df.columns:
-        # 清理品牌数据
-        brand_columns = ['ASIN', 'Brand']
-        if 'Parent ASIN' in brand_df.columns:
-            brand_columns.append('Parent ASIN')
-        
-        brand_df = brand_df[brand_columns].copy()
-        brand_df['ASIN'] = brand_df['ASIN'].astype(str).str.strip()
-        brand_df['Brand'] = brand_df['Brand'].astype(str).str.strip()
-        if 'Parent ASIN' in brand_df.columns:
-            brand_df['Parent ASIN'] = brand_df['Parent ASIN'].astype(str).str.strip()
-        
-        # 处理重复的ASIN，保留最新的品牌信息
-        brand_df = brand_df.drop_duplicates(subset=['ASIN'], keep='last')
-        
-        # 备份原始ID
-        original_ids = df['ID'].copy()
-        
-        # 第一轮：通过ASIN关联品牌信息
-        df = df.merge(brand_df[['ASIN', 'Brand']], left_on='Asin', right_on='ASIN', how='left')
-        
-        # 统计第一轮匹配结果
-        first_round_matches = df['Brand'].notna().sum()
-        
-        # 第二轮：如果第一轮没有匹配上，且存在Parent ASIN，则用Parent ASIN连接
-        if 'Parent ASIN' in brand_df.columns and first_round_matches < len(df):
-            # 找出第一轮没有匹配上的记录
-            unmatched_mask = df['Brand'].isna()
-            unmatched_df = df[unmatched_mask].copy()
-            
-            if len(unmatched_df) > 0:
-                # 创建Parent ASIN连接用的品牌数据
-                parent_brand_df = brand_df[brand_df['Parent ASIN'].notna()].copy()
-                parent_brand_df = parent_brand_df[['Parent ASIN', 'Brand']].rename(columns={'Parent ASIN': 'ASIN'})
-                
-                # 通过Parent ASIN进行第二轮连接
-                unmatched_df = unmatched_df.merge(parent_brand_df, left_on='Asin', right_on='ASIN', how='left', suffixes=('', '_parent'))
-                
-                # 更新原数据中未匹配的记录
-                df.loc[unmatched_mask, 'Brand'] = unmatched_df['Brand']
-                
-                # 清理多余的列
-                if 'ASIN_y' in df.columns:
-                    df = df.drop(columns=['ASIN_y'])
-                if 'ASIN_parent' in df.columns:
-                    df = df.drop(columns=['ASIN_parent'])
-        
-        # 恢复原始ID
-        df['ID'] = original_ids
-        
-        # 统计最终匹配结果
-        final_matches = df['Brand'].notna().sum()
-        total_records = len(df)
-        match_rate = (final_matches / total_records * 100) if total_records > 0 else 0
-        
-        st.success(f"✅ 成功关联品牌数据！")
-        st.info(f"📊 匹配统计：")
-        st.info(f"   - 总记录数：{total_records}")
-        st.info(f"   - 成功匹配：{final_matches}")
-        st.info(f"   - 匹配率：{match_rate:.1f}%")
-        
-        if 'Parent ASIN' in brand_df.columns:
-            st.info(f"   - 第一轮ASIN匹配：{first_round_matches}")
-            st.info(f"   - 第二轮Parent ASIN匹配：{final_matches - first_round_matches}")
+    digits = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+    # 按大端字节序拆成每行8个字节，每个字节查表得到两位十六进制字符
+    octets = np.ascontiguousarray(values, dtype='>u8').view(np.uint8).reshape(-1, 8)
+    chars = np.empty((len(octets), 16), dtype=np.uint8)
+    chars[:, 0::2] = digits[octets >> 4]
+    chars[:, 1::2] = digits[octets & 0x0F]
+    return chars.view('S16').ravel().astype(str)
+
+def compute_review_keys(df):
+    """计算评论主键：64位指纹的16位十六进制字符串（导出Excel后再读入也不会丢失精度）"""
+    fingerprints = compute_review_fingerprints(df)
+    return pd.Series(format_hex64(fingerprints.to_numpy()), index=df.index, dtype=object)
+
+def ensure_review_key(df):
+    """数据中缺少评论主键时补充计算（兼容旧版本导出的文件）"""
+    if REVIEW_KEY_COLUMN not in df.columns and all(col in df.columns for col in REVIEW_DEDUP_COLUMNS):
+        position = 1 if 'ID' in df.columns else 0
+        df.insert(position, REVIEW_KEY_COLUMN, compute_review_keys(df))
+    return df
+
+def reattach_results(df, source_df, columns, key_column=REVIEW_KEY_COLUMN):
+    """按评论主键做哈希连接，把已有的翻译/标签结果重新关联到数据上，返回关联到结果的行数"""
+    if key_column not in df.columns or key_column not in source_df.columns:
+        return 0
+    lookup = source_df.drop_duplicates(subset=[key_column]).set_index(key_column)
+    attached_rows = pd.Series(False, index=df.index)
+    for col in columns:
+        if col not in lookup.columns:
+            continue
+        values = df[key_column].map(lookup[col])
+        if col in df.columns:
+            # 有已有结果的行使用已有结果，其余行保持不变
+            df[col] = values.combine_first(df[col])
+        else:
+            df[col] = values
+        attached_rows |= values.notna()
+    return int(attached_rows.sum())
+
+def apply_brand_index(df, brand_index):
+    """使用品牌索引进行一次向量化查找：先按ASIN匹配，未匹配的再按Parent ASIN匹配"""
+    asin = as_text_series(df['Asin'])
+    asin_brand = asin.map(brand_index['asin'])
+    parent_brand = asin.map(brand_index['parent_asin'])
+    
+    # 合并两轮查找结果：ASIN匹配优先
+    df['Brand'] = asin_brand.fillna(parent_brand)
+    
+    first_round_matches = int(asin_brand.notna().sum())
+    stats = {
+        'total_records': len(df),
+        'final_matches': int(df['Brand'].notna().sum()),
+        'first_round_matches': first_round_matches,
+        'has_parent_asin': bool(brand_index['parent_asin'])
+    }
+    return df, stats
+
+def show_brand_match_stats(stats):
+    """显示品牌关联的匹配统计"""
+    total_records = stats['total_records']
+    final_matches = stats['final_matches']
+    match_rate = (final_matches / total_records * 100) if total_records > 0 else 0
+    
+    st.success(f"✅ 成功关联品牌数据！")
+    st.info(f"📊 匹配统计：")
+    st.info(f"   - 总记录数：{total_records}")
+    st.info(f"   - 成功匹配：{final_matches}")
+    st.info(f"   - 匹配率：{match_rate:.1f}%")
+    
+    if stats['has_parent_asin']:
+        st.info(f"   - 第一轮ASIN匹配：{stats['first_round_matches']}")
+        st.info(f"   - 第二轮Parent ASIN匹配：{final_matches - stats['first_round_matches']}")
+
+def process_data(df, brand_df=None, brand_index=None):
+    """数据预处理函数（传入brand_index或brand_df关联品牌；不修改持久化品牌索引，索引只在导入入口处更新）"""
+    # 确保所需列存在
+    required_columns = REQUIRED_REVIEW_COLUMNS
+    if not all(col in df.columns for col in required_columns):
+        st.error(f"缺少必要的列: {[col for col in required_columns if col not in df.columns]}")
+        return None
+    
+    # 只保留必要的列
+    df = df[required_columns].copy()
+    
+    df = normalize_reviews(df)
+    
+    # 添加ID列（确保唯一性）和由评论内容计算的稳定主键
+    df.insert(0, 'ID', range(1, len(df) + 1))
+    df.insert(1, REVIEW_KEY_COLUMN, compute_review_keys(df))
+    
+    # 只提供了品牌数据时，用它构建临时的品牌索引
+    if brand_index is None and brand_df is not None and 'ASIN' in brand_df.columns and 'Brand' in brand_df.columns:
+        brand_index = build_brand_index(brand_df)
+    
+    # 通过品牌索引关联品牌信息
+    if brand_index is not None:
+        df, brand_stats = apply_brand_index(df, brand_index)
+        show_brand_match_stats(brand_stats)
     
     # 重新排序列
-    column_order = ['ID', 'Asin', 'Brand', 'Title', 'Content', 'Model', 'Rating', 'Date', 'Review Type']
-    existing_columns = [col for col in column_order if col in df.columns]
+    existing_columns = [col for col in PROCESSED_COLUMN_ORDER if col in df.columns]
     df = df[existing_columns]
     
     return df
 
+# 紧凑内存模式：低基数列转为Categorical，长文本列使用pyarrow字符串
+COMPACT_CATEGORY_COLUMNS = ['Asin', 'Brand', 'Model', 'Review Type']
+COMPACT_TEXT_COLUMNS = [REVIEW_KEY_COLUMN, 'Title', 'Content']
+
+def compact_dataframe(df):
+    """将处理后的数据转换为紧凑的数据类型，返回(紧凑数据, 各列内存对比)"""
+    before = df.memory_usage(deep=True, index=False)
+    before_dtypes = df.dtypes.astype(str)
+    df = df.copy()
+    
+    for col in COMPACT_CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    
+    if 'Rating' in df.columns:
+        df['Rating'] = pd.to_numeric(df['Rating'], downcast='float')
+    if 'ID' in df.columns:
+        df['ID'] = pd.to_numeric(df['ID'], downcast='integer')
+    
+    try:
+        import pyarrow  # noqa: F401
+        text_dtype = pd.StringDtype('pyarrow')
+    except ImportError:
+        text_dtype = None
+    if text_dtype is not None:
+        for col in COMPACT_TEXT_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype(text_dtype)
+    
+    after = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        '原类型': before_dtypes,
+        '紧凑类型': df.dtypes.astype(str),
+        '优化前(KB)': (before / 1024).round(1),
+        '优化后(KB)': (after / 1024).round(1)
+    })
+    report['节省比例(%)'] = ((1 - after / before.where(before > 0)) * 100).round(1).fillna(0)
+    report.loc['合计'] = [
+        '', '',
+        round(before.sum() / 1024, 1),
+        round(after.sum() / 1024, 1),
+        round((1 - after.sum() / before.sum()) * 100, 1) if before.sum() > 0 else 0
+    ]
+    return df, report
+
+def as_text_series(series):
+    """将Categorical等列转换为普通文本列，便于字符串拼接（保留空值）"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(object)
+    return series
+
+def is_text_column(series):
+    """判断是否为文本列（兼容object、pyarrow字符串和Categorical）"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return pd.api.types.is_string_dtype(series.cat.categories)
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
 def calculate_review_stats(df):
     """计算评论类型的统计信息"""
     # 计算各类型数量
@@ -194,22 +299,29 @@ def analyze_by_group(df, group_by):
     # 使用更高效的分组操作
     if isinstance(group_by, list):
         if 'Brand' in group_by:
-            df['Group'] = df['Brand'] + ' - ' + df['Asin'] + ' - ' + df['Model']
+            df['Group'] = as_text_series(df['Brand']) + ' - ' + as_text_series(df['Asin']) + ' - ' + as_text_series(df['Model'])
         else:
-            df['Group'] = df['Asin'] + ' - ' + df['Model']
+            df['Group'] = as_text_series(df['Asin']) + ' - ' + as_text_series(df['Model'])
         group_by = 'Group'
     
-    # 一次性计算所有统计信息
-    stats = df.groupby(group_by).agg({
-        'Rating': ['count', 'mean', 'std'],
-        'Review Type': lambda x: x.value_counts().to_dict()
-    }).round(2)
+    # 一次性计算评分统计（observed=True：Categorical列只统计实际出现的分组）
+    grouped = df.groupby(group_by, observed=True)
+    stats = grouped['Rating'].agg(['count', 'mean', 'std']).round(2)
+    
+    # 评论类型分布单独计算，避免字典结果被转换回Categorical类型
+    stats['Review Type'] = pd.Series({
+        group: values.value_counts().to_dict()
+        for group, values in grouped['Review Type']
+    })
     
     # 重命名列
     stats.columns = ['评论数量', '平均评分', '标准差', '评论类型分布']
     
     # 计算评分分布
-    rating_dist = pd.crosstab(df[group_by], df['Rating'], normalize='index') * 100
+    group_values = df[group_by]
+    if isinstance(group_values.dtype, pd.CategoricalDtype):
+        group_values = group_values.cat.remove_unused_categories()
+    rating_dist = pd.crosstab(group_values, df['Rating'], normalize='index') * 100
     
     return stats, rating_dist, group_by
 
@@ -217,7 +329,7 @@ def create_rating_trend_chart(df, group_by):
     """创建评分趋势图"""
     # 使用更高效的时间处理
     df['Month'] = df['Date'].dt.to_period('M').astype(str)
-    trend_data = df.groupby(['Month', group_by])['Rating'].mean().reset_index()
+    trend_data = df.groupby(['Month', group_by], observed=True)['Rating'].mean().reset_index()
     
     # 创建趋势图
     title = f'{group_by}随时间的平均评分变化'
@@ -317,65 +429,235 @@ def create_rating_pie_chart(rating_dist_pct, title):
     
     return figs
 
-def save_fig_to_html(fig, filename):
-    """保存图表为HTML文件"""
-    return fig.to_html()
+def save_fig_to_html(fig, filename=None, include_plotlyjs=True, full_html=True):
+    """保存图表为HTML（多个图表合并到一个页面时，只需第一个图表包含plotly.js）"""
+    return fig.to_html(full_html=full_html, include_plotlyjs=include_plotlyjs)
+
+# Excel导出：xlsxwriter常量内存模式逐块写入临时文件，超过单表行数上限时自动分表
+EXCEL_MAX_ROWS = 1048576  # Excel单个工作表的最大行数（含表头）
+EXPORT_CHUNK_ROWS = 10000  # 每次转换写入的行数
+
+def iter_export_rows(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """分块把DataFrame转换为可写入Excel的行（空值转为None，避免一次性复制整个表）"""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+def write_frame_to_workbook(workbook, df, sheet_name_format="Sheet{}", max_rows_per_sheet=EXCEL_MAX_ROWS - 1, chunk_rows=EXPORT_CHUNK_ROWS):
+    """把DataFrame按行顺序写入常量内存模式的工作簿，超过单表上限时新建工作表，返回工作表数"""
+    header_format = workbook.add_format({'bold': True, 'border': 1})
+    headers = [str(col) for col in df.columns]
+    sheet_count = 0
+    worksheet = None
+    row_in_sheet = max_rows_per_sheet
+    for values in iter_export_rows(df, chunk_rows):
+        if row_in_sheet >= max_rows_per_sheet:
+            # 常量内存模式下只能按行顺序写入，写满后新建工作表继续
+            sheet_count += 1
+            worksheet = workbook.add_worksheet(sheet_name_format.format(sheet_count))
+            worksheet.write_row(0, 0, headers, header_format)
+            row_in_sheet = 0
+        row_in_sheet += 1
+        worksheet.write_row(row_in_sheet, 0, values)
+    if sheet_count == 0:
+        worksheet = workbook.add_worksheet(sheet_name_format.format(1))
+        worksheet.write_row(0, 0, headers, header_format)
+        sheet_count = 1
+    return sheet_count
+
+def create_export_workbook(path):
+    """创建常量内存模式的xlsxwriter工作簿"""
+    import xlsxwriter
+    
+    return xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'nan_inf_to_errors': True,
+        'remove_timezone': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss'
+    })
+
+def write_excel_file(df, path, max_rows_per_sheet=EXCEL_MAX_ROWS - 1, chunk_rows=EXPORT_CHUNK_ROWS):
+    """以常量内存模式把DataFrame写入xlsx文件，超过单表上限时拆分为Sheet1、Sheet2……，返回工作表数"""
+    workbook = create_export_workbook(path)
+    try:
+        return write_frame_to_workbook(workbook, df, "Sheet{}", max_rows_per_sheet, chunk_rows)
+    finally:
+        workbook.close()
+
+def export_excel_to_tempfile(df):
+    """导出到临时xlsx文件并返回文件路径（调用方负责删除）"""
+    import tempfile
+    
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_excel_file(df, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+# 支持的下载格式：格式代码 → 显示名称、文件扩展名、MIME类型
+DOWNLOAD_FORMATS = {
+    'excel': {'label': 'Excel', 'extension': 'xlsx', 'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'parquet': {'label': 'Parquet', 'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+    'feather': {'label': 'Feather (Arrow)', 'extension': 'feather', 'mime': 'application/vnd.apache.arrow.file'},
+    'csv.gz': {'label': 'CSV (gzip压缩)', 'extension': 'csv.gz', 'mime': 'application/gzip'},
+    'txt': {'label': 'TXT', 'extension': 'txt', 'mime': 'text/plain'},
+    'txt.gz': {'label': 'TXT (gzip压缩)', 'extension': 'txt.gz', 'mime': 'application/gzip'},
+    'txt.zst': {'label': 'TXT (zstd压缩)', 'extension': 'txt.zst', 'mime': 'application/zstd'},
+    'report.xlsx': {'label': '分析报告 (Excel)', 'extension': 'xlsx', 'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'report.zip': {'label': '分析报告 (HTML)', 'extension': 'zip', 'mime': 'application/zip'},
+}
+REPORT_DOWNLOAD_FORMATS = ['report.xlsx', 'report.zip']
+TABLE_DOWNLOAD_FORMATS = ['excel', 'parquet', 'feather', 'csv.gz']
+# Feather不压缩，读取方可以直接内存映射（零拷贝）
+FEATHER_COMPRESSION = 'uncompressed'
 
 def get_download_data(df, file_format='excel'):
-    """准备下载数据"""
+    """准备下载数据，file_format为DOWNLOAD_FORMATS中的格式代码"""
     if file_format == 'excel':
+        # 工作簿直接写入临时文件，内存中只保留最终的压缩文件内容
+        path = export_excel_to_tempfile(df)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+    if file_format in REPORT_DOWNLOAD_FORMATS:
+        return build_analysis_report(df, file_format)
+    if file_format in ('parquet', 'feather'):
+        return get_arrow_data(df, file_format)
+    if file_format == 'csv.gz':
         output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False)
-        data = output.getvalue()
-        return data
-    else:  # txt format
-        # 将DataFrame转换为格式化的文本
-        output = io.StringIO()
-        
-        # 写入表头
-        headers = df.columns.tolist()
-        output.write('\t'.join(headers) + '\n')
-        output.write('-' * 100 + '\n')  # 分隔线
-        
-        # 写入数据行
-        for _, row in df.iterrows():
-            # 确保所有值都转换为字符串，并处理可能的空值
-            row_values = [str(val) if pd.notna(val) else '' for val in row]
-            # 使用制表符分隔，这样在文本编辑器中会对齐
-            output.write('\t'.join(row_values) + '\n')
-        
-        return output.getvalue().encode('utf-8')
+        df.to_csv(output, index=False, encoding='utf-8', compression={'method': 'gzip', 'compresslevel': 6})
+        return output.getvalue()
+    return get_txt_data(df, file_format)
+
+def dataframe_to_arrow(df):
+    """转换为Arrow表（数值、日期和Categorical列直接复用内存，Categorical保留为字典类型）"""
+    import pyarrow as pa
+    
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # 混合类型的object列（如数字和文字混在一列）转为字符串后再转换
+        df = df.copy(deep=False)
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+def get_arrow_data(df, file_format='parquet'):
+    """导出为Parquet或Feather文件内容，保留Categorical和日期类型"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    
+    table = dataframe_to_arrow(df)
+    sink = pa.BufferOutputStream()
+    if file_format == 'feather':
+        feather.write_feather(table, sink, compression=FEATHER_COMPRESSION)
+    else:
+        pq.write_table(table, sink, compression='snappy')
+    return sink.getvalue().to_pybytes()
+
+# TXT导出：按列批量转换为文本后分块拼接写出，支持gzip/zstd压缩
+TXT_SEPARATOR = '-' * 100
+TXT_BLOCK_ROWS = 50000  # 每次拼接写出的行数
+
+def format_txt_lines(df):
+    """向量化地把每行转换为制表符分隔的文本（空值输出为空字符串）"""
+    if df.empty or len(df.columns) == 0:
+        return pd.Series([], dtype=object)
+    text_columns = []
+    for col in df.columns:
+        series = df[col]
+        # 转为object后逐元素str()，保证日期等类型的文本与逐行导出一致
+        text = series.astype(object).astype(str)
+        text_columns.append(text.where(series.notna(), ''))
+    return text_columns[0].str.cat(text_columns[1:], sep='\t')
+
+def write_txt(df, output, block_rows=TXT_BLOCK_ROWS):
+    """将DataFrame以制表符分隔的文本写入二进制输出流，每次写出一块"""
+    headers = [str(col) for col in df.columns]
+    output.write(('\t'.join(headers) + '\n' + TXT_SEPARATOR + '\n').encode('utf-8'))
+    for start in range(0, len(df), block_rows):
+        lines = format_txt_lines(df.iloc[start:start + block_rows])
+        output.write(('\n'.join(lines.tolist()) + '\n').encode('utf-8'))
+
+def is_zstd_available():
+    """是否安装了zstd压缩库"""
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_txt_data(df, file_format='txt'):
+    """生成TXT下载数据，file_format为txt、txt.gz或txt.zst"""
+    output = io.BytesIO()
+    if file_format == 'txt.gz':
+        import gzip
+        with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=6) as compressed:
+            write_txt(df, compressed)
+    elif file_format == 'txt.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception("导出zstd压缩文件需要安装zstandard：pip install zstandard")
+        with zstandard.ZstdCompressor(level=3).stream_writer(output, closefd=False) as compressed:
+            write_txt(df, compressed)
+    else:
+        write_txt(df, output)
+    return output.getvalue()
 
 # 腾讯翻译API相关函数
+TENCENT_BATCH_MAX_CHARS = 6000  # 腾讯批量翻译接口单次请求的文本总长度上限
+TENCENT_BATCH_MAX_ITEMS = 50  # 单次批量请求的最大条数
+
 class TencentTranslator:
-    """腾讯翻译API封装类"""
+    """腾讯翻译API封装类：客户端只创建一次，各线程共用其keep-alive连接池"""
+    
+    supports_batch = True
     
     def __init__(self, secret_id, secret_key, region='ap-beijing'):
         self.secret_id = secret_id
         self.secret_key = secret_key
         self.region = region
-        
-    def translate(self, text, source='en', target='zh'):
-        """翻译文本（带缓存）"""
+        self._client = None
+        self._client_lock = threading.Lock()
+    
+    def get_client(self):
+        """获取TMT客户端（首次调用时创建，开启keep-alive避免每次请求重新握手）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from tencentcloud.common import credential
+                    from tencentcloud.common.profile.client_profile import ClientProfile
+                    from tencentcloud.common.profile.http_profile import HttpProfile
+                    from tencentcloud.tmt.v20180321 import tmt_client
+                    
+                    http_profile = HttpProfile()
+                    http_profile.keepAlive = True
+                    http_profile.reqTimeout = 30
+                    cred = credential.Credential(self.secret_id, self.secret_key)
+                    self._client = tmt_client.TmtClient(cred, self.region, ClientProfile(httpProfile=http_profile))
+        return self._client
+    
+    def translate(self, text, source='en', target='zh', use_cache=True):
+        """翻译文本（带缓存，use_cache=False时由调用方负责读写缓存）"""
         # 生成缓存键
         cache_key = get_memory_cache_key(text, 'tencent', source, target)
         
         # 尝试从缓存加载
-        cached_result = load_from_memory_cache(cache_key)
+        cached_result = load_from_memory_cache(cache_key) if use_cache else None
         if cached_result is not None:
             return cached_result
         
         try:
-            from tencentcloud.common import credential
-            from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
-            from tencentcloud.tmt.v20180321 import tmt_client, models
-            
-            # 实例化一个认证对象
-            cred = credential.Credential(self.secret_id, self.secret_key)
-            
-            # 实例化要请求产品的client对象
-            client = tmt_client.TmtClient(cred, self.region)
+            from tencentcloud.tmt.v20180321 import models
             
             # 实例化一个请求对象
             req = models.TextTranslateRequest()
@@ -386,19 +668,51 @@ class TencentTranslator:
             req.Target = target
             req.ProjectId = 0
             
-            # 通过client对象调用想要访问的接口
-            resp = client.TextTranslate(req)
+            # 通过复用的client对象调用接口
+            resp = self.get_client().TextTranslate(req)
             
             # 保存到缓存
-            save_to_memory_cache(cache_key, resp.TargetText)
+            if use_cache:
+                save_to_memory_cache(cache_key, resp.TargetText)
             
             # 返回翻译结果
             return resp.TargetText
                 
-        except TencentCloudSDKException as err:
-            raise Exception(f"腾讯翻译API调用失败: {err}")
         except Exception as e:
             raise Exception(f"腾讯翻译API调用失败: {str(e)}")
+    
+    def translate_batch(self, texts, source='en', target='zh', use_cache=True):
+        """批量翻译（一次请求翻译多条文本），缓存中已有的条目不再请求，返回与输入顺序一致的结果"""
+        cache_keys = [get_memory_cache_key(text, 'tencent', source, target) for text in texts]
+        cached = load_many_from_translation_cache(cache_keys) if use_cache else {}
+        results = [cached.get(key) for key in cache_keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        
+        try:
+            from tencentcloud.tmt.v20180321 import models
+            
+            req = models.TextTranslateBatchRequest()
+            req.SourceTextList = [texts[i] for i in pending]
+            req.Source = source
+            req.Target = target
+            req.ProjectId = 0
+            resp = self.get_client().TextTranslateBatch(req)
+        except Exception as e:
+            raise Exception(f"腾讯批量翻译API调用失败: {str(e)}")
+        
+        if len(resp.TargetTextList) != len(pending):
+            raise Exception("腾讯批量翻译API返回的条数与请求不一致")
+        for i, translated in zip(pending, resp.TargetTextList):
+            results[i] = translated
+        if use_cache:
+            save_many_to_translation_cache({cache_keys[i]: results[i] for i in pending})
+        return results
+
+# 翻译器实例按密钥复用，客户端和连接不会在每次翻译任务时重建
+translator_instances = {}
+translator_instances_lock = threading.Lock()
 
 def create_translator(engine='google', secret_id=None, secret_key=None):
     """创建翻译器实例"""
@@ -407,19 +721,29 @@ def create_translator(engine='google', secret_id=None, secret_key=None):
     elif engine == 'tencent':
         if not secret_id or not secret_key:
             raise ValueError("腾讯翻译API需要提供SecretId和SecretKey")
-        return TencentTranslator(secret_id, secret_key)
+        instance_key = hashlib.md5(f"{secret_id}:{secret_key}".encode('utf-8')).hexdigest()
+        with translator_instances_lock:
+            if instance_key not in translator_instances:
+                translator_instances[instance_key] = TencentTranslator(secret_id, secret_key)
+            return translator_instances[instance_key]
     else:
         raise ValueError(f"不支持的翻译引擎: {engine}")
 
 class CachedGoogleTranslator:
     """带缓存的Google翻译器"""
     
+    supports_batch = False
+    pack_char_limit = 4500  # 合并请求的字符上限（接口上限5000，留出分隔符余量）
+    
     def __init__(self, source='en', target='zh-CN'):
         from deep_translator import GoogleTranslator
         self.translator = GoogleTranslator(source=source, target=target)
         
-    def translate(self, text, source='en', target='zh-CN'):
-        """翻译文本（带缓存）"""
+    def translate(self, text, source='en', target='zh-CN', use_cache=True):
+        """翻译文本（带缓存，use_cache=False时由调用方负责读写缓存）"""
+        if not use_cache:
+            return self.translator.translate(text)
+        
         # 生成缓存键
         cache_key = get_memory_cache_key(text, 'google', source, target)
         
@@ -435,17 +759,21 @@ class CachedGoogleTranslator:
         save_to_memory_cache(cache_key, result)
         
         return result 
+    
+    def translate_batch(self, texts, source='en', target='zh-CN', use_cache=True):
+        """逐条翻译（Google免费接口没有批量接口，保持与腾讯翻译器一致的调用方式）"""
+        return [self.translate(text, source, target, use_cache=use_cache) for text in texts]
 
 # ========== AI批量标注缓存与统一调用工具 ==========
 import hashlib
 AI_CACHE_DIR = "ai_label_cache"
-os.makedirs(AI_CACHE_DIR, exist_ok=True)
 
 def get_ai_cache_key(text, prompt, model):
     key = f"{text}_{prompt}_{model}"
     return hashlib.md5(key.encode('utf-8')).hexdigest()
 
 def save_ai_label_to_cache(cache_key, label):
+    os.makedirs(AI_CACHE_DIR, exist_ok=True)
     with open(os.path.join(AI_CACHE_DIR, f"{cache_key}.pkl"), "wb") as f:
         pickle.dump(label, f)
 
@@ -544,89 +872,2224 @@ def call_ai_model(text, prompt, model, api_key, max_retries=3):
                 continue 
 
 # ========== 内存缓存系统（适用于网页部署） ==========
-import threading
 from collections import OrderedDict
 import time
 
 class MemoryCache:
-    """内存缓存系统，适用于网页部署环境"""
+    """内存缓存系统，适用于网页部署环境
+
+    按最近访问顺序淘汰，同时限制条目数和（可选的）总字节数；条目按写入顺序记录过期时间，
+    写入时顺带清理队首已过期的少量条目，获取统计时清理全部已过期条目（只访问已过期的条目，不遍历整个缓存）。
+    命中、未命中、淘汰、过期等统计随读写增量更新。单个条目超过字节上限时不写入缓存。
+    """
+    
+    EXPIRE_BATCH = 64  # 每次读写顺带清理的过期条目上限，避免长时间持有锁
     
-    def __init__(self, max_size=1000, ttl_hours=24):
+    def __init__(self, max_size=1000, ttl_hours=24, max_bytes=None):
         self.max_size = max_size
+        self.max_bytes = max_bytes
         self.ttl_seconds = ttl_hours * 3600
-        self.cache = OrderedDict()
+        self.cache = OrderedDict()  # key -> (value, 过期时间, 字节数)，按最近访问排序
+        self.expiry = OrderedDict()  # key -> 过期时间，按写入顺序排序（TTL固定，因此也是过期顺序）
         self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+    
+    def estimate_size(self, key, value):
+        """估算条目占用的字节数（只在设置了字节上限时计算，DataFrame等对象按其__sizeof__估算）"""
+        if self.max_bytes is None:
+            return 0
+        return sys.getsizeof(key) + sys.getsizeof(value)
+    
+    def _remove(self, key):
+        """删除条目并更新字节数（调用方持有锁）"""
+        _, _, size = self.cache.pop(key)
+        self.expiry.pop(key, None)
+        self.total_bytes -= size
+    
+    def _expire(self, now, limit=EXPIRE_BATCH):
+        """清理写入顺序队首已过期的条目，limit为None时清理全部已过期条目（调用方持有锁）"""
+        while self.expiry and (limit is None or limit > 0):
+            key, expires_at = next(iter(self.expiry.items()))
+            if expires_at > now:
+                break
+            self._remove(key)
+            self.expirations += 1
+            if limit is not None:
+                limit -= 1
     
     def get(self, key):
         """获取缓存值"""
         with self.lock:
-            if key in self.cache:
-                value, timestamp = self.cache[key]
-                # 检查是否过期
-                if time.time() - timestamp < self.ttl_seconds:
+            entry = self.cache.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if time.time() < expires_at:
                     # 更新访问顺序
                     self.cache.move_to_end(key)
+                    self.hits += 1
                     return value
-                else:
-                    # 删除过期项
-                    del self.cache[key]
+                # 删除过期项
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
         return None
     
     def set(self, key, value):
         """设置缓存值"""
+        size = self.estimate_size(key, value)
+        now = time.time()
         with self.lock:
-            # 如果缓存已满，删除最旧的项
-            if len(self.cache) >= self.max_size:
-                self.cache.popitem(last=False)
+            self._expire(now)
+            if key in self.cache:
+                self._remove(key)
+            
+            # 单个条目超过字节上限时不写入，避免为它清空整个缓存
+            if self.max_bytes is not None and size > self.max_bytes:
+                self.rejected += 1
+                return
             
-            self.cache[key] = (value, time.time())
+            # 超出条目数或字节上限时，删除最久未访问的项
+            while self.cache and (len(self.cache) >= self.max_size or
+                                  (self.max_bytes is not None and self.total_bytes + size > self.max_bytes)):
+                self._remove(next(iter(self.cache)))
+                self.evictions += 1
+            
+            expires_at = now + self.ttl_seconds
+            self.cache[key] = (value, expires_at, size)
+            self.expiry[key] = expires_at
+            self.total_bytes += size
     
     def clear(self):
         """清空缓存"""
         with self.lock:
             self.cache.clear()
+            self.expiry.clear()
+            self.total_bytes = 0
     
     def get_stats(self):
         """获取缓存统计"""
         with self.lock:
-            current_time = time.time()
-            valid_items = 0
-            expired_items = 0
-            
-            for key, (value, timestamp) in self.cache.items():
-                if current_time - timestamp < self.ttl_seconds:
-                    valid_items += 1
-                else:
-                    expired_items += 1
-            
+            self._expire(time.time(), limit=None)
+            requests = self.hits + self.misses
             return {
                 'total_items': len(self.cache),
-                'valid_items': valid_items,
-                'expired_items': expired_items,
+                'valid_items': len(self.cache),
+                'expirations': self.expirations,
+                'rejected': self.rejected,
                 'max_size': self.max_size,
-                'ttl_hours': self.ttl_seconds / 3600
+                'ttl_hours': self.ttl_seconds / 3600,
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions
             }
 
-# 全局内存缓存实例
-memory_cache = MemoryCache(max_size=2000, ttl_hours=24)
+class ShardedMemoryCache:
+    """分段加锁的内存缓存：按键的哈希分到多个独立的MemoryCache段，各段各自加锁，多线程读写时互不阻塞
+
+    接口与MemoryCache相同；条目数和字节上限平均分配到各段，淘汰和过期在段内进行，
+    键的分布不均匀时个别段会提前淘汰。在有GIL的CPython上通常不比单锁更快，默认不启用。
+    """
+    
+    def __init__(self, max_size=1000, ttl_hours=24, max_bytes=None, shards=16):
+        self.shards = [
+            MemoryCache(max_size=max(1, max_size // shards), ttl_hours=ttl_hours,
+                        max_bytes=max_bytes // shards if max_bytes is not None else None)
+            for _ in range(shards)
+        ]
+        self.shard_count = shards
+        self.max_size = sum(shard.max_size for shard in self.shards)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_hours * 3600
+    
+    def get(self, key):
+        """获取缓存值"""
+        return self.shards[hash(key) % self.shard_count].get(key)
+    
+    def set(self, key, value):
+        """设置缓存值"""
+        self.shards[hash(key) % self.shard_count].set(key, value)
+    
+    def clear(self):
+        """清空缓存"""
+        for shard in self.shards:
+            shard.clear()
+    
+    def get_stats(self):
+        """获取缓存统计（各段统计相加）"""
+        shard_stats = [shard.get_stats() for shard in self.shards]
+        stats = {key: sum(item[key] for item in shard_stats)
+                 for key in ('total_items', 'valid_items', 'expirations', 'rejected', 'total_bytes', 'hits', 'misses', 'evictions')}
+        requests = stats['hits'] + stats['misses']
+        stats.update({
+            'max_size': self.max_size,
+            'max_bytes': self.max_bytes,
+            'ttl_hours': self.ttl_seconds / 3600,
+            'hit_rate': stats['hits'] / requests if requests else 0.0,
+            'shards': len(self.shards)
+        })
+        return stats
+
+# 全局内存缓存实例（配置了分段数时使用分段缓存）
+if MEMORY_CACHE_SHARDS:
+    memory_cache = ShardedMemoryCache(max_size=MEMORY_CACHE_SIZE, ttl_hours=MEMORY_CACHE_TTL_HOURS,
+                                      max_bytes=MEMORY_CACHE_MAX_MB * 1024 * 1024, shards=MEMORY_CACHE_SHARDS)
+else:
+    memory_cache = MemoryCache(max_size=MEMORY_CACHE_SIZE, ttl_hours=MEMORY_CACHE_TTL_HOURS,
+                               max_bytes=MEMORY_CACHE_MAX_MB * 1024 * 1024)
+
+# ========== 持久化翻译记忆库（内存缓存之下的第二级缓存） ==========
+import sqlite3
+
+TRANSLATION_CACHE_DIR = "translation_cache"
+TRANSLATION_MEMORY_DB = os.path.join(TRANSLATION_CACHE_DIR, "translation_memory.db")
+TRANSLATION_MEMORY_MAX_ENTRIES = 500000  # 超出后按最近访问时间淘汰最旧的条目
+TRANSLATION_MEMORY_BATCH_SIZE = 500  # 批量查询时每条SQL的参数个数上限
+TRANSLATION_MEMORY_ACCESS_FLUSH = 5000  # 累计多少条命中后把最近访问时间写回数据库
+TRANSLATION_MEMORY_ACCESS_FLUSH_SECONDS = 60  # 最近访问时间最多延迟多久写回
+TRANSLATION_MEMORY_WRITE_BATCH = 500  # 单条译文累计多少条后一次性写入数据库
+TRANSLATION_MEMORY_WRITE_FLUSH_SECONDS = 5  # 缓冲的译文最多延迟多久写入
+
+class TranslationMemory:
+    """SQLite（WAL模式）持久化翻译记忆库，跨会话、跨重启保存译文，支持批量读写、LRU淘汰和导入导出"""
+    
+    def __init__(self, db_path=TRANSLATION_MEMORY_DB, max_entries=TRANSLATION_MEMORY_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        # 命中计数和待写回的最近访问时间由stats_lock保护；查询命中时只记录在内存中，
+        # 累计到一定数量、超过一定时间或淘汰前再批量写回，读路径不用每次都获取写锁提交事务
+        self.stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.pending_access = {}
+        self.last_access_flush = time.time()
+        # 逐条翻译的译文先放入写缓冲区，累计一批后用一个事务写入
+        self.buffer_lock = threading.Lock()
+        self.pending_writes = {}
+        self.last_write_flush = time.time()
+        self.writes_since_evict = 0
+        # 数据库目录和表在首次使用时创建，导入模块时不访问磁盘
+        self.init_lock = threading.Lock()
+        self._enabled = None
+    
+    @property
+    def enabled(self):
+        """数据库是否可用（首次访问时创建目录和表，只读磁盘等情况下退化为只使用内存缓存）"""
+        if self._enabled is None:
+            with self.init_lock:
+                if self._enabled is None:
+                    try:
+                        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+                        conn = self.connect()
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS translations ("
+                            "key TEXT PRIMARY KEY, translation TEXT NOT NULL, "
+                            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+                        )
+                        conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON translations(last_access)")
+                        conn.commit()
+                        self._enabled = True
+                    except (OSError, sqlite3.Error):
+                        self._enabled = False
+        return self._enabled
+    
+    def connect(self):
+        """每个线程使用自己的连接（WAL模式下读写互不阻塞）"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+    
+    def get_many(self, keys):
+        """批量查询译文，返回{缓存键: 译文}，命中条目的最近访问时间先记录在内存中，之后批量写回"""
+        keys = list(dict.fromkeys(keys))
+        if not keys or not self.enabled:
+            return {}
+        # 还在写缓冲区中的译文直接返回
+        with self.buffer_lock:
+            found = {key: self.pending_writes[key] for key in keys if key in self.pending_writes}
+        query_keys = [key for key in keys if key not in found] if found else keys
+        try:
+            conn = self.connect()
+            for start in range(0, len(query_keys), TRANSLATION_MEMORY_BATCH_SIZE):
+                chunk = query_keys[start:start + TRANSLATION_MEMORY_BATCH_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(conn.execute(
+                    f"SELECT key, translation FROM translations WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+        except sqlite3.Error:
+            return found
+        now = time.time()
+        with self.stats_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            self.pending_access.update(dict.fromkeys(found, now))
+            need_flush = (len(self.pending_access) >= TRANSLATION_MEMORY_ACCESS_FLUSH
+                          or now - self.last_access_flush >= TRANSLATION_MEMORY_ACCESS_FLUSH_SECONDS)
+        if need_flush:
+            self.flush_access()
+        return found
+    
+    def flush_access(self):
+        """把内存中记录的最近访问时间批量写回数据库"""
+        if not self.enabled:
+            return
+        try:
+            conn = self.connect()
+            with self.write_lock:
+                self._write_access(conn)
+        except sqlite3.Error:
+            pass
+    
+    def _write_access(self, conn):
+        """写回最近访问时间（调用方持有write_lock）"""
+        with self.stats_lock:
+            pending, self.pending_access = self.pending_access, {}
+            self.last_access_flush = time.time()
+        if pending:
+            conn.executemany("UPDATE translations SET last_access=MAX(last_access, ?) WHERE key=?",
+                             [(accessed, key) for key, accessed in pending.items()])
+            conn.commit()
+    
+    def get(self, key):
+        """查询单条译文"""
+        return self.get_many([key]).get(key)
+    
+    def put_many(self, items, created_at=None):
+        """批量写入{缓存键: 译文}（一个事务内完成），写入量累计较多时检查容量"""
+        items = [(key, value) for key, value in dict(items).items() if value]
+        if not items or not self.enabled:
+            return 0
+        now = time.time()
+        created_at = created_at or now
+        try:
+            conn = self.connect()
+            with self.write_lock:
+                conn.executemany(
+                    "INSERT INTO translations (key, translation, created_at, last_access) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET translation=excluded.translation, last_access=excluded.last_access",
+                    [(key, value, created_at, now) for key, value in items]
+                )
+                conn.commit()
+                self.writes_since_evict += len(items)
+                need_evict = self.writes_since_evict >= max(1000, self.max_entries // 100)
+            if need_evict:
+                self.evict()
+        except sqlite3.Error:
+            return 0
+        return len(items)
+    
+    def put(self, key, value):
+        """写入单条译文"""
+        return self.put_many({key: value})
+    
+    def buffer_put(self, key, value):
+        """单条译文先放入写缓冲区，累计一批或超过一定时间后由flush_writes一次性写入"""
+        if not value:
+            return
+        now = time.time()
+        with self.buffer_lock:
+            self.pending_writes[key] = value
+            need_flush = (len(self.pending_writes) >= TRANSLATION_MEMORY_WRITE_BATCH
+                          or now - self.last_write_flush >= TRANSLATION_MEMORY_WRITE_FLUSH_SECONDS)
+        if need_flush:
+            self.flush_writes()
+    
+    def flush_writes(self):
+        """把写缓冲区中的译文用一个事务写入数据库，返回写入的条数"""
+        with self.buffer_lock:
+            items, self.pending_writes = self.pending_writes, {}
+            self.last_write_flush = time.time()
+        return self.put_many(items) if items else 0
+    
+    def evict(self, max_entries=None):
+        """按最近访问时间淘汰最旧的条目，使条目数不超过上限，返回删除的条数"""
+        max_entries = self.max_entries if max_entries is None else max_entries
+        if not self.enabled:
+            return 0
+        conn = self.connect()
+        with self.write_lock:
+            # 先写回最近访问时间，避免淘汰刚被命中的条目
+            self._write_access(conn)
+            self.writes_since_evict = 0
+            total = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            overflow = total - max_entries
+            if overflow <= 0:
+                return 0
+            conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY last_access LIMIT ?)", (overflow,)
+            )
+            conn.commit()
+        return overflow
+    
+    def export_to(self, path):
+        """导出为JSON Lines文件（.gz结尾时压缩），便于在不同部署之间迁移，返回导出的条数"""
+        import gzip
+        
+        if not self.enabled:
+            return 0
+        self.flush_writes()
+        count = 0
+        opener = gzip.open if str(path).endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            cursor = self.connect().execute("SELECT key, translation, created_at FROM translations")
+            for key, translation, created_at in cursor:
+                f.write(json.dumps({'key': key, 'translation': translation, 'created_at': created_at},
+                                   ensure_ascii=False) + '\n')
+                count += 1
+        return count
+    
+    def import_from(self, path_or_file):
+        """从export_to导出的文件（路径或文件对象）导入，已有条目以导入的译文为准，返回导入的条数"""
+        import gzip
+        import io
+        
+        if hasattr(path_or_file, 'read'):
+            raw = path_or_file.read()
+            if raw[:2] == b'\x1f\x8b':
+                raw = gzip.decompress(raw)
+            lines = io.StringIO(raw.decode('utf-8') if isinstance(raw, bytes) else raw)
+        else:
+            opener = gzip.open if str(path_or_file).endswith('.gz') else open
+            lines = opener(path_or_file, 'rt', encoding='utf-8')
+        
+        count = 0
+        with lines:
+            batch = {}
+            for line in lines:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                batch[record['key']] = record['translation']
+                if len(batch) >= TRANSLATION_MEMORY_BATCH_SIZE:
+                    count += self.put_many(batch)
+                    batch = {}
+            if batch:
+                count += self.put_many(batch)
+        self.evict()
+        return count
+    
+    def clear(self):
+        """清空翻译记忆库"""
+        if not self.enabled:
+            return
+        conn = self.connect()
+        with self.write_lock:
+            conn.execute("DELETE FROM translations")
+            conn.commit()
+        with self.stats_lock:
+            self.hits = self.misses = 0
+            self.pending_access = {}
+        with self.buffer_lock:
+            self.pending_writes = {}
+    
+    def get_stats(self):
+        """获取翻译记忆库统计"""
+        if self.enabled:
+            self.flush_writes()
+        with self.stats_lock:
+            hits, misses = self.hits, self.misses
+        if not self.enabled:
+            return {'enabled': False, 'total_items': 0, 'size_mb': 0, 'max_entries': self.max_entries,
+                    'hits': hits, 'misses': misses}
+        total = self.connect().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        size = sum(os.path.getsize(self.db_path + suffix)
+                   for suffix in ('', '-wal') if os.path.exists(self.db_path + suffix))
+        return {
+            'enabled': True,
+            'total_items': total,
+            'size_mb': size / (1024 * 1024),
+            'max_entries': self.max_entries,
+            'hits': hits,
+            'misses': misses
+        }
+
+translation_memory = TranslationMemory()
+# 进程退出前写入缓冲区中剩余的译文
+import atexit
+atexit.register(translation_memory.flush_writes)
+
+def normalize_translation_source(text):
+    """规范化待翻译文本（合并连续空白），使只有空白差异的文本共用同一条缓存"""
+    return ' '.join(str(text).split())
 
 def get_memory_cache_key(text, engine, source='en', target='zh'):
-    """生成内存缓存键"""
-    content = f"{text}_{engine}_{source}_{target}"
+    """生成缓存键（按规范化后的文本、翻译引擎和语言对）"""
+    content = f"{normalize_translation_source(text)}_{engine}_{source}_{target}"
     return hashlib.md5(content.encode('utf-8')).hexdigest()
 
 def save_to_memory_cache(cache_key, translation):
-    """保存翻译结果到内存缓存"""
+    """保存翻译结果到内存缓存和持久化翻译记忆库（翻译记忆库按批写入）"""
     memory_cache.set(cache_key, translation)
+    translation_memory.buffer_put(cache_key, translation)
 
 def load_from_memory_cache(cache_key):
-    """从内存缓存加载翻译结果"""
-    return memory_cache.get(cache_key)
+    """依次从内存缓存、持久化翻译记忆库加载翻译结果"""
+    result = memory_cache.get(cache_key)
+    if result is None:
+        result = translation_memory.get(cache_key)
+        if result is not None:
+            memory_cache.set(cache_key, result)
+    return result
+
+def load_many_from_translation_cache(cache_keys):
+    """批量加载翻译结果：先查内存缓存，未命中的键一次性查询翻译记忆库，返回{缓存键: 译文}"""
+    found = {}
+    missing = []
+    for key in cache_keys:
+        result = memory_cache.get(key)
+        if result is None:
+            missing.append(key)
+        else:
+            found[key] = result
+    if missing:
+        stored = translation_memory.get_many(missing)
+        for key, result in stored.items():
+            memory_cache.set(key, result)
+        found.update(stored)
+    return found
+
+def save_many_to_translation_cache(items):
+    """批量保存{缓存键: 译文}到内存缓存和翻译记忆库（一个事务内写入）"""
+    for key, result in items.items():
+        memory_cache.set(key, result)
+    translation_memory.put_many(items)
 
 def get_memory_cache_stats():
     """获取内存缓存统计"""
     return memory_cache.get_stats()
 
+def get_translation_memory_stats():
+    """获取持久化翻译记忆库统计"""
+    return translation_memory.get_stats()
+
 def clear_memory_cache():
     """清空内存缓存"""
     memory_cache.clear() 
+
+# ========== 数据集存储（各页面共享处理后的数据） ==========
+DATASET_CACHE_DIR = "dataset_cache"
+DATASET_INDEX_FILE = os.path.join(DATASET_CACHE_DIR, "index.json")
+# 处理后数据集的结构版本：处理逻辑或列结构变化时加1（2：增加评论主键列），旧版本的磁盘缓存会重新处理
+DATASET_SCHEMA_VERSION = 2
+dataset_lock = threading.Lock()
+
+def get_content_hash(*contents):
+    """根据一个或多个文件内容生成哈希键"""
+    hasher = hashlib.md5()
+    for content in contents:
+        if content is None:
+            continue
+        # 写入长度前缀，避免不同文件组合拼接后产生相同的哈希
+        hasher.update(f"{len(content)}:".encode('utf-8'))
+        hasher.update(content)
+    return hasher.hexdigest()
+
+def get_dataset_path(dataset_key):
+    """获取数据集对应的Parquet文件路径"""
+    return os.path.join(DATASET_CACHE_DIR, f"{dataset_key}.parquet")
+
+def load_dataset_index():
+    """读取数据集索引"""
+    if os.path.exists(DATASET_INDEX_FILE):
+        try:
+            with open(DATASET_INDEX_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return {}
+
+def save_dataset_index(index):
+    """保存数据集索引（先写临时文件再替换，避免写入中断导致索引损坏）"""
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    tmp_path = DATASET_INDEX_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, DATASET_INDEX_FILE)
+
+def register_dataset(dataset_key, name, rows, columns):
+    """将已写入磁盘的数据集登记到索引（重新登记时保留创建时间，并视为刚被访问）"""
+    path = get_dataset_path(dataset_key)
+    with dataset_lock:
+        index = load_dataset_index()
+        previous = index.get(dataset_key, {})
+        index[dataset_key] = {
+            'name': name or dataset_key,
+            'rows': int(rows),
+            'columns': list(columns),
+            'created_at': previous.get('created_at') or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'last_access': time.time(),
+            'size_bytes': os.path.getsize(path),
+            'schema_version': DATASET_SCHEMA_VERSION
+        }
+        save_dataset_index(index)
+
+def is_dataset_current(dataset_key):
+    """磁盘上的数据集是否存在且由当前结构版本的处理逻辑生成"""
+    if not os.path.exists(get_dataset_path(dataset_key)):
+        return False
+    info = load_dataset_index().get(dataset_key, {})
+    return info.get('schema_version') == DATASET_SCHEMA_VERSION
+
+def save_dataset(df, dataset_key, name=None):
+    """将处理后的数据集保存为Parquet文件并登记到索引"""
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    path = get_dataset_path(dataset_key)
+    df.to_parquet(path, index=False)
+    register_dataset(dataset_key, name, len(df), df.columns)
+    return path
+
+def load_dataset(dataset_key, columns=None):
+    """按数据集键读取已保存的数据集，可只读取指定列"""
+    path = get_dataset_path(dataset_key)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path, columns=columns)
+
+def list_datasets():
+    """列出已保存的数据集（按创建时间倒序）"""
+    index = load_dataset_index()
+    datasets = [
+        dict(key=key, **info) for key, info in index.items()
+        if os.path.exists(get_dataset_path(key))
+    ]
+    return sorted(datasets, key=lambda x: x.get('created_at', ''), reverse=True)
+
+def set_active_dataset(df, dataset_key, name=None):
+    """将数据集设为当前会话共享的数据集，供其他页面直接使用"""
+    if not os.path.exists(get_dataset_path(dataset_key)):
+        save_dataset(df, dataset_key, name)
+    st.session_state['processed_data'] = df
+    st.session_state['dataset_key'] = dataset_key
+    st.session_state['dataset_name'] = name or dataset_key
+
+# 上传文件按需读取列：各页面只解析自己用到的列，解析结果按文件内容哈希缓存
+UPLOAD_CACHE_SIZE = 8
+REVIEW_COLUMN_DTYPES = {
+    REVIEW_KEY_COLUMN: str,
+    'Asin': str,
+    'Brand': str,
+    'Title': str,
+    'Content': str,
+    'Model': str,
+    'Rating': 'float64',
+    'Review Type': pd.CategoricalDtype(['negative', 'neutral', 'positive'], ordered=True)
+}
+TRANSLATION_COLUMN_SUFFIX = '_中文'
+TRANSLATION_COLUMN_CANDIDATES = ['Content_zh', '翻译内容', 'Translation', 'content_zh', 'translated_content']
+uploaded_file_cache = MemoryCache(max_size=UPLOAD_CACHE_SIZE, ttl_hours=24)
+
+def make_column_selector(columns, include_translations=False):
+    """生成read_excel/read_csv的usecols函数：只保留指定列（可选保留翻译列）"""
+    wanted = set(columns)
+    
+    def selector(col):
+        col = str(col)
+        if col in wanted:
+            return True
+        return include_translations and (col.endswith(TRANSLATION_COLUMN_SUFFIX) or col in TRANSLATION_COLUMN_CANDIDATES)
+    return selector
+
+def read_uploaded_file(uploaded_file, columns=None, include_translations=False):
+    """读取上传的Excel或CSV文件；指定columns时只解析这些列，结果按文件内容缓存"""
+    content = uploaded_file.getvalue()
+    column_key = None if columns is None else f"{sorted(columns)}|{include_translations}".encode("utf-8")
+    cache_key = get_content_hash(content, column_key)
+    cached = uploaded_file_cache.get(cache_key)
+    if cached is not None:
+        return cached.copy(deep=False)
+    
+    read = pd.read_csv if uploaded_file.name.endswith('.csv') else pd.read_excel
+    if columns is None:
+        df = read(io.BytesIO(content))
+    else:
+        usecols = make_column_selector(columns, include_translations)
+        dtypes = {col: dtype for col, dtype in REVIEW_COLUMN_DTYPES.items() if col in columns}
+        try:
+            df = read(io.BytesIO(content), usecols=usecols, dtype=dtypes)
+        except (ValueError, TypeError):
+            # 列内容与预期类型不符时（如评分列含文字），退回自动类型推断
+            df = read(io.BytesIO(content), usecols=usecols)
+    
+    uploaded_file_cache.set(cache_key, df)
+    return df.copy(deep=False)
+
+def load_page_dataset(uploaded_file=None, columns=None, include_translations=False):
+    """获取页面分析用的数据：优先使用新上传的文件（只读取columns指定的列），否则使用首页已处理的共享数据集"""
+    if uploaded_file is not None:
+        try:
+            df = read_uploaded_file(uploaded_file, columns, include_translations)
+            if columns is not None and REVIEW_KEY_COLUMN in columns and REVIEW_KEY_COLUMN not in df.columns:
+                # 旧版本导出的文件没有评论主键列：补读计算主键所需的列，算出主键后去掉这些列
+                extra = [col for col in REVIEW_DEDUP_COLUMNS if col not in columns]
+                df = ensure_review_key(read_uploaded_file(uploaded_file, list(columns) + extra, include_translations))
+                return df.drop(columns=[col for col in extra if col in df.columns])
+            return ensure_review_key(df)
+        except Exception as e:
+            st.error(f"❌ 文件读取失败: {str(e)}")
+            return None
+    
+    # 当前会话中首页已处理的数据
+    if st.session_state.get('processed_data') is not None:
+        df = st.session_state['processed_data']
+        st.info(f"📦 正在使用首页已处理的数据集：{st.session_state.get('dataset_name', '未命名')}（{len(df)} 条）。如需分析其他数据，可直接上传文件。")
+        # 浅拷贝，避免页面新增的辅助列写回共享数据集
+        return df.copy(deep=False)
+    
+    # 会话中没有数据时，可以从已保存的数据集中选择
+    datasets = list_datasets()
+    if datasets:
+        options = {f"{d['name']}（{d['rows']} 条，{d['created_at']}）": d for d in datasets}
+        selected = st.selectbox("或选择已保存的数据集", ['不使用'] + list(options.keys()))
+        if selected != '不使用':
+            dataset = options[selected]
+            df = load_dataset(dataset['key'])
+            if df is not None:
+                df = ensure_review_key(df)
+                set_active_dataset(df, dataset['key'], dataset['name'])
+                return df.copy(deep=False)
+    return None
+
+# ========== 品牌索引（ASIN → Brand，持久化并增量更新） ==========
+BRAND_INDEX_FILE = os.path.join(DATASET_CACHE_DIR, "brand_index.json")
+brand_index_lock = threading.Lock()
+
+def load_brand_index():
+    """读取持久化的品牌索引"""
+    empty_index = {'asin': {}, 'parent_asin': {}, 'sources': [], 'version': ''}
+    if os.path.exists(BRAND_INDEX_FILE):
+        try:
+            with open(BRAND_INDEX_FILE, "r", encoding="utf-8") as f:
+                return {**empty_index, **json.load(f)}
+        except Exception:
+            return empty_index
+    return empty_index
+
+def save_brand_index(brand_index):
+    """保存品牌索引（先写临时文件再替换）"""
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    tmp_path = BRAND_INDEX_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(brand_index, f, ensure_ascii=False)
+    os.replace(tmp_path, BRAND_INDEX_FILE)
+
+def clean_brand_column(series):
+    """清理品牌文件中的ASIN/品牌列，空值保持为空"""
+    cleaned = series.astype(str).str.strip()
+    return cleaned.where(series.notna() & (cleaned != ''))
+
+def build_brand_index(brand_df):
+    """由品牌文件构建品牌索引（只在内存中，不写入持久化索引）"""
+    asin = clean_brand_column(brand_df['ASIN'])
+    brand = clean_brand_column(brand_df['Brand'])
+    valid = asin.notna() & brand.notna()
+    asin_map = dict(zip(asin[valid], brand[valid]))
+    
+    parent_map = {}
+    if 'Parent ASIN' in brand_df.columns:
+        parent = clean_brand_column(brand_df['Parent ASIN'])
+        parent_valid = parent.notna() & brand.notna()
+        parent_map = dict(zip(parent[parent_valid], brand[parent_valid]))
+    return {'asin': asin_map, 'parent_asin': parent_map, 'sources': [], 'version': ''}
+
+def update_brand_index(brand_df, source_key=None):
+    """用新上传的品牌文件增量更新品牌索引，同一ASIN以最新文件为准"""
+    new_index = build_brand_index(brand_df)
+    if source_key is None:
+        source_key = get_content_hash(pd.util.hash_pandas_object(brand_df.astype(str), index=False).values.tobytes())
+    
+    with brand_index_lock:
+        brand_index = load_brand_index()
+        brand_index['asin'].update(new_index['asin'])
+        brand_index['parent_asin'].update(new_index['parent_asin'])
+        if source_key not in brand_index['sources']:
+            brand_index['sources'].append(source_key)
+        # 版本号随每次更新变化，用作数据处理缓存键的一部分
+        brand_index['version'] = get_content_hash(
+            brand_index['version'].encode('utf-8'), source_key.encode('utf-8')
+        )
+        save_brand_index(brand_index)
+    return brand_index
+
+# ========== 数据处理结果缓存（内存 → 磁盘Parquet → 重新计算） ==========
+PROCESSED_CACHE_MEMORY_SIZE = 4  # 内存中保留的数据集个数
+DATASET_CACHE_MAX_MB = 2048  # 磁盘数据集缓存上限（MB），超出后按最近访问时间淘汰
+
+# 内存层：复用MemoryCache，按数据集键保存处理后的DataFrame
+processed_data_cache = MemoryCache(max_size=PROCESSED_CACHE_MEMORY_SIZE, ttl_hours=24)
+processed_cache_stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+processed_cache_stats_lock = threading.Lock()
+
+def count_processed_cache(source):
+    """累加数据处理缓存的命中统计"""
+    with processed_cache_stats_lock:
+        processed_cache_stats[source] += 1
+
+def touch_dataset(dataset_key):
+    """更新数据集的最近访问时间"""
+    with dataset_lock:
+        index = load_dataset_index()
+        if dataset_key in index:
+            index[dataset_key]['last_access'] = time.time()
+            save_dataset_index(index)
+
+def evict_datasets(max_mb=DATASET_CACHE_MAX_MB, keep=None):
+    """按最近访问时间（LRU）淘汰磁盘上的数据集，直到总大小不超过上限"""
+    with dataset_lock:
+        index = load_dataset_index()
+        # 最久未访问的排在前面
+        entries = sorted(
+            index.items(),
+            key=lambda item: item[1].get('last_access', 0)
+        )
+        total_bytes = sum(info.get('size_bytes', 0) for _, info in entries)
+        evicted = []
+        for dataset_key, info in entries:
+            if total_bytes <= max_mb * 1024 * 1024:
+                break
+            if dataset_key == keep:
+                continue
+            path = get_dataset_path(dataset_key)
+            if os.path.exists(path):
+                os.remove(path)
+            total_bytes -= info.get('size_bytes', 0)
+            del index[dataset_key]
+            evicted.append(dataset_key)
+        if evicted:
+            save_dataset_index(index)
+    return evicted
+
+def cached_process_data(dataset_key, compute_fn, name=None):
+    """带两级缓存的数据处理，返回(数据, 来源, 耗时秒数)，来源为memory/disk/computed"""
+    start_time = time.time()
+    
+    # 第一层：内存
+    df = processed_data_cache.get(dataset_key)
+    if df is not None:
+        count_processed_cache('memory_hits')
+        return df, 'memory', time.time() - start_time
+    
+    # 第二层：磁盘Parquet（旧结构版本生成的数据集缺少评论主键等列，视为未命中）
+    if is_dataset_current(dataset_key):
+        df = load_dataset(dataset_key)
+        if df is not None:
+            count_processed_cache('disk_hits')
+            processed_data_cache.set(dataset_key, df)
+            touch_dataset(dataset_key)
+            return df, 'disk', time.time() - start_time
+    
+    # 未命中：重新计算并写入两层缓存（流式处理时compute_fn已直接写入磁盘）
+    count_processed_cache('misses')
+    df = compute_fn()
+    if df is not None:
+        if not is_dataset_current(dataset_key):
+            save_dataset(df, dataset_key, name)
+        touch_dataset(dataset_key)
+        processed_data_cache.set(dataset_key, df)
+        evict_datasets(keep=dataset_key)
+    return df, 'computed', time.time() - start_time
+
+def get_processed_cache_stats():
+    """获取数据处理缓存的命中统计"""
+    with processed_cache_stats_lock:
+        return dict(processed_cache_stats)
+
+# ========== 多文件并行读取与合并 ==========
+def parse_review_file(file_name, content):
+    """解析单个评论文件（在子进程中执行），返回(文件名, 数据, 耗时秒数)"""
+    start_time = time.time()
+    buffer = io.BytesIO(content)
+    if file_name.endswith('.csv'):
+        df = pd.read_csv(buffer)
+    else:
+        df = pd.read_excel(buffer)
+    return file_name, df, time.time() - start_time
+
+def read_review_files_parallel(files, max_workers=None):
+    """使用进程池并行解析多个评论文件（files为(文件名, 文件内容)列表），返回(数据列表, 解析报告)"""
+    from concurrent.futures import ProcessPoolExecutor
+    
+    frames = []
+    report = []
+    if max_workers is None:
+        max_workers = min(len(files), os.cpu_count() or 1)
+    
+    def collect(file_name, parse):
+        try:
+            _, df, elapsed = parse()
+            frames.append(df)
+            report.append({'文件名': file_name, '行数': len(df), '解析耗时(秒)': round(elapsed, 2), '状态': '✅ 成功'})
+        except Exception as e:
+            report.append({'文件名': file_name, '行数': 0, '解析耗时(秒)': 0, '状态': f'❌ 失败: {str(e)[:50]}'})
+    
+    if max_workers <= 1:
+        # 单个文件时不必启动进程池
+        for file_name, content in files:
+            collect(file_name, lambda: parse_review_file(file_name, content))
+    else:
+        # xlsx解析是CPU密集型且openpyxl为单线程，使用多进程才能真正并行
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(file_name, executor.submit(parse_review_file, file_name, content)) for file_name, content in files]
+            for file_name, future in futures:
+                collect(file_name, future.result)
+    
+    return frames, pd.DataFrame(report)
+
+def hash_review_rows(df):
+    """去重用的评论哈希（uint64数组）：与评论主键使用同样的规范化，CSV和Excel中的同一条评论哈希相同"""
+    return compute_review_fingerprints(df.reindex(columns=REVIEW_DEDUP_COLUMNS)).to_numpy()
+
+def find_seen_reviews(hashes, seen):
+    """标记hashes中已出现在有序哈希数组seen中的评论（二分查找，不需要Python集合）"""
+    import numpy as np
+    
+    if not len(seen):
+        return np.zeros(len(hashes), dtype=bool)
+    positions = np.searchsorted(seen, hashes)
+    positions[positions == len(seen)] = 0
+    return seen[positions] == hashes
+
+def merge_review_frames(frames):
+    """合并多个评论数据并去重，返回(合并后的数据, 去除的重复行数)
+
+    去重规则（与流式处理相同）：只去除之前的文件中已出现过的评论，同一文件内的重复行保留。
+    """
+    import numpy as np
+    
+    if not frames:
+        return None, 0
+    if len(frames) == 1:
+        return frames[0], 0
+    if not any(col in frame.columns for frame in frames for col in REVIEW_DEDUP_COLUMNS):
+        return pd.concat(frames, ignore_index=True), 0
+    
+    seen = np.empty(0, dtype=np.uint64)
+    kept = []
+    duplicate_rows = 0
+    for frame in frames:
+        hashes = hash_review_rows(frame)
+        duplicated = find_seen_reviews(hashes, seen)
+        duplicate_rows += int(duplicated.sum())
+        kept.append(frame[~duplicated])
+        seen = np.union1d(seen, hashes)
+    return pd.concat(kept, ignore_index=True), duplicate_rows
+
+# ========== 增量追加（只处理新导出中的新评论） ==========
+def append_new_reviews(master_df, raw_df, brand_index=None):
+    """增量追加：只对主数据集中不存在的新评论做预处理，合并后返回(合并数据, 新增数据, 跳过的行数)"""
+    missing = [col for col in REQUIRED_REVIEW_COLUMNS if col not in raw_df.columns]
+    if missing:
+        st.error(f"缺少必要的列: {missing}")
+        return None, None, 0
+    
+    if REVIEW_KEY_COLUMN in master_df.columns:
+        master_keys = master_df[REVIEW_KEY_COLUMN]
+    else:
+        master_keys = compute_review_keys(master_df)
+    new_keys = compute_review_keys(raw_df)
+    delta_mask = ~new_keys.isin(master_keys) & ~new_keys.duplicated()
+    skipped = int((~delta_mask).sum())
+    
+    if not delta_mask.any():
+        return master_df, master_df.iloc[0:0], skipped
+    
+    # 只对新评论进行标准化和品牌关联
+    delta_df = process_data(raw_df[delta_mask.values].reset_index(drop=True), brand_index=brand_index)
+    if delta_df is None:
+        return None, None, skipped
+    
+    # 新评论的ID接在主数据集之后，已有评论的ID保持不变
+    start_id = int(master_df['ID'].max()) + 1 if len(master_df) > 0 else 1
+    delta_df['ID'] = range(start_id, start_id + len(delta_df))
+    
+    # 主数据集中已有的翻译、标签等列，新评论对应位置为空，后续只需处理这些空值
+    merged = pd.concat([master_df, delta_df], ignore_index=True)
+    return merged, delta_df, skipped
+
+def save_results_to_active_dataset(result_df, columns, key_column=REVIEW_KEY_COLUMN):
+    """将翻译/标注结果按评论主键写回当前共享数据集并持久化，返回是否成功"""
+    dataset_key = st.session_state.get('dataset_key')
+    master_df = st.session_state.get('processed_data')
+    if dataset_key is None or master_df is None:
+        return False
+    if key_column not in result_df.columns or key_column not in master_df.columns:
+        return False
+    
+    master_df = master_df.copy()
+    reattach_results(master_df, result_df, columns, key_column)
+    
+    save_dataset(master_df, dataset_key, st.session_state.get('dataset_name'))
+    processed_data_cache.set(dataset_key, master_df)
+    st.session_state['processed_data'] = master_df
+    return True
+
+# ========== 大文件流式处理（分块读取，逐块写入Parquet） ==========
+STREAM_CHUNK_SIZE = 50000  # 每个数据块的行数
+
+def iter_review_chunks(file, file_name, chunk_size=STREAM_CHUNK_SIZE):
+    """分块读取评论文件：CSV使用分块读取，Excel使用openpyxl只读模式逐行迭代"""
+    if file_name.endswith('.csv'):
+        reader = pd.read_csv(file, chunksize=chunk_size, usecols=lambda col: col in REQUIRED_REVIEW_COLUMNS)
+        for chunk in reader:
+            missing = [col for col in REQUIRED_REVIEW_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"缺少必要的列: {missing}")
+            yield chunk
+        return
+    
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        header = [str(col) if col is not None else '' for col in header]
+        missing = [col for col in REQUIRED_REVIEW_COLUMNS if col not in header]
+        if missing:
+            raise ValueError(f"缺少必要的列: {missing}")
+        
+        # 只取必要列所在的位置，其余列不进入内存
+        positions = [header.index(col) for col in REQUIRED_REVIEW_COLUMNS]
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in positions])
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=REQUIRED_REVIEW_COLUMNS)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=REQUIRED_REVIEW_COLUMNS)
+    finally:
+        workbook.close()
+
+def get_review_arrow_schema(with_brand=False):
+    """处理后评论数据的Arrow表结构，保证各数据块写入时类型一致"""
+    import pyarrow as pa
+    fields = [('ID', pa.int64()), (REVIEW_KEY_COLUMN, pa.string()), ('Asin', pa.string())]
+    if with_brand:
+        fields.append(('Brand', pa.string()))
+    fields += [
+        ('Title', pa.string()),
+        ('Content', pa.string()),
+        ('Model', pa.string()),
+        ('Rating', pa.float64()),
+        ('Date', pa.timestamp('ns')),
+        ('Review Type', pa.dictionary(pa.int8(), pa.string(), ordered=True))
+    ]
+    return pa.schema(fields)
+
+def stream_process_files(files, dataset_key, name=None, brand_index=None, chunk_size=STREAM_CHUNK_SIZE, progress_callback=None):
+    """流式处理一个或多个评论文件（files为(文件, 文件名)列表）：逐块标准化、去重后追加写入Parquet数据集，内存中只保留一个数据块"""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    with_brand = brand_index is not None
+    schema = get_review_arrow_schema(with_brand)
+    columns = [field.name for field in schema]
+    
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    path = get_dataset_path(dataset_key)
+    tmp_path = path + ".tmp"
+    total_rows = 0
+    duplicate_rows = 0
+    # 之前的文件中已出现过的评论哈希（有序uint64数组），每处理完一个文件合并一次
+    seen_hashes = np.empty(0, dtype=np.uint64)
+    brand_stats = {'total_records': 0, 'final_matches': 0, 'first_round_matches': 0, 'has_parent_asin': False}
+    
+    def iter_all_chunks():
+        nonlocal seen_hashes
+        for file, file_name in files:
+            file_hashes = []
+            for chunk in iter_review_chunks(file, file_name, chunk_size):
+                hashes = hash_review_rows(chunk)
+                file_hashes.append(hashes)
+                yield chunk, hashes
+            if file_hashes:
+                seen_hashes = np.union1d(seen_hashes, np.concatenate(file_hashes))
+    
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for chunk, hashes in iter_all_chunks():
+                # 去重规则与merge_review_frames相同：只去除之前的文件中已出现过的评论
+                keep_mask = ~find_seen_reviews(hashes, seen_hashes)
+                duplicate_rows += int((~keep_mask).sum())
+                chunk = chunk[keep_mask]
+                if chunk.empty:
+                    continue
+                
+                chunk = normalize_reviews(chunk.reset_index(drop=True))
+                chunk['Asin'] = chunk['Asin'].astype(str)
+                chunk.insert(0, 'ID', range(total_rows + 1, total_rows + len(chunk) + 1))
+                chunk.insert(1, REVIEW_KEY_COLUMN, compute_review_keys(chunk))
+                
+                if with_brand:
+                    chunk, chunk_stats = apply_brand_index(chunk, brand_index)
+                    for key in ['total_records', 'final_matches', 'first_round_matches']:
+                        brand_stats[key] += chunk_stats[key]
+                    brand_stats['has_parent_asin'] = chunk_stats['has_parent_asin']
+                
+                table = pa.Table.from_pandas(chunk[columns], schema=schema, preserve_index=False)
+                writer.write_table(table)
+                total_rows += len(chunk)
+                
+                if progress_callback:
+                    progress_callback(total_rows)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    register_dataset(dataset_key, name or files[0][1], total_rows, columns)
+    return total_rows, duplicate_rows, (brand_stats if with_brand else None)
+
+# ========== 评论处理步骤（页面和命令行流水线共用） ==========
+TRANSLATION_ERROR_PREFIX = "[翻译错误"
+
+class TaskCancelled(Exception):
+    """翻译或AI标注任务被用户取消"""
+
+def stop_if_cancelled(executor, cancel_event):
+    """任务被取消时丢弃线程池中尚未开始的请求并抛出TaskCancelled"""
+    if cancel_event is not None and cancel_event.is_set():
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise TaskCancelled("任务已取消")
+
+def preprocess_text_for_translation(text):
+    """预处理文本，提高翻译质量"""
+    # 移除多余的空白字符
+    text = ' '.join(text.split())
+    
+    # 处理常见的电商术语和缩写
+    text = text.replace('ASIN', 'ASIN')  # 保持ASIN不变
+    text = text.replace('USB-C', 'USB-C')  # 保持技术术语不变
+    text = text.replace('HDMI', 'HDMI')
+    text = text.replace('WiFi', 'WiFi')
+    text = text.replace('Bluetooth', 'Bluetooth')
+    
+    # 处理评分相关文本
+    text = text.replace('5 stars', '5星')
+    text = text.replace('4 stars', '4星')
+    text = text.replace('3 stars', '3星')
+    text = text.replace('2 stars', '2星')
+    text = text.replace('1 star', '1星')
+    
+    return text
+
+def postprocess_translation(translated_text):
+    """后处理翻译结果，提高质量"""
+    if not translated_text:
+        return translated_text
+    
+    # 修复常见的翻译错误
+    corrections = {
+        'ASIN': 'ASIN',  # 保持ASIN不变
+        'USB-C': 'USB-C',
+        'HDMI': 'HDMI',
+        'WiFi': 'WiFi',
+        'Bluetooth': 'Bluetooth',
+        '5星': '5星',
+        '4星': '4星',
+        '3星': '3星',
+        '2星': '2星',
+        '1星': '1星'
+    }
+    
+    for original, corrected in corrections.items():
+        translated_text = translated_text.replace(original, corrected)
+    
+    # 修复标点符号
+    translated_text = translated_text.replace('。。', '。')
+    translated_text = translated_text.replace('，，', '，')
+    translated_text = translated_text.replace('！！', '！')
+    translated_text = translated_text.replace('？？', '？')
+    
+    return translated_text
+
+def translate_text(text, translator, max_retries=3, limiter=None):
+    """翻译单个文本，带重试机制和质量优化；多次重试仍失败时返回错误标记
+
+    传入limiter（TokenBucket）时，每次接口请求（包括分段请求和重试）前取得一个令牌。
+    """
+    if not text or pd.isna(text) or str(text).strip() == '':
+        return ''
+    
+    text = str(text).strip()
+    
+    # 预处理文本，提高翻译质量
+    text = preprocess_text_for_translation(text)
+    
+    # 优先使用内存缓存
+    cache_key = get_memory_cache_key(text, 'google' if hasattr(translator, 'translator') else 'tencent')
+    cached_result = load_from_memory_cache(cache_key)
+    if cached_result:
+        return cached_result
+    
+    def request(part):
+        if limiter is not None:
+            limiter.acquire()
+        # 缓存由本函数统一读写，翻译器不再重复写入
+        return translator.translate(part, use_cache=False)
+    
+    for attempt in range(max_retries):
+        try:
+            # 如果文本太长，分段翻译
+            if len(text) > 4000:
+                # 按句子分割
+                sentences = text.split('. ')
+                translated_parts = []
+                current_part = ""
+                
+                for sentence in sentences:
+                    if len(current_part + sentence) < 4000:
+                        current_part += sentence + ". "
+                    else:
+                        if current_part:
+                            translated_parts.append(request(current_part.strip()))
+                        current_part = sentence + ". "
+                
+                if current_part:
+                    translated_parts.append(request(current_part.strip()))
+                
+                result = ' '.join(translated_parts)
+            else:
+                result = request(text)
+            
+            # 后处理翻译结果，提高质量
+            result = postprocess_translation(result)
+            
+            # 保存到内存缓存
+            save_to_memory_cache(cache_key, result)
+            
+            return result
+                
+        except Exception as e:
+            if attempt < max_retries - 1:
+                time.sleep(1)  # 等待1秒后重试
+                continue
+            else:
+                return f"{TRANSLATION_ERROR_PREFIX}: {text[:50]}...]"
+
+# 各翻译引擎默认的请求速率上限（次/秒）和并发线程数
+TRANSLATION_RATE_LIMITS = {'google': 5.0, 'tencent': 5.0}
+TRANSLATION_WORKERS = 8
+
+class TokenBucket:
+    """令牌桶限速器：平均每秒最多rate次请求，允许capacity次的短时突发，多线程共用"""
+    
+    def __init__(self, rate, capacity=None):
+        self.lock = threading.Lock()
+        self.set_rate(rate, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+    
+    def set_rate(self, rate, capacity=None):
+        with self.lock:
+            self.rate = max(float(rate), 0.01)
+            self.capacity = max(float(capacity if capacity is not None else rate), 1.0)
+            if hasattr(self, 'tokens'):
+                self.tokens = min(self.tokens, self.capacity)
+    
+    def acquire(self):
+        """取得一个令牌，令牌不足时等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+translation_rate_limiters = {}
+translation_rate_limiters_lock = threading.Lock()
+
+def get_translation_rate_limiter(engine, rate=None):
+    """获取翻译引擎共用的限速器（同一引擎的所有翻译任务共享同一个速率上限）"""
+    rate = rate or TRANSLATION_RATE_LIMITS.get(engine, 5.0)
+    with translation_rate_limiters_lock:
+        limiter = translation_rate_limiters.get(engine)
+        if limiter is None:
+            limiter = translation_rate_limiters[engine] = TokenBucket(rate)
+        elif limiter.rate != rate:
+            limiter.set_rate(rate)
+        return limiter
+
+def translate_texts_batch(texts, translator, limiter=None):
+    """一次请求批量翻译多条短文本，批量查询和写入翻译缓存
+
+    批量请求失败时不在这里逐条重试，对应位置返回None，由调用方作为单条任务重新排队（逐条经过限速器）。
+    """
+    engine = 'google' if hasattr(translator, 'translator') else 'tencent'
+    prepared = [preprocess_text_for_translation(str(text).strip()) for text in texts]
+    cache_keys = [get_memory_cache_key(text, engine) for text in prepared]
+    cached = load_many_from_translation_cache(cache_keys)
+    results = [cached.get(key) or None for key in cache_keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+    
+    if limiter is not None:
+        limiter.acquire()
+    try:
+        translated = translator.translate_batch([prepared[i] for i in pending], use_cache=False)
+    except Exception:
+        return results
+    for i, result in zip(pending, translated):
+        results[i] = postprocess_translation(result)
+    save_many_to_translation_cache({cache_keys[i]: results[i] for i in pending})
+    return results
+
+# 没有批量接口的引擎把多条短评论用分隔符拼成一次请求，译文再按分隔符拆回
+PACK_DELIMITER = "\n\n@@@\n\n"
+PACK_MAX_ITEMS = 100
+
+def translate_texts_packed(texts, translator, limiter=None):
+    """把多条短文本拼接为一次请求翻译并按分隔符拆分
+
+    请求失败或分隔符数量对不上时，未翻译的位置返回None，由调用方作为单条任务重新排队（逐条经过限速器）。
+    """
+    import re
+    
+    engine = 'google' if hasattr(translator, 'translator') else 'tencent'
+    prepared = [preprocess_text_for_translation(str(text).strip()) for text in texts]
+    cache_keys = [get_memory_cache_key(text, engine) for text in prepared]
+    cached = load_many_from_translation_cache(cache_keys)
+    results = [cached.get(key) or None for key in cache_keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+    
+    parts = None
+    if limiter is not None:
+        limiter.acquire()
+    try:
+        # 直接调用底层接口，拼接后的整段文本不写入缓存
+        packed_result = translator.translate(PACK_DELIMITER.join(prepared[i] for i in pending), use_cache=False)
+        parts = re.split(r'\s*@@@\s*', (packed_result or '').strip())
+    except Exception:
+        parts = None
+    
+    if parts is None or len(parts) != len(pending):
+        return results
+    for i, part in zip(pending, parts):
+        results[i] = postprocess_translation(part)
+    save_many_to_translation_cache({cache_keys[i]: results[i] for i in pending})
+    return results
+
+# 句子级翻译：按句末标点切分，每个句子单独查缓存，不同评论中的相同句子只翻译一次
+SENTENCE_SPLIT_PATTERN = r'(?<=[.!?])\s+'
+
+def split_sentences(text):
+    """把评论按句末标点切分为句子（空白已合并的文本）"""
+    import re
+    
+    return [sentence for sentence in re.split(SENTENCE_SPLIT_PATTERN, text) if sentence]
+
+def join_sentence_translations(parts):
+    """拼接逐句译文：中文句末标点后直接相连，其余情况（如未翻译的英文句子）用空格分隔"""
+    joined = ''
+    for part in parts:
+        if joined and part and not joined.endswith(('。', '！', '？', '…', '”')):
+            joined += ' '
+        joined += part
+    return joined
+
+def group_translation_tasks(tasks, translator):
+    """把短文本合并为一次请求：有批量接口时按批量接口限制分批，否则按引擎字符上限拼接；长文本单独请求"""
+    if getattr(translator, 'supports_batch', False):
+        max_chars, max_items, delimiter_length = TENCENT_BATCH_MAX_CHARS, TENCENT_BATCH_MAX_ITEMS, 0
+    elif getattr(translator, 'pack_char_limit', None):
+        max_chars, max_items, delimiter_length = translator.pack_char_limit, PACK_MAX_ITEMS, len(PACK_DELIMITER)
+    else:
+        return [[task] for task in tasks]
+    
+    units = []
+    batch = []
+    batch_chars = 0
+    for task in tasks:
+        text = str(task[2])
+        text_length = len(text) + delimiter_length
+        # 过长或本身含有分隔符的文本不参与合并
+        if text_length > max_chars // 2 or (delimiter_length and '@@@' in text):
+            units.append([task])
+            continue
+        if batch and (batch_chars + text_length > max_chars or len(batch) >= max_items):
+            units.append(batch)
+            batch = []
+            batch_chars = 0
+        batch.append(task)
+        batch_chars += text_length
+    if batch:
+        units.append(batch)
+    return units
+
+def translate_dataframe(df, columns_to_translate, engine='google', secret_id=None, secret_key=None, filters=None,
+                        rate_limit=None, max_workers=TRANSLATION_WORKERS, progress_callback=None, stats=None,
+                        sentence_mode=False, cancel_event=None):
+    """并发翻译DataFrame中的指定列，返回 (翻译后数据, 翻译行数, 失败行数, 已有翻译数)
+
+    待翻译单元格先按规范化后的原文去重（所有选中列合并去重），每条不同的原文只翻译一次，再按原文映射回各行；
+    请求通过线程池并发发出，由令牌桶按rate_limit（次/秒）限速；短文本通过批量接口或分隔符拼接合并为一次请求。
+    progress_callback(已完成文本数, 待翻译文本数, 已有翻译数, 速度(条/秒), 预计剩余秒数) 用于页面进度条或命令行日志，
+    文本数按去重后的原文计算。传入stats字典时写入去重统计（待翻译单元格数、不同原文数、去重率）。
+    sentence_mode为True时把原文切分为句子，逐句查缓存，只翻译缓存中没有的句子后再拼回整段译文，
+    stats中另外写入句子数、不同句子数和句子级缓存命中率。
+    cancel_event（threading.Event）被设置后不再发出新的请求，并抛出TaskCancelled。
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    import numpy as np
+    
+    translator = create_translator(engine, secret_id, secret_key)
+    limiter = get_translation_rate_limiter(engine, rate_limit)
+    
+    # 应用筛选条件
+    if filters:
+        df = filter_dataframe(df, filters)
+    
+    # 创建翻译后的DataFrame副本
+    df_translated = df.copy()
+    
+    # 为每个要翻译的列创建对应的中文列（已有的翻译结果保留，只翻译空白单元格）
+    translation_mapping = {}
+    for col in columns_to_translate:
+        if col in df.columns:
+            chinese_col = f"{col}_中文"
+            if chinese_col not in df_translated.columns:
+                df_translated[chinese_col] = ''
+            translation_mapping[col] = chinese_col
+    
+    # 收集需要翻译的单元格（之前失败的结果重新翻译），原文合并连续空白后去重
+    pending_cells = {}
+    cached_count = 0
+    for original_col, chinese_col in translation_mapping.items():
+        source = df[original_col]
+        normalized = source.astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+        existing_text = df_translated[chinese_col].astype(object).fillna('').astype(str).str.strip()
+        has_source = source.notna() & (normalized != '')
+        has_result = (existing_text != '') & ~existing_text.str.startswith(TRANSLATION_ERROR_PREFIX)
+        cached_count += int((has_source & has_result).sum())
+        pending_mask = (has_source & ~has_result).to_numpy()
+        if pending_mask.any():
+            pending_cells[chinese_col] = (pending_mask, normalized[pending_mask])
+    
+    unique_texts = pd.unique(pd.concat([texts for _, texts in pending_cells.values()], ignore_index=True)) \
+        if pending_cells else []
+    tasks = [(i, None, text) for i, text in enumerate(unique_texts)]
+    pending_count = sum(len(texts) for _, texts in pending_cells.values())
+    if stats is not None:
+        stats['pending_cells'] = pending_count
+        stats['unique_texts'] = len(tasks)
+        stats['dedup_ratio'] = 1 - len(tasks) / pending_count if pending_count else 0.0
+    
+    if sentence_mode:
+        # 翻译单位改为句子：先批量查询所有不同句子的缓存，只把未命中的句子交给翻译引擎
+        engine_key = 'google' if hasattr(translator, 'translator') else 'tencent'
+        text_sentences = {text: split_sentences(text) for text in unique_texts}
+        unique_sentences = list(dict.fromkeys(sentence for sentences in text_sentences.values() for sentence in sentences))
+        sentence_keys = [get_memory_cache_key(preprocess_text_for_translation(sentence), engine_key)
+                         for sentence in unique_sentences]
+        cached_sentences = load_many_from_translation_cache(sentence_keys)
+        sentence_translations = {sentence: cached_sentences[key]
+                                 for sentence, key in zip(unique_sentences, sentence_keys) if cached_sentences.get(key)}
+        tasks = [(i, None, sentence) for i, sentence in enumerate(unique_sentences) if sentence not in sentence_translations]
+        if stats is not None:
+            stats['sentences'] = sum(len(sentences) for sentences in text_sentences.values())
+            stats['unique_sentences'] = len(unique_sentences)
+            stats['sentence_cache_hits'] = len(sentence_translations)
+            stats['sentence_hit_rate'] = len(sentence_translations) / len(unique_sentences) if unique_sentences else 0.0
+    
+    def translate_unit(unit):
+        # 每次接口请求消耗一个令牌，批量请求也只算一次；合并请求失败的条目返回None，之后逐条重新排队
+        stop_if_cancelled(None, cancel_event)
+        if len(unit) == 1:
+            return [translate_text(unit[0][2], translator, limiter=limiter)]
+        texts = [text for _, _, text in unit]
+        if getattr(translator, 'supports_batch', False):
+            return translate_texts_batch(texts, translator, limiter=limiter)
+        return translate_texts_packed(texts, translator, limiter=limiter)
+    
+    units = group_translation_tasks(tasks, translator)
+    translations = {}
+    start_time = time.time()
+    try:
+        if units:
+            done = 0
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(units)))) as executor:
+                futures = {executor.submit(translate_unit, unit): unit for unit in units}
+                while futures:
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    stop_if_cancelled(executor, cancel_event)
+                    for future in finished:
+                        unit = futures.pop(future)
+                        try:
+                            translated_texts = future.result()
+                        except Exception as e:
+                            translated_texts = [f"{TRANSLATION_ERROR_PREFIX}: {str(e)[:50]}]"] * len(unit)
+                        for task, translated_text in zip(unit, translated_texts):
+                            if translated_text is None:
+                                futures[executor.submit(translate_unit, [task])] = [task]
+                            else:
+                                translations[task[2]] = translated_text
+                                done += 1
+                    if progress_callback:
+                        elapsed = time.time() - start_time
+                        rate = done / elapsed if elapsed > 0 else 0.0
+                        eta = (len(tasks) - done) / rate if rate > 0 else None
+                        progress_callback(done, len(tasks), cached_count, rate, eta)
+        elif progress_callback:
+            progress_callback(0, 0, cached_count, 0.0, 0)
+    finally:
+        # 把本次翻译缓冲的译文写入翻译记忆库
+        translation_memory.flush_writes()
+    
+    if sentence_mode:
+        # 按句子顺序拼回整段译文，任一句子翻译失败时整段记为失败
+        sentence_translations.update(translations)
+        translations = {}
+        for text, sentences in text_sentences.items():
+            parts = [sentence_translations.get(sentence) or '' for sentence in sentences]
+            failed = [part for part in parts if part.startswith(TRANSLATION_ERROR_PREFIX)]
+            translations[text] = failed[0] if failed else join_sentence_translations(parts)
+    
+    # 按原文映射回各行的中文列
+    failed_rows = np.zeros(len(df_translated), dtype=bool)
+    for chinese_col, (pending_mask, texts) in pending_cells.items():
+        translated_texts = texts.map(translations).fillna('')
+        column = df_translated[chinese_col].astype(object).to_numpy(copy=True)
+        column[pending_mask] = translated_texts.to_numpy()
+        df_translated[chinese_col] = column
+        failed_rows[pending_mask] |= translated_texts.str.startswith(TRANSLATION_ERROR_PREFIX).to_numpy()
+    
+    error_count = int(failed_rows.sum())
+    translated_count = len(df) - error_count
+    return df_translated, translated_count, error_count, cached_count
+
+# ========== 可断点续传的翻译任务 ==========
+TRANSLATION_JOB_DIR = "translation_jobs"
+TRANSLATION_JOB_CHECKPOINT_ROWS = 500  # 每翻译多少行保存一次检查点
+# 当前进程中正在运行的翻译任务ID：清单为running但不在其中的任务所在进程已退出
+active_translation_jobs = set()
+active_translation_jobs_lock = threading.Lock()
+
+def get_translation_row_keys(df):
+    """翻译任务中每行的主键：优先使用评论主键，没有时使用行号"""
+    if REVIEW_KEY_COLUMN in df.columns:
+        return df[REVIEW_KEY_COLUMN].astype(str).reset_index(drop=True)
+    return pd.Series([str(i) for i in range(len(df))])
+
+def get_translation_job_id(df, columns, engine, sentence_mode=False):
+    """按输入数据指纹和翻译参数生成任务ID，相同的输入和参数总是对应同一个任务"""
+    key_columns = [REVIEW_KEY_COLUMN] if REVIEW_KEY_COLUMN in df.columns else []
+    fingerprint = get_frame_fingerprint(df[key_columns + [col for col in columns if col in df.columns]])
+    content = json.dumps([fingerprint, sorted(columns), engine, bool(sentence_mode)])
+    return hashlib.md5(content.encode('utf-8')).hexdigest()[:16], fingerprint
+
+class TranslationJob:
+    """翻译任务的运行清单和分段检查点，会话断开或服务重启后可以从上次完成的行继续"""
+    
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.job_dir = os.path.join(TRANSLATION_JOB_DIR, job_id)
+        self.manifest_path = os.path.join(self.job_dir, "manifest.json")
+        self.manifest = None
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            # 进程在运行中被终止时清单停留在running，没有运行线程的视为已中断，可从检查点继续
+            if self.manifest.get('status') == 'running' and not self.is_active:
+                self.manifest['status'] = 'interrupted'
+                self.manifest['error'] = "任务所在进程已退出，可用相同的数据和参数从上次检查点继续"
+    
+    @classmethod
+    def open(cls, df, columns, engine, sentence_mode=False, name=None):
+        """打开输入数据和参数对应的任务，不存在时创建"""
+        job_id, fingerprint = get_translation_job_id(df, columns, engine, sentence_mode)
+        job = cls(job_id)
+        if job.manifest is None:
+            os.makedirs(job.job_dir, exist_ok=True)
+            job.manifest = {
+                'job_id': job_id,
+                'name': name or job_id,
+                'input_fingerprint': fingerprint,
+                'columns': list(columns),
+                'engine': engine,
+                'sentence_mode': bool(sentence_mode),
+                'total_rows': len(df),
+                'completed_rows': 0,
+                'error_rows': 0,
+                'parts': [],
+                'status': 'pending',
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            job.save_manifest()
+        return job
+    
+    @property
+    def exists(self):
+        return self.manifest is not None
+    
+    @property
+    def is_active(self):
+        """任务是否正在当前进程中运行"""
+        with active_translation_jobs_lock:
+            return self.job_id in active_translation_jobs
+    
+    def save_manifest(self):
+        """原子写入任务清单"""
+        self.manifest['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def load_results(self):
+        """读取所有检查点（行主键和中文列），同一行以最后一次翻译结果为准"""
+        parts = [os.path.join(self.job_dir, part) for part in self.manifest['parts']]
+        parts = [pd.read_parquet(path) for path in parts if os.path.exists(path)]
+        if not parts:
+            return None
+        return pd.concat(parts, ignore_index=True).drop_duplicates(subset=['row_key'], keep='last')
+    
+    def save_part(self, part_df, completed_rows, error_rows):
+        """保存一段检查点并更新清单中的已完成行数"""
+        part_name = f"part-{len(self.manifest['parts']) + 1:05d}.parquet"
+        path = os.path.join(self.job_dir, part_name)
+        part_df.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        self.manifest['parts'].append(part_name)
+        self.manifest['completed_rows'] = completed_rows
+        self.manifest['error_rows'] = error_rows
+        self.save_manifest()
+    
+    def mark(self, status, error=None):
+        self.manifest['status'] = status
+        self.manifest['error'] = error
+        self.save_manifest()
+    
+    def delete(self):
+        """删除任务清单和检查点"""
+        import shutil
+        
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+        self.manifest = None
+
+def list_translation_jobs():
+    """列出所有翻译任务的清单（按更新时间倒序）"""
+    jobs = []
+    if not os.path.exists(TRANSLATION_JOB_DIR):
+        return jobs
+    for job_id in os.listdir(TRANSLATION_JOB_DIR):
+        job = TranslationJob(job_id)
+        if job.exists:
+            jobs.append(job.manifest)
+    return sorted(jobs, key=lambda x: x.get('updated_at', ''), reverse=True)
+
+def merge_translation_stats(total, stats):
+    """累加各段的去重统计并重新计算比例"""
+    for key, value in stats.items():
+        if not key.endswith(('_ratio', '_rate')):
+            total[key] = total.get(key, 0) + value
+    if total.get('pending_cells'):
+        total['dedup_ratio'] = 1 - total['unique_texts'] / total['pending_cells']
+    if total.get('unique_sentences'):
+        total['sentence_hit_rate'] = total['sentence_cache_hits'] / total['unique_sentences']
+    return total
+
+def run_translation_job(df, columns_to_translate, engine='google', secret_id=None, secret_key=None, rate_limit=None,
+                        max_workers=TRANSLATION_WORKERS, sentence_mode=False, checkpoint_rows=TRANSLATION_JOB_CHECKPOINT_ROWS,
+                        progress_callback=None, stats=None, name=None, restart=False, cancel_event=None):
+    """以可断点续传的任务方式翻译DataFrame，返回值与translate_dataframe相同
+
+    已保存检查点的行直接使用检查点中的译文，其余行每checkpoint_rows行翻译并保存一次检查点；
+    中断后用相同的数据和参数再次调用即从上次完成的行继续。翻译失败的行不计为完成，续传时会重新翻译。
+    progress_callback(已完成行数, 总行数, 续传行数, 速度(行/秒), 预计剩余秒数)。
+    """
+    columns = [col for col in columns_to_translate if col in df.columns]
+    chinese_columns = [f"{col}{TRANSLATION_COLUMN_SUFFIX}" for col in columns]
+    job = TranslationJob.open(df, columns, engine, sentence_mode, name=name)
+    if job.is_active:
+        raise Exception("相同数据和参数的翻译任务正在运行中")
+    if restart:
+        job.delete()
+        job = TranslationJob.open(df, columns, engine, sentence_mode, name=name)
+    
+    df_translated = df.copy()
+    row_keys = get_translation_row_keys(df)
+    
+    # 把检查点中的译文关联回对应行，翻译成功的行视为已完成
+    completed = pd.Series(False, index=range(len(df)))
+    previous = job.load_results()
+    if previous is not None:
+        lookup = previous.set_index('row_key')
+        for chinese_col in chinese_columns:
+            if chinese_col not in lookup.columns:
+                continue
+            values = row_keys.map(lookup[chinese_col])
+            if chinese_col in df_translated.columns:
+                values = values.combine_first(df_translated[chinese_col].astype(object).reset_index(drop=True))
+            df_translated[chinese_col] = values.to_numpy()
+        ok = row_keys.isin(lookup.index)
+        for chinese_col in chinese_columns:
+            if chinese_col in df_translated.columns:
+                text = df_translated[chinese_col].astype(object).fillna('').astype(str).reset_index(drop=True)
+                ok &= ~text.str.startswith(TRANSLATION_ERROR_PREFIX)
+        completed = ok
+    
+    resumed_rows = int(completed.sum())
+    remaining = (~completed).to_numpy().nonzero()[0]
+    with active_translation_jobs_lock:
+        if job.job_id in active_translation_jobs:
+            raise Exception("相同数据和参数的翻译任务正在运行中")
+        active_translation_jobs.add(job.job_id)
+    job.mark('running')
+    
+    done_rows = resumed_rows
+    start_time = time.time()
+    job_stats = {}
+    try:
+        for start in range(0, len(remaining), checkpoint_rows):
+            stop_if_cancelled(None, cancel_event)
+            positions = remaining[start:start + checkpoint_rows]
+            chunk_stats = {}
+            translated, _, _, _ = translate_dataframe(
+                df_translated.iloc[positions], columns, engine=engine, secret_id=secret_id, secret_key=secret_key,
+                rate_limit=rate_limit, max_workers=max_workers, stats=chunk_stats, sentence_mode=sentence_mode,
+                cancel_event=cancel_event
+            )
+            merge_translation_stats(job_stats, chunk_stats)
+            
+            part = pd.DataFrame({'row_key': row_keys.iloc[positions].to_numpy()})
+            chunk_ok = pd.Series(True, index=range(len(positions)))
+            for chinese_col in chinese_columns:
+                values = translated[chinese_col].astype(object).to_numpy()
+                if chinese_col not in df_translated.columns:
+                    df_translated[chinese_col] = ''
+                column = df_translated[chinese_col].astype(object).to_numpy(copy=True)
+                column[positions] = values
+                df_translated[chinese_col] = column
+                part[chinese_col] = values
+                chunk_ok &= ~pd.Series(values).fillna('').astype(str).str.startswith(TRANSLATION_ERROR_PREFIX)
+            completed.iloc[positions] = chunk_ok.to_numpy()
+            
+            done_rows += len(positions)
+            job.save_part(part, int(completed.sum()), done_rows - int(completed.sum()))
+            if progress_callback:
+                elapsed = time.time() - start_time
+                rate = (done_rows - resumed_rows) / elapsed if elapsed > 0 else 0.0
+                eta = (len(df) - done_rows) / rate if rate > 0 else None
+                progress_callback(done_rows, len(df), resumed_rows, rate, eta)
+    except BaseException as e:
+        job.mark('cancelled' if isinstance(e, TaskCancelled) else 'interrupted', str(e)[:200])
+        raise
+    finally:
+        with active_translation_jobs_lock:
+            active_translation_jobs.discard(job.job_id)
+    
+    if progress_callback and not len(remaining):
+        progress_callback(len(df), len(df), resumed_rows, 0.0, 0)
+    error_count = len(df) - int(completed.sum())
+    job.mark('completed' if error_count == 0 else 'completed_with_errors')
+    if stats is not None:
+        stats.update(job_stats)
+        stats['job_id'] = job.job_id
+        stats['resumed_rows'] = resumed_rows
+    return df_translated, len(df) - error_count, error_count, resumed_rows
+
+def analyze_reviews(df, categories):
+    """按关键词类别分析评论并打标签，返回 (结果表, 各类别匹配统计)"""
+    # 创建结果DataFrame，保留ID列和评论主键
+    results = pd.DataFrame()
+    results['ID'] = df['ID']  # 保留原始ID
+    if REVIEW_KEY_COLUMN in df.columns:
+        results[REVIEW_KEY_COLUMN] = df[REVIEW_KEY_COLUMN]
+    results['Content'] = df['Content']
+    results['Original Review Type'] = df['Review Type']
+
+    # 检查并保留翻译内容列
+    for col in TRANSLATION_COLUMN_CANDIDATES:
+        if col in df.columns:
+            results[col] = df[col]
+            break  # 只保留第一个检测到的翻译列
+
+    # 预处理文本数据，提高性能
+    text_series = df['Content'].astype(str).str.lower()
+    
+    # 为每个类别创建一列（列名为"是否{main_category}-{sub_category}"）
+    for main_category, sub_categories in categories.items():
+        if isinstance(sub_categories, dict):  # 新格式
+            for sub_category, keywords in sub_categories.items():
+                # 将关键词字符串转换为列表
+                keyword_list = [k.strip() for k in keywords.split(',') if k.strip()]
+                
+                # 使用向量化操作替代apply
+                matches = []
+                for text in text_series:
+                    has_match = any(k.lower() in text for k in keyword_list)
+                    matches.append(has_match)
+                
+                results[f'是否{main_category}-{sub_category}'] = matches
+        else:  # 旧格式
+            # 将关键词字符串转换为列表
+            keyword_list = [k.strip() for k in sub_categories.split(',') if k.strip()]
+            
+            # 使用向量化操作替代apply
+            matches = []
+            for text in text_series:
+                has_match = any(k.lower() in text for k in keyword_list)
+                matches.append(has_match)
+            
+            results[f'是否{main_category}'] = matches
+
+    # 统计每个类别的匹配数量
+    stats = {}
+    for main_category, sub_categories in categories.items():
+        stats[main_category] = {}
+        if isinstance(sub_categories, dict):  # 新格式
+            for sub_category in sub_categories:
+                matched = results[f'是否{main_category}-{sub_category}'].sum()
+                stats[main_category][sub_category] = {
+                    'matched': int(matched),
+                    'percentage': round(matched / len(df) * 100, 2)
+                }
+        else:  # 旧格式
+            matched = results[f'是否{main_category}'].sum()
+            stats[main_category] = {
+                'matched': int(matched),
+                'percentage': round(matched / len(df) * 100, 2)
+            }
+
+    return results, stats
+
+def format_ai_prompt(row, prompt_template, source_col):
+    """用评论内容填充AI提问模板"""
+    try:
+        if "{Content}" in prompt_template:
+            return prompt_template.format(Content=str(row[source_col]))
+        elif "{text}" in prompt_template:
+            return prompt_template.format(text=str(row[source_col]))
+        return prompt_template
+    except Exception:
+        return prompt_template
+
+def ai_label_row(row, prompt_template, source_col, ai_model, api_key):
+    """对单条评论生成AI标签（优先读取AI缓存）"""
+    try:
+        formatted_prompt = format_ai_prompt(row, prompt_template, source_col)
+        # 使用源列内容作为主要文本
+        text_content = str(row[source_col])
+        
+        cache_key = get_ai_cache_key(text_content, formatted_prompt, ai_model)
+        label = load_ai_label_from_cache(cache_key)
+        if label is None:
+            label = call_ai_model(text_content, formatted_prompt, ai_model, api_key)
+            save_ai_label_to_cache(cache_key, label)
+        return label
+    except Exception as e:
+        return f"[AI异常: {str(e)[:30]}]"
+
+def get_pending_label_mask(df, col_name):
+    """返回需要AI标注的行：标签为空或之前调用失败的行"""
+    if col_name not in df.columns:
+        return pd.Series(True, index=df.index)
+    existing = df[col_name].astype(str).str.strip()
+    return df[col_name].isna() | (existing == '') | existing.str.startswith('[AI')
+
+def ai_label_dataframe(df, ai_settings, ai_model, api_key, max_workers=3, progress_callback=None, cancel_event=None):
+    """按AI任务批量标注，已有标签的行直接保留，返回带标签列的数据副本
+
+    progress_callback(任务名称, 本任务已处理数, 本任务待处理数, 跳过数, 总完成数, 总任务数)。
+    cancel_event（threading.Event）被设置后不再发出新的请求，并抛出TaskCancelled。
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    df_result = df.copy()
+    total_tasks = len(df) * len(ai_settings)
+    task_count = 0
+    
+    for setting in ai_settings:
+        col_name = setting["col_name"]
+        prompt_template = setting["prompt"]
+        source_col = setting["source_col"]
+        
+        pending_mask = get_pending_label_mask(df_result, col_name)
+        if col_name in df_result.columns:
+            ai_labels = df_result[col_name].astype(object).tolist()
+        else:
+            ai_labels = [None] * len(df_result)
+        pending_positions = [idx for idx, pending in enumerate(pending_mask) if pending]
+        skipped = len(df_result) - len(pending_positions)
+        
+        # 跳过的行直接计入进度
+        task_count += skipped
+        if progress_callback:
+            progress_callback(setting.get('name', col_name), 0, len(pending_positions), skipped, task_count, total_tasks)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(ai_label_row, df_result.iloc[idx], prompt_template, source_col, ai_model, api_key): idx
+                for idx in pending_positions
+            }
+            
+            for i, future in enumerate(as_completed(futures)):
+                stop_if_cancelled(executor, cancel_event)
+                idx = futures[future]
+                try:
+                    ai_labels[idx] = future.result()
+                except Exception as e:
+                    ai_labels[idx] = f"[AI异常: {str(e)[:30]}]"
+                
+                task_count += 1
+                if progress_callback:
+                    progress_callback(setting.get('name', col_name), i + 1, len(pending_positions), skipped, task_count, total_tasks)
+        
+        df_result[col_name] = ai_labels
+    
+    return df_result
+
+# ========== 下载文件缓存（按需在后台线程生成，按字节上限LRU淘汰） ==========
+DOWNLOAD_CACHE_MAX_MB = 256  # 已生成下载文件的内存上限（MB）
+DOWNLOAD_WORKERS = 2  # 后台生成下载文件的线程数
+
+def hash_frame_rows(df):
+    """逐行计算DataFrame的哈希值"""
+    try:
+        return pd.util.hash_pandas_object(df, index=False)
+    except TypeError:
+        # 含有列表等不可哈希的值时按文本计算
+        return pd.util.hash_pandas_object(df.astype(str), index=False)
+
+def get_frame_fingerprint(df):
+    """计算DataFrame内容指纹（列名、类型和所有值）"""
+    hasher = hashlib.md5()
+    hasher.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode('utf-8'))
+    hasher.update(hash_frame_rows(df).values.tobytes())
+    return hasher.hexdigest()
+
+
+class DownloadArtifactCache:
+    """下载文件缓存：相同(数据指纹, 格式, 列)只生成一次，生成过程在后台线程中进行"""
+    
+    def __init__(self, max_bytes, max_workers=DOWNLOAD_WORKERS):
+        from concurrent.futures import ThreadPoolExecutor
+        
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.errors = {}  # 生成失败的错误信息，页面显示一次后删除
+        self.oversized = (None, None)  # 超过缓存上限的文件不计入缓存，只保留最近生成的一个供下载
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download")
+    
+    @staticmethod
+    def make_key(df, file_format, columns=None):
+        """按实际导出的列的完整内容指纹生成缓存键"""
+        if columns is not None:
+            df = df[list(columns)]
+        return (get_frame_fingerprint(df), file_format, tuple(columns) if columns is not None else None)
+    
+    def get(self, key):
+        """获取已生成的文件内容，未生成时返回None"""
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            if self.oversized[0] == key:
+                return self.oversized[1]
+        return None
+    
+    def is_pending(self, key):
+        with self.lock:
+            return key in self.pending
+    
+    def pop_error(self, key):
+        with self.lock:
+            return self.errors.pop(key, None)
+    
+    def request(self, key, df, file_format, columns=None):
+        """提交后台生成任务（已缓存或正在生成时不重复提交），返回Future或None"""
+        with self.lock:
+            if key in self.cache:
+                return None
+            if key in self.pending:
+                return self.pending[key]
+            future = self.executor.submit(self._build, key, df, file_format, columns)
+            self.pending[key] = future
+            return future
+    
+    def _build(self, key, df, file_format, columns):
+        try:
+            data = get_download_data(df[list(columns)] if columns is not None else df, file_format)
+            self._store(key, data)
+            return data
+        except Exception as e:
+            with self.lock:
+                self.errors[key] = str(e)
+            raise
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+    
+    def _store(self, key, data):
+        with self.lock:
+            if len(data) > self.max_bytes:
+                self.oversized = (key, data)
+                return
+            if key in self.cache:
+                self.total_bytes -= len(self.cache.pop(key))
+            self.cache[key] = data
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.total_bytes -= len(evicted)
+    
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.oversized = (None, None)
+            self.total_bytes = 0
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                'items': len(self.cache),
+                'pending': len(self.pending),
+                'size_mb': round(self.total_bytes / 1024 / 1024, 2),
+                'max_mb': round(self.max_bytes / 1024 / 1024, 2)
+            }
+
+download_cache = DownloadArtifactCache(DOWNLOAD_CACHE_MAX_MB * 1024 * 1024)
+
+@st.fragment(run_every=1)
+def wait_for_download(cache_key, format_label):
+    """下载文件生成中的提示：每秒只刷新这一部分，生成结束后重新运行页面以显示下载按钮"""
+    if not download_cache.is_pending(cache_key):
+        st.rerun()
+    st.info(f"⏳ 正在后台生成{format_label}文件，完成后将自动显示下载按钮...")
+
+def render_download_button(df, file_stem, label="📥 下载结果", formats=None, key=None, columns=None, primary=False):
+    """显示下载格式选择和下载按钮：文件只在点击生成后于后台线程创建，并按内容缓存"""
+    formats = formats or TABLE_DOWNLOAD_FORMATS
+    file_format = st.radio(
+        "选择下载格式",
+        formats,
+        format_func=lambda code: DOWNLOAD_FORMATS[code]['label'],
+        horizontal=True,
+        key=f"{key}_format" if key else None,
+        help="Parquet/Feather保留数据类型，读写速度远快于Excel，适合交给BI或用pandas继续分析"
+    )
+    info = DOWNLOAD_FORMATS[file_format]
+    
+    # 从未点击生成时不计算内容指纹；点击过之后每次重新运行都按完整内容指纹查找，数据有任何变化都不会复用旧文件
+    state_key = f"download_{key or file_stem}"
+    cache_key = download_cache.make_key(df, file_format, columns) if st.session_state.get(state_key) else None
+    data = download_cache.get(cache_key) if cache_key is not None else None
+    
+    if data is None:
+        if cache_key is not None:
+            error = download_cache.pop_error(cache_key)
+            if error is not None:
+                st.error(f"❌ 生成下载文件失败: {error}")
+            elif download_cache.is_pending(cache_key):
+                wait_for_download(cache_key, info['label'])
+                return
+        if not st.button(
+            f"📦 生成{info['label']}下载文件",
+            key=f"{key}_prepare" if key else None,
+            type="primary" if primary else "secondary",
+            use_container_width=True
+        ):
+            return
+        if cache_key is None:
+            cache_key = download_cache.make_key(df, file_format, columns)
+            st.session_state[state_key] = True
+        data = download_cache.get(cache_key)
+        if data is None:
+            # 后台生成，不阻塞页面；离开页面后任务仍会继续，生成的文件会保留在缓存中
+            download_cache.request(cache_key, df, file_format, columns)
+            wait_for_download(cache_key, info['label'])
+            return
+    
+    st.download_button(
+        label=f"{label} ({info['label']})",
+        data=data,
+        file_name=f"{file_stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{info['extension']}",
+        mime=info['mime'],
+        key=f"{key}_download" if key else None,
+        type="primary" if primary else "secondary",
+        use_container_width=True
+    )
+
+def render_job_list(kind, state_key):
+    """列出当前用户的后台任务：刷新页面后自动接回运行中的任务，已结束的任务可手动接回查看结果"""
+    from job_runner import job_runner, get_job_owner
+    
+    jobs = job_runner.list_jobs(owner=get_job_owner(), kind=kind)
+    if state_key not in st.session_state:
+        active = [job for job in jobs if not job.is_finished]
+        if active:
+            st.session_state[state_key] = active[0].job_id
+    if not jobs:
+        return
+    
+    with st.expander(f"🧵 我的后台任务（{len(jobs)}）", expanded=False):
+        st.dataframe(pd.DataFrame([{
+            '任务': job.description,
+            '状态': job.status,
+            '提交时间': info['created_at'],
+            '结束时间': info['finished_at'],
+            '错误': job.error or ''
+        } for job, info in ((job, job.to_dict()) for job in jobs)]), use_container_width=True)
+        finished = {f"{job.description}（{job.status}，{job.to_dict()['finished_at']}）": job.job_id
+                    for job in jobs if job.status == 'succeeded'}
+        if finished:
+            selected = st.selectbox("已完成的任务", list(finished.keys()), key=f"{state_key}_reattach_select")
+            if st.button("🔗 重新载入任务结果", key=f"{state_key}_reattach", disabled=state_key in st.session_state):
+                st.session_state[state_key] = finished[selected]
+                st.rerun()
+
+# ========== 分析报告（数据、分组统计、评分分布、关键词和AI标签汇总合并为一个文件） ==========
+REPORT_TOP_LABELS = 20  # AI标签汇总中每列保留的高频标签数
+AI_LABEL_SEPARATOR = '|'  # AI标签提示词约定的多个标签分隔符
+
+def get_result_columns(df):
+    """区分结果列：翻译列、关键词标签列和AI标签列"""
+    translation_cols = [col for col in df.columns if str(col).endswith(TRANSLATION_COLUMN_SUFFIX)]
+    keyword_cols = [col for col in df.columns if str(col).startswith('是否')]
+    ai_cols = [
+        col for col in df.columns
+        if col not in PROCESSED_COLUMN_ORDER and col not in translation_cols and col not in keyword_cols
+        and col not in ('Group', 'Month') and is_text_column(df[col])
+    ]
+    return translation_cols, keyword_cols, ai_cols
+
+def summarize_ai_labels(df, ai_cols, top_n=REPORT_TOP_LABELS):
+    """统计AI标签列中出现最多的标签（多个标签用|分隔时分别计数）"""
+    rows = []
+    for col in ai_cols:
+        labels = as_text_series(df[col]).dropna().astype(str)
+        labels = labels[~labels.str.startswith('[AI') & (labels.str.strip() != '')]
+        items = labels.str.split(AI_LABEL_SEPARATOR, regex=False).explode().str.strip()
+        counts = items[items != ''].value_counts().head(top_n)
+        for label, count in counts.items():
+            rows.append({'标签列': col, '标签': label, '数量': int(count), '占比(%)': round(count / max(len(labels), 1) * 100, 2)})
+    return pd.DataFrame(rows, columns=['标签列', '标签', '数量', '占比(%)'])
+
+def build_report_tables(df):
+    """计算报告中的各项统计表，返回 (表名→DataFrame, 图表列表)"""
+    tables = {}
+    figs = []
+    
+    stats_df, review_counts, _ = calculate_review_stats(df)
+    tables['评论类型分布'] = stats_df.reset_index()
+    figs.append(create_pie_chart(review_counts))
+    
+    rating_counts = df['Rating'].value_counts().sort_index(ascending=False)
+    tables['评分分布'] = pd.DataFrame({
+        '评分': rating_counts.index,
+        '数量': rating_counts.values,
+        '占比(%)': (rating_counts.values / max(len(df), 1) * 100).round(2)
+    })
+    
+    group_options = [('ASIN分组统计', ['Asin', 'Model'])]
+    if 'Brand' in df.columns and df['Brand'].notna().any():
+        group_options.append(('品牌分组统计', ['Brand', 'Asin', 'Model']))
+    for name, group_by in group_options:
+        work_df = df.copy(deep=False)
+        stats, rating_dist, group_col = analyze_by_group(work_df, group_by)
+        stats['评论类型分布'] = stats['评论类型分布'].map(
+            lambda dist: ', '.join(f"{k}: {v}" for k, v in dist.items()) if isinstance(dist, dict) else ''
+        )
+        rating_dist = rating_dist.round(2)
+        rating_dist.columns = [f"{col:g}星占比(%)" for col in rating_dist.columns]
+        tables[name] = stats.join(rating_dist).reset_index().rename(columns={group_col: '分组'})
+        figs.append(create_rating_heatmap(rating_dist.rename(columns=lambda c: c.replace('星占比(%)', '')), f'{name} - 评分分布'))
+        if 'Date' in work_df.columns and pd.api.types.is_datetime64_any_dtype(work_df['Date']):
+            figs.append(create_rating_trend_chart(work_df, group_col))
+    
+    translation_cols, keyword_cols, ai_cols = get_result_columns(df)
+    if translation_cols:
+        tables['翻译覆盖'] = pd.DataFrame([
+            {'翻译列': col, '已翻译': int((as_text_series(df[col]).fillna('').astype(str).str.strip() != '').sum()), '总行数': len(df)}
+            for col in translation_cols
+        ])
+    if keyword_cols:
+        matched = df[keyword_cols].fillna(False).astype(bool).sum()
+        keyword_stats = pd.DataFrame({
+            '类别': [col[len('是否'):] for col in keyword_cols],
+            '匹配数量': matched.values.astype(int),
+            '占比(%)': (matched.values / max(len(df), 1) * 100).round(2)
+        }).sort_values('匹配数量', ascending=False)
+        tables['关键词匹配统计'] = keyword_stats
+        figs.append(px.bar(keyword_stats, x='类别', y='匹配数量', title='关键词类别匹配数量'))
+    if ai_cols:
+        ai_summary = summarize_ai_labels(df, ai_cols)
+        tables['AI标签汇总'] = ai_summary
+        for col in ai_cols:
+            col_summary = ai_summary[ai_summary['标签列'] == col]
+            if not col_summary.empty:
+                figs.append(px.bar(col_summary, x='标签', y='数量', title=f'{col} - 高频标签'))
+    
+    return tables, figs
+
+def build_analysis_report(df, file_format='report.xlsx'):
+    """生成分析报告：report.xlsx为多工作表Excel，report.zip为HTML报告和Parquet数据打包"""
+    tables, figs = build_report_tables(df)
+    
+    if file_format == 'report.xlsx':
+        import tempfile
+        
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            workbook = create_export_workbook(path)
+            try:
+                # 统计表在前，明细数据放在最后（数据超过单表上限时自动分表）
+                for name, table in tables.items():
+                    write_frame_to_workbook(workbook, table, name)
+                write_frame_to_workbook(workbook, df, "数据{}")
+            finally:
+                workbook.close()
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+    
+    import zipfile
+    
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    sections = [
+        "<html><head><meta charset='utf-8'><title>评论分析报告</title>",
+        "<style>body{font-family:sans-serif;margin:2rem;}table{border-collapse:collapse;margin-bottom:1.5rem;}"
+        "th,td{border:1px solid #ddd;padding:4px 8px;font-size:13px;}th{background:#f5f5f5;}</style></head><body>",
+        f"<h1>评论分析报告</h1><p>生成时间：{generated_at}，评论数：{len(df)}，明细数据见压缩包中的 data.parquet</p>"
+    ]
+    for name, table in tables.items():
+        sections.append(f"<h2>{name}</h2>")
+        sections.append(table.to_html(index=False, na_rep=''))
+    sections.append("<h2>图表</h2>")
+    for i, fig in enumerate(figs):
+        # plotly.js只在第一个图表中内嵌一次，其余图表共用
+        sections.append(save_fig_to_html(fig, include_plotlyjs=(i == 0), full_html=False))
+    sections.append("</body></html>")
+    
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr('report.html', ''.join(sections))
+        bundle.writestr('data.parquet', get_arrow_data(df, 'parquet'))
+    return output.getvalue()